@@ -1,8 +1,12 @@
 import logging
 import os
-from typing import Any, List, Optional
+import threading
+from functools import lru_cache
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple
 
 import tomlkit
+from tomlkit import TOMLDocument
 from aw_core import dirs
 from aw_core.config import load_config_toml
 
@@ -16,19 +20,130 @@ autostart_modules = ["aw-server", "aw-watcher-afk", "aw-watcher-window"]
 autostart_modules = ["aw-server", "aw-watcher-afk", "aw-watcher-window"]
 """.strip()
 
+# Per-module settings go in a table named after the module, for example:
+#
+#   [aw-qt.modules.aw-watcher-input]
+#   depends_on = ["aw-server", "aw-watcher-afk"]
+#   readiness = { type = "log", pattern = "Started" }
+#   ready_timeout = 10
+#
+# depends_on: modules that have to be ready before this one is started during autostart.
+#             Defaults to the autostarted server for everything but the server itself.
+# readiness: how to tell that the module is ready, one of
+#             { type = "http", url = "..." }, { type = "tcp", port = ..., host = "..." },
+#             { type = "file", path = "..." } or { type = "log", pattern = "...", path = "..." }.
+#             Servers default to an HTTP probe of /api/0/info, other modules are ready
+#             as soon as they're started.
+# ready_timeout: seconds to wait for the module to become ready (default: 30)
+# stop_timeout: seconds to wait for the module to exit when stopped before killing it
+#             (default: 5)
+# limits: CPU, memory, nice, ionice and CPU affinity limits for the module, see
+#             aw_qt/limits.py
+# restart: how the module is restarted after crashing, defaults to
+#             { initial_delay = 1, multiplier = 2, jitter = 0.1, max_delay = 60,
+#               max_restarts = 3, window = 600 }, i.e. at most 3 restarts in 10 minutes,
+#             after 1, 2 and 4 seconds (give or take 10%). A module exiting within
+#             early_exit seconds (default: 5) of being started max_early_exits times in
+#             a row (default: 3), or running out of restarts, is quarantined: it isn't
+#             restarted or autostarted again until it's started by hand.
+# output: how much of the module's stdout and stderr to keep, and whether to also write
+#             it to a log file, see aw_qt/output.py
+# forkserver: set to false to always start the module as a fresh process, even if
+#             forkserver is enabled (see below)
+# stall: how long the module's buckets may go without updates before it's considered
+#             stalled, and whether to restart it then, e.g.
+#             { threshold = 600, restart = true }, see aw_qt/stall.py. Set to false to
+#             not check the module. Defaults to a threshold of 600 seconds, without
+#             restarts, for aw-watcher-afk and aw-watcher-window, and no checks for
+#             other modules.
+#
+# shutdown_timeout, in the [aw-qt] table itself, is the number of seconds after which
+# any module still running when aw-qt quits is killed (default: 10).
+# sample_interval is the number of seconds between samples of the CPU, memory and I/O
+# usage of modules (Linux only, default: 5, 0 disables sampling).
+# metrics_port is the port on localhost to serve OpenMetrics at /metrics on, for a local
+# Prometheus agent to scrape (default: 0, which disables it).
+# stall_check_interval is the number of seconds between checks of whether modules are
+# still updating their buckets (default: 60, 0 disables the checks).
+# forkserver enables forking Python modules from a pre-warmed interpreter that has
+# already imported forkserver_preload (default: ["aw_core", "aw_client"]), so they start
+# faster and use less memory, see aw_qt/forkserver.py (default: false).
+
+
+class _CachedToml:
+    """
+    A TOML file that's parsed once and then only re-parsed when it has changed.
+
+    Whether the file has changed is checked (with a single ``stat``) at most once every
+    ``check_interval`` seconds, so frequent reads don't touch the disk at all.
+    """
+
+    def __init__(self, path: str, check_interval: float = 2.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.parses = 0
+        self._doc: Optional[TOMLDocument] = None
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[TOMLDocument]:
+        """The parsed file, or None if it doesn't exist or couldn't be parsed."""
+        with self._lock:
+            now = monotonic()
+            if (
+                self._checked_at is not None
+                and now - self._checked_at < self.check_interval
+            ):
+                return self._doc
+            self._checked_at = now
+
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self._doc, self._key = None, None
+                return None
+            key = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if key == self._key:
+                return self._doc
+            self._key = key
+
+            try:
+                with open(self.path) as f:
+                    self._doc = tomlkit.parse(f.read())
+                self.parses += 1
+            except Exception as e:
+                logger.warning("Failed to read %s: %s", self.path, e)
+                self._doc = None
+            return self._doc
+
+
+_toml_cache: Dict[str, _CachedToml] = {}
+_toml_cache_lock = threading.Lock()
+
+
+def _load_toml(path: str) -> Optional[TOMLDocument]:
+    with _toml_cache_lock:
+        cached = _toml_cache.get(path)
+        if cached is None:
+            cached = _toml_cache[path] = _CachedToml(path)
+    return cached.get()
+
+
+@lru_cache(maxsize=None)
+def _server_config_path(appname: str, filename: str) -> str:
+    # Cached since get_config_dir also creates the directory if it doesn't exist
+    return os.path.join(dirs.get_config_dir(appname), filename)
+
 
 def _read_server_rust_port(testing: bool) -> Optional[int]:
     """Read port from aw-server-rust config, returns None if not found/set."""
-    config_dir = dirs.get_config_dir("aw-server-rust")
     config_file = "config-testing.toml" if testing else "config.toml"
-    config_path = os.path.join(config_dir, config_file)
-
-    if not os.path.isfile(config_path):
+    config = _load_toml(_server_config_path("aw-server-rust", config_file))
+    if config is None:
         return None
 
     try:
-        with open(config_path) as f:
-            config = tomlkit.parse(f.read())
         if "port" in config:
             return int(str(config["port"]))
     except Exception as e:
@@ -38,16 +153,12 @@ def _read_server_rust_port(testing: bool) -> Optional[int]:
 
 def _read_aw_server_port(testing: bool) -> Optional[int]:
     """Read port from aw-server (Python) config, returns None if not found/set."""
-    config_dir = dirs.get_config_dir("aw-server")
-    config_path = os.path.join(config_dir, "aw-server.toml")
+    config = _load_toml(_server_config_path("aw-server", "aw-server.toml"))
     section = "server-testing" if testing else "server"
-
-    if not os.path.isfile(config_path):
+    if config is None:
         return None
 
     try:
-        with open(config_path) as f:
-            config = tomlkit.parse(f.read())
         section_data = config.get(section, {})
         if "port" in section_data:
             return int(str(section_data["port"]))
@@ -71,6 +182,26 @@ def _read_server_port(testing: bool) -> int:
     return default_port
 
 
+class ServerConfig:
+    """
+    The port of the server as configured in its config files.
+
+    Reads go through a cache that only re-parses the config files when they change, so
+    the port is cheap to read whenever it's needed, and always current.
+    """
+
+    def __init__(self, testing: bool) -> None:
+        self.testing = testing
+
+    @property
+    def port(self) -> int:
+        return _read_server_port(self.testing)
+
+    @property
+    def root_url(self) -> str:
+        return f"http://localhost:{self.port}"
+
+
 class AwQtSettings:
     def __init__(self, testing: bool):
         """
@@ -81,4 +212,28 @@ class AwQtSettings:
         config_section: Any = config["aw-qt" if not testing else "aw-qt-testing"]
 
         self.autostart_modules: List[str] = config_section["autostart_modules"]
-        self.port: int = _read_server_port(testing)
+        self.server_config = ServerConfig(testing)
+        self.shutdown_timeout = float(config_section.get("shutdown_timeout", 10))
+        self.sample_interval = float(config_section.get("sample_interval", 5))
+        self.metrics_port = int(config_section.get("metrics_port", 0))
+        self.stall_check_interval = float(config_section.get("stall_check_interval", 60))
+        self.forkserver = bool(config_section.get("forkserver", False))
+        self.forkserver_preload: Optional[List[str]] = (
+            [str(name) for name in config_section["forkserver_preload"]]
+            if "forkserver_preload" in config_section
+            else None
+        )
+
+        self.module_settings: Dict[str, Dict[str, Any]] = {
+            str(name): dict(settings)
+            for name, settings in config_section.get("modules", {}).items()
+        }
+        self.dependencies: Dict[str, List[str]] = {
+            name: [str(dep) for dep in settings["depends_on"]]
+            for name, settings in self.module_settings.items()
+            if "depends_on" in settings
+        }
+
+    @property
+    def port(self) -> int:
+        return self.server_config.port
@@ -0,0 +1,295 @@
+"""
+Control API for a running aw-qt, on a Unix domain socket next to the instance lock.
+
+The protocol is newline-delimited JSON. Each request is an object with a ``command``,
+an optional ``module`` and an optional ``id`` that's copied into every reply to it:
+
+    {"id": 1, "command": "status", "module": "aw-watcher-afk"}
+
+Commands are ``start``, ``stop`` and ``restart`` (which take a module), ``status``
+(optionally for a single module), ``list-modules`` and ``subscribe``. Replies are
+streamed: commands returning several items send one ``{"id": ..., "data": {...}}`` line
+per item as soon as it's ready, and every command ends with a line like
+``{"id": ..., "done": true, "ok": true}`` (or ``"ok": false`` with an ``"error"``).
+
+After ``subscribe``, every change of a module's lifecycle state (see aw_qt/lifecycle.py)
+is pushed to the connection until it's closed, while other commands can still be sent on
+it, as ``{"id": ..., "event": "state", "module": "aw-watcher-afk", "state": "crashed",
+"previous": "running", "reason": "exit code 1 after 3.2s", "time": 1700000000.0}``.
+
+For example: ``echo '{"command": "status"}' | socat - UNIX-CONNECT:<path>``
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from .lifecycle import Transition
+    from .manager import Manager, Module
+
+logger = logging.getLogger(__name__)
+
+
+def get_socket_path(testing: bool) -> str:
+    from .lock import get_lock_path
+
+    return os.path.splitext(get_lock_path(testing))[0] + ".sock"
+
+
+class CommandError(Exception):
+    pass
+
+
+def _module_status(
+    module: "Module", quarantine_reason: Optional[str]
+) -> Dict[str, Any]:
+    process = module._process
+    alive = module.is_alive()
+    return {
+        "name": module.name,
+        "type": module.type,
+        "path": str(module.path),
+        "state": module.state.value,
+        "since": module.lifecycle.since,
+        "alive": alive,
+        "started": module.started,
+        "external": module._external_server,
+        "pid": process.pid if process is not None and alive else None,
+        "uptime": module.uptime(),
+        "time_to_ready": module.time_to_ready,
+        "usage": module.usage_summary(),
+        "limit_errors": module.limit_errors,
+        "last_exit": module.last_exit._asdict() if module.last_exit else None,
+        "quarantined": quarantine_reason,
+    }
+
+
+class _Connection:
+    """
+    A connected client. Replies and events are written by a thread of the connection's
+    own, so that a client that doesn't read never blocks the thread sending to it.
+    """
+
+    MAX_QUEUED = 1000
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.closed = False
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(self.MAX_QUEUED)
+        threading.Thread(
+            target=self._write, name="aw-qt-control-writer", daemon=True
+        ).start()
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait((json.dumps(message) + "\n").encode())
+        except queue.Full:
+            logger.warning("Control client isn't reading replies, disconnecting it")
+            self.close()
+            return False
+        return True
+
+    def finish(self) -> None:
+        """Close the connection once everything queued has been sent"""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            self.close()
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            # Also wakes up the reading thread
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _write(self) -> None:
+        try:
+            while not self.closed:
+                data = self._queue.get()
+                if data is None:
+                    break
+                self.sock.sendall(data)
+        except OSError:
+            pass
+        finally:
+            self.closed = True
+            self.sock.close()
+
+
+class ControlServer:
+    """Serves the control API, with a thread per connected client"""
+
+    def __init__(self, manager: "Manager", path: str) -> None:
+        self.manager = manager
+        self.path = path
+        self._sock: Optional[socket.socket] = None
+        self._subscribers: Dict[_Connection, Any] = {}  # connection -> request id
+        self._lock = threading.Lock()
+        # Module operations aren't safe to run concurrently
+        self._operations_lock = threading.Lock()
+        manager.add_state_listener(self._on_module_transition)
+
+    def start(self) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            logger.info("Unix domain sockets not supported, control API disabled")
+            return
+        # The instance lock is held, so any existing socket is a stale one
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # Created accessible to the user only, not just chmod'ed afterwards, so
+            # other users can't connect in between
+            umask = os.umask(0o077)
+            try:
+                sock.bind(self.path)
+            finally:
+                os.umask(umask)
+            os.chmod(self.path, 0o600)
+            sock.listen()
+        except OSError as e:
+            logger.error(f"Failed to create control socket {self.path}: {e}")
+            sock.close()
+            return
+        self._sock = sock
+        threading.Thread(
+            target=self._accept, args=(sock,), name="aw-qt-control", daemon=True
+        ).start()
+        logger.info(f"Listening for control commands on {self.path}")
+
+    def stop(self) -> None:
+        if self._sock is None:
+            return
+        # Shutting down wakes up the thread blocked in accept()
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _accept(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                client, _ = sock.accept()
+            except OSError:
+                return  # closed by stop()
+            threading.Thread(
+                target=self._serve, args=(client,), name="aw-qt-control-client", daemon=True
+            ).start()
+
+    def _serve(self, client: socket.socket) -> None:
+        conn = _Connection(client)
+        try:
+            with client.makefile("rb") as f:
+                for line in f:
+                    if conn.closed:
+                        break
+                    if line.strip():
+                        self._handle(conn, line)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._subscribers.pop(conn, None)
+            conn.finish()
+
+    def _handle(self, conn: _Connection, line: bytes) -> None:
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise CommandError(f"invalid JSON: {e}")
+            if not isinstance(request, dict):
+                raise CommandError("request must be an object")
+            request_id = request.get("id")
+            for data in self._run(conn, request):
+                conn.send({"id": request_id, "data": data})
+        except CommandError as e:
+            conn.send({"id": request_id, "done": True, "ok": False, "error": str(e)})
+            return
+        except Exception as e:
+            logger.exception("Error handling control command")
+            conn.send({"id": request_id, "done": True, "ok": False, "error": repr(e)})
+            return
+        conn.send({"id": request_id, "done": True, "ok": True})
+
+    def _run(self, conn: _Connection, request: Dict[str, Any]) -> Iterator[Any]:
+        command = request.get("command")
+        name = request.get("module")
+        if command in ("start", "stop", "restart"):
+            module = self._get_module(name)
+            with self._operations_lock:
+                if command == "start":
+                    if module.is_alive():
+                        raise CommandError(f"module {module.name} is already running")
+                    self.manager.reset_crash_state(module)
+                    module.start(self.manager.testing)
+                elif command == "stop":
+                    if not module.started:
+                        raise CommandError(f"module {module.name} isn't running")
+                    module.stop()
+                else:
+                    self.manager.reset_crash_state(module)
+                    if module.started:
+                        module.stop()
+                    module.start(self.manager.testing)
+            yield _module_status(module, self.manager.quarantine_reason(module))
+        elif command == "status":
+            modules: List["Module"]
+            if name is not None:
+                modules = [self._get_module(name)]
+            else:
+                self.manager.ensure_discovered()
+                modules = list(self.manager.modules)
+            for module in modules:
+                yield _module_status(module, self.manager.quarantine_reason(module))
+        elif command == "list-modules":
+            self.manager.ensure_discovered()
+            for module in self.manager.modules:
+                yield {"name": module.name, "type": module.type, "path": str(module.path)}
+        elif command == "subscribe":
+            with self._lock:
+                self._subscribers[conn] = request.get("id")
+        else:
+            raise CommandError(f"unknown command {command!r}")
+
+    def _get_module(self, name: Any) -> "Module":
+        if not isinstance(name, str):
+            raise CommandError("missing module name")
+        module = self.manager._find_module(name)
+        if module is None:
+            raise CommandError(f"module {name} not found")
+        return module
+
+    def _on_module_transition(self, module: "Module", transition: "Transition") -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        message = {
+            "event": "state",
+            "module": module.name,
+            "state": transition.state.value,
+            "previous": transition.previous.value,
+            "reason": transition.reason,
+            "time": transition.time,
+        }
+        for conn, request_id in subscribers:
+            if not conn.send({"id": request_id, **message}):
+                with self._lock:
+                    self._subscribers.pop(conn, None)
@@ -0,0 +1,82 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .persist import load_state, save_state
+
+# (basename, kind), where kind is one of "executable", "directory" or "other"
+Entry = Tuple[str, str]
+
+
+class DiscoveryCache:
+    """
+    Persistent index of the ``aw-*`` entries found in each directory searched for
+    modules, so that directories which haven't changed since the last launch don't
+    have to be listed and every entry stat'ed again.
+
+    Entries are keyed by the directory's mtime and inode. Adding, removing or renaming
+    an entry changes the mtime of its directory, but changing the permissions of an
+    existing file does not, which is what ``--rediscover`` (``force=True``) is for.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str], force: bool = False) -> None:
+        self.path = path
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self._dirs: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if path and not force:
+            self._load()
+
+    @classmethod
+    def default(cls, force: bool = False) -> "DiscoveryCache":
+        import aw_core.dirs
+
+        data_dir = aw_core.dirs.get_data_dir("aw-qt")
+        return cls(os.path.join(data_dir, "discovery-cache.json"), force=force)
+
+    def _load(self) -> None:
+        assert self.path
+        data = load_state(self.path, self.VERSION, "module discovery cache")
+        if data is not None:
+            self._dirs = data.get("dirs", {})
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        if save_state(
+            self.path, self.VERSION, {"dirs": self._dirs}, "module discovery cache"
+        ):
+            self._dirty = False
+
+    def list_directory(
+        self, directory: str, scan: Callable[[str], List[Entry]]
+    ) -> List[Entry]:
+        """Return the entries of ``directory``, calling ``scan`` only if it has changed."""
+        try:
+            st = os.stat(directory)
+        except OSError:
+            # Let the scan deal with (and report) missing or unreadable directories
+            return scan(directory)
+
+        cached = self._dirs.get(directory)
+        if (
+            cached is not None
+            and cached["mtime_ns"] == st.st_mtime_ns
+            and cached["ino"] == st.st_ino
+        ):
+            self.hits += 1
+            return [(name, kind) for name, kind in cached["entries"]]
+
+        self.misses += 1
+        # Stat'ed before scanning, so a change during the scan is picked up next time
+        entries = scan(directory)
+        self._dirs[directory] = {
+            "mtime_ns": st.st_mtime_ns,
+            "ino": st.st_ino,
+            "entries": [list(e) for e in entries],
+        }
+        self._dirty = True
+        return entries
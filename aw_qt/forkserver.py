@@ -0,0 +1,397 @@
+"""
+Launching Python modules by forking them from a pre-warmed interpreter.
+
+Modules like aw-watcher-afk and aw-watcher-window are Python programs, and starting each
+of them as a fresh interpreter means importing aw_core, aw_client and their dependencies
+all over again, which costs hundreds of milliseconds and tens of megabytes per module.
+With ``forkserver = true`` in aw-qt.toml, modules whose executable is a Python script are
+instead forked from a forkserver: a process running the same interpreter as the script
+(as given by its shebang) that has already imported the shared libraries, so the modules
+start faster and share those pages copy-on-write. Native executables, like the bundled
+modules and aw-server-rust, are still started directly.
+
+The forkserver is started on first use, one per interpreter, and is sent requests over a
+socket pair. Every request carries the module's argv and, as ancillary data, the pipe its
+output should go to. The forkserver replies with the PID of the forked module, and later
+reports its exit status, since only the forkserver can wait for its children.
+
+This file is also the forkserver itself, run with the module's interpreter, so it must
+only import from the standard library.
+"""
+
+import array
+import json
+import logging
+import os
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SERVER_SCRIPT = os.path.abspath(__file__)
+DEFAULT_PRELOAD = ["aw_core", "aw_client"]
+SPAWN_TIMEOUT = 30.0
+_MAX_FDS = 4
+
+
+class ForkServerError(Exception):
+    pass
+
+
+def _send(
+    sock: socket.socket, message: Dict[str, Any], fds: Optional[List[int]] = None
+) -> None:
+    data = (json.dumps(message) + "\n").encode()
+    ancdata = []
+    if fds:
+        ancdata = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))]
+    sent = sock.sendmsg([data], ancdata)
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def _recv(sock: socket.socket) -> Tuple[bytes, List[int]]:
+    fds = array.array("i")
+    data, ancdata, _, _ = sock.recvmsg(
+        64 * 1024, socket.CMSG_SPACE(_MAX_FDS * fds.itemsize)
+    )
+    for level, type, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and type == socket.SCM_RIGHTS:
+            usable = len(cmsg_data) - len(cmsg_data) % fds.itemsize
+            fds.frombytes(cmsg_data[:usable])
+    return data, list(fds)
+
+
+def interpreter_for(path: str) -> Optional[str]:
+    """
+    The Python interpreter that runs the script at ``path``, or None if it isn't a Python
+    script (or needs interpreter options, which a forkserver can't provide)
+    """
+    try:
+        with open(path, "rb") as f:
+            first_line = f.readline(512)
+    except OSError:
+        return None
+    if not first_line.startswith(b"#!"):
+        return None
+    words = first_line[2:].decode(errors="replace").split()
+    if words and os.path.basename(words[0]) == "env":
+        words = words[1:]
+        if len(words) == 1:
+            words = [shutil.which(words[0]) or ""]
+    if len(words) != 1 or not os.path.basename(words[0]).startswith("python"):
+        return None
+    return words[0]
+
+
+class ForkedProcess:
+    """
+    A module forked by a forkserver, with the parts of the ``subprocess.Popen`` interface
+    that modules are managed with.
+    """
+
+    def __init__(self, args: List[str], pid: int) -> None:
+        self.args = args
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self._exited = threading.Event()
+        self._exit_callbacks: List[Callable[["ForkedProcess"], None]] = []
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<ForkedProcess {self.pid}: returncode: {self.returncode}>"
+
+    def add_exit_callback(self, callback: Callable[["ForkedProcess"], None]) -> None:
+        """Call ``callback`` (from a background thread) once the process has exited"""
+        with self._lock:
+            if self.returncode is None:
+                self._exit_callbacks.append(callback)
+                return
+        callback(self)
+
+    def _set_returncode(self, returncode: int) -> None:
+        with self._lock:
+            if self.returncode is not None:
+                return
+            self.returncode = returncode
+            callbacks, self._exit_callbacks = self._exit_callbacks, []
+        self._exited.set()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logger.exception(f"Error in exit callback for PID {self.pid}")
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if not self._exited.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout or 0)
+        assert self.returncode is not None
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.returncode is not None:
+            return
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+
+class _Connection:
+    """The connection to a running forkserver, and the processes forked by it"""
+
+    def __init__(self, server: "subprocess.Popen[bytes]", sock: socket.socket) -> None:
+        self.server = server
+        self.sock = sock
+        self.closed = False
+        self.replies: "Queue[Any]" = Queue()
+        self.processes: Dict[int, ForkedProcess] = {}
+
+
+class ForkServer:
+    """A forkserver running ``interpreter``, started on first use"""
+
+    def __init__(self, interpreter: str, preload: List[str]) -> None:
+        self.interpreter = interpreter
+        self.preload = preload
+        self._conn: Optional[_Connection] = None
+        self._lock = threading.Lock()  # held for a whole request and its reply
+
+    def _start(self) -> _Connection:
+        sock, server_sock = socket.socketpair()
+        cmd = [self.interpreter, SERVER_SCRIPT, str(server_sock.fileno())]
+        cmd += self.preload
+        try:
+            server = subprocess.Popen(cmd, pass_fds=[server_sock.fileno()])
+        except OSError as e:
+            sock.close()
+            raise ForkServerError(f"failed to start forkserver for {self.interpreter}: {e}")
+        finally:
+            server_sock.close()
+        logger.info(f"Started forkserver for {self.interpreter} (PID {server.pid})")
+        conn = _Connection(server, sock)
+        threading.Thread(
+            target=self._read, args=(conn,), name="aw-qt-forkserver", daemon=True
+        ).start()
+        return conn
+
+    def spawn(self, argv: List[str], output_fd: int) -> ForkedProcess:
+        """Fork a process running the script ``argv[0]``, with output going to ``output_fd``"""
+        with self._lock:
+            conn = self._conn
+            if conn is None or conn.closed:
+                conn = self._conn = self._start()
+            try:
+                _send(conn.sock, {"argv": argv}, [output_fd])
+                reply = conn.replies.get(timeout=SPAWN_TIMEOUT)
+            except OSError as e:
+                raise ForkServerError(f"forkserver unreachable: {e}")
+            except Empty:
+                raise ForkServerError("forkserver didn't reply")
+        if isinstance(reply, ForkedProcess):
+            return reply
+        raise ForkServerError(reply)
+
+    def _read(self, conn: _Connection) -> None:
+        error = "forkserver exited"
+        try:
+            with conn.sock.makefile("rb") as f:
+                for line in f:
+                    self._handle(conn, json.loads(line))
+        except (OSError, ValueError) as e:
+            error += f": {e}"
+        conn.closed = True
+        conn.replies.put(error)
+        # The forked modules can't be waited for anymore, so stop them
+        for process in list(conn.processes.values()):
+            logger.error(f"Forkserver exited, stopping its child {process.pid}")
+            process.terminate()
+            process._set_returncode(-signal.SIGTERM)
+        conn.processes.clear()
+
+    @staticmethod
+    def _handle(conn: _Connection, message: Dict[str, Any]) -> None:
+        if "spawned" in message:
+            process = ForkedProcess(message["argv"], message["spawned"])
+            conn.processes[process.pid] = process
+            conn.replies.put(process)
+        elif "exited" in message:
+            exited = conn.processes.pop(message["exited"], None)
+            if exited is not None:
+                exited._set_returncode(message["returncode"])
+        elif "error" in message:
+            conn.replies.put(message["error"])
+
+    def stop(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        # The forkserver exits once its end of the socket is closed
+        try:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        conn.sock.close()
+        try:
+            conn.server.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            conn.server.kill()
+            conn.server.wait()
+
+
+class ForkServerPool:
+    """Forkservers for the Python modules, one per interpreter"""
+
+    def __init__(self, preload: Optional[List[str]] = None) -> None:
+        self.preload = DEFAULT_PRELOAD if preload is None else preload
+        self._servers: Dict[str, ForkServer] = {}
+        self._lock = threading.Lock()
+
+    def spawn(self, argv: List[str], output_fd: int) -> Optional[ForkedProcess]:
+        """
+        Fork ``argv`` from the forkserver for its interpreter, or return None if it isn't
+        a Python script or the forkserver failed, for it to be started normally instead
+        """
+        if sys.platform == "win32" or not os.path.exists(SERVER_SCRIPT):
+            # No fork() on Windows, and no forkserver script in a frozen aw-qt
+            return None
+        interpreter = interpreter_for(argv[0])
+        if interpreter is None:
+            return None
+        with self._lock:
+            server = self._servers.get(interpreter)
+            if server is None:
+                server = self._servers[interpreter] = ForkServer(interpreter, self.preload)
+        try:
+            return server.spawn(argv, output_fd)
+        except ForkServerError as e:
+            logger.warning(f"Not forking {argv[0]}: {e}")
+            return None
+
+    def stop(self) -> None:
+        with self._lock:
+            servers = list(self._servers.values())
+            self._servers.clear()
+        for server in servers:
+            server.stop()
+
+
+def _exit_status(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _serve(sock: socket.socket) -> Optional[List[str]]:
+    """
+    Serve fork requests until aw-qt closes the socket. Returns the argv of the script to
+    run in forked children, and None in the forkserver once it should exit.
+    """
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    # The handler does nothing, but makes SIGCHLD wake up the selector
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+    signal.set_wakeup_fd(wakeup_w)
+    selector = selectors.DefaultSelector()
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    selector.register(sock, selectors.EVENT_READ)
+
+    buf = b""
+    fds: List[int] = []
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj == wakeup_r:
+                try:
+                    os.read(wakeup_r, 512)
+                except BlockingIOError:
+                    pass
+                while True:
+                    try:
+                        pid, status = os.waitpid(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        break
+                    if pid == 0:
+                        break
+                    _send(sock, {"exited": pid, "returncode": _exit_status(status)})
+                continue
+
+            data, received_fds = _recv(sock)
+            if not data:
+                return None
+            buf += data
+            fds += received_fds
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                argv = json.loads(line)["argv"]
+                try:
+                    pid = os.fork()
+                except OSError as e:
+                    _send(sock, {"error": f"fork failed: {e}"})
+                    continue
+                if pid == 0:
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGINT, signal.default_int_handler)
+                    selector.close()
+                    sock.close()
+                    os.close(wakeup_r)
+                    os.close(wakeup_w)
+                    if fds:
+                        os.dup2(fds[0], 1)
+                        os.dup2(fds[0], 2)
+                    for fd in fds:
+                        os.close(fd)
+                    return argv
+                for fd in fds:
+                    os.close(fd)
+                fds = []
+                _send(sock, {"spawned": pid, "argv": argv})
+
+
+def _main(argv: List[str]) -> None:
+    # Don't let modules import from aw_qt/ instead of their own packages
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(SERVER_SCRIPT):
+        del sys.path[0]
+    # Ctrl+C in aw-qt's terminal is for aw-qt (and the modules) to handle
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for name in argv[2:]:
+        try:
+            __import__(name)
+        except ModuleNotFoundError as e:
+            if e.name != name:
+                print(f"forkserver: failed to preload {name}: {e!r}", file=sys.stderr)
+        except Exception as e:
+            print(f"forkserver: failed to preload {name}: {e!r}", file=sys.stderr)
+
+    child_argv = _serve(socket.socket(fileno=int(argv[1])))
+    if child_argv is None:
+        return
+
+    # In a forked module: run the script like the interpreter would have
+    import runpy
+
+    sys.argv = child_argv
+    sys.path.insert(0, os.path.dirname(os.path.realpath(child_argv[0])))
+    runpy.run_path(child_argv[0], run_name="__main__")
+
+
+if __name__ == "__main__":
+    _main(sys.argv)
@@ -0,0 +1,154 @@
+"""
+The lifecycle of a module, as an explicit state machine.
+
+    stopped ──> starting ──> running ──> ready
+       ^  ^        │           ^ │        ^ │
+       │  │        │           │ v        │ v
+       │  │        │          degraded ───┴──┘   (alive, but no longer reporting)
+       │  │        v
+       │  │     external     (running, ready or degraded) ──> stopping ──> stopped
+       │  │        │
+       │  └─── crashed <── (running, ready, degraded or external, on an unexpected exit)
+       │          │
+       │          ├──> backoff ──> starting   (restarted after a delay)
+       │          └──> quarantined ──> stopped or starting (by hand)
+
+"running" means the module's process is alive, "ready" that its readiness probe has
+also passed, and "degraded" that it's alive but has stopped reporting to the server
+(see ``aw_qt.stall``). "external" is a server module for which an already running
+server, not started by aw-qt, is used instead.
+
+Every change of state is recorded as a timestamped ``Transition`` and passed to the
+listeners, in order. Changing state with ``compare_and_set`` is atomic, which is what
+merges concurrent requests to start a module into one.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class State(Enum):
+    STOPPED = "stopped"
+    STARTING = "starting"
+    RUNNING = "running"
+    READY = "ready"
+    STOPPING = "stopping"
+    BACKOFF = "backoff"
+    CRASHED = "crashed"
+    QUARANTINED = "quarantined"
+    EXTERNAL = "external"
+    DEGRADED = "degraded"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+# States in which the module is (or is being) run
+ALIVE = {State.RUNNING, State.READY, State.DEGRADED, State.EXTERNAL}
+# States a module can be started from
+STARTABLE = {State.STOPPED, State.CRASHED, State.BACKOFF, State.QUARANTINED}
+
+TRANSITIONS: Dict[State, Set[State]] = {
+    State.STOPPED: {State.STARTING, State.QUARANTINED},
+    State.STARTING: {State.RUNNING, State.EXTERNAL, State.CRASHED, State.STOPPED},
+    State.RUNNING: {
+        State.READY,
+        State.DEGRADED,
+        State.STOPPING,
+        State.CRASHED,
+        State.STOPPED,
+    },
+    State.READY: {State.DEGRADED, State.STOPPING, State.CRASHED, State.STOPPED},
+    State.DEGRADED: {
+        State.RUNNING,
+        State.READY,
+        State.STOPPING,
+        State.CRASHED,
+        State.STOPPED,
+    },
+    State.EXTERNAL: {State.STOPPED, State.CRASHED},
+    State.STOPPING: {State.STOPPED},
+    State.CRASHED: {State.BACKOFF, State.QUARANTINED, State.STOPPED, State.STARTING},
+    State.BACKOFF: {State.STARTING, State.STOPPED, State.QUARANTINED},
+    State.QUARANTINED: {State.STOPPED, State.STARTING},
+}
+
+
+class Transition(NamedTuple):
+    previous: State
+    state: State
+    time: float  # as returned by time.time()
+    reason: str = ""
+
+
+class Lifecycle:
+    """The state of a module, safe to change and read from any thread"""
+
+    HISTORY_SIZE = 20
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._state = State.STOPPED
+        self._since = time.time()
+        self.history: Deque[Transition] = deque(maxlen=self.HISTORY_SIZE)
+        self._listeners: List[Callable[[Transition], None]] = []
+        # Reentrant, since listeners are called with it held (to keep them in order)
+        self._lock = threading.RLock()
+
+    @property
+    def state(self) -> State:
+        return self._state
+
+    @property
+    def since(self) -> float:
+        """When the current state was entered, as returned by time.time()"""
+        return self._since
+
+    def add_listener(self, callback: Callable[[Transition], None]) -> None:
+        """
+        Call ``callback`` with every transition. Callbacks are called from the thread
+        changing the state, and must not block.
+        """
+        self._listeners.append(callback)
+
+    def set(self, state: State, reason: str = "") -> Optional[Transition]:
+        """Change to ``state``, returning the transition (or None if already in it)"""
+        with self._lock:
+            return self._set(state, reason)
+
+    def compare_and_set(
+        self, expected: Iterable[State], state: State, reason: str = ""
+    ) -> bool:
+        """Change to ``state`` only if currently in one of the ``expected`` states"""
+        with self._lock:
+            if self._state not in expected:
+                return False
+            self._set(state, reason)
+            return True
+
+    def _set(self, state: State, reason: str) -> Optional[Transition]:
+        previous = self._state
+        if state is previous:
+            return None
+        if state not in TRANSITIONS[previous]:
+            # The process is the source of truth, so follow it anyway
+            logger.warning(f"Module {self.name}: unexpected transition {previous} -> {state}")
+        transition = Transition(previous, state, time.time(), reason)
+        self._state = state
+        self._since = transition.time
+        self.history.append(transition)
+        logger.debug(
+            f"Module {self.name}: {previous} -> {state}" + (f" ({reason})" if reason else "")
+        )
+        for callback in self._listeners:
+            try:
+                callback(transition)
+            except Exception:
+                logger.exception(f"Error in state listener of {self.name}")
+        return transition
@@ -0,0 +1,251 @@
+"""
+Per-module limits on CPU, memory and I/O, applied when a module is started.
+
+Configured in a ``limits`` table in the module's settings, for example:
+
+    [aw-qt.modules.aw-watcher-input]
+    limits = { cpu = 0.25, memory = "200M", nice = 10, ionice = "idle", cpu_affinity = [0] }
+
+cpu: fraction of a single CPU the module may use, needs cgroup v2.
+memory: maximum memory, in bytes or with a K, M or G suffix. Applied with cgroup v2 if
+    available, otherwise as a limit on the address space (RLIMIT_AS).
+nice: scheduling niceness (0-19).
+ionice: I/O scheduling class, "idle", "best-effort" or "realtime", optionally followed by
+    a level like "best-effort:7".
+cpu_affinity: list of CPUs the module may run on.
+
+Limits are applied from aw-qt right after the module is spawned (rather than in the child
+before exec, which isn't safe with threads), and are only supported on Linux. Limits that
+couldn't be applied are reported in ``Module.limit_errors``.
+"""
+
+import logging
+import os
+import sys
+import threading
+from typing import Any, List, Mapping, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_memory_units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+_ionice_classes = {"realtime": 1, "best-effort": 2, "idle": 3}
+# ioprio_set has no wrapper in Python or glibc
+_SYS_ioprio_set = {"x86_64": 251, "aarch64": 30}
+
+
+class CgroupError(Exception):
+    pass
+
+
+def _parse_memory(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    value = str(value).strip().upper()
+    if value and value[-1] in _memory_units:
+        return int(float(value[:-1]) * _memory_units[value[-1]])
+    return int(value)
+
+
+def _parse_ionice(value: str) -> int:
+    cls, _, level = value.partition(":")
+    if cls not in _ionice_classes:
+        raise ValueError(f"unknown ionice class {cls!r}")
+    return (_ionice_classes[cls] << 13) | int(level or 0)
+
+
+class LaunchPolicy:
+    def __init__(
+        self,
+        cpu: Optional[float] = None,
+        memory: Optional[int] = None,
+        nice: Optional[int] = None,
+        ionice: Optional[str] = None,
+        cpu_affinity: Optional[Set[int]] = None,
+    ) -> None:
+        self.cpu = cpu
+        self.memory = memory
+        self.nice = nice
+        self.ionice = ionice
+        self.cpu_affinity = cpu_affinity
+        if ionice is not None:
+            _parse_ionice(ionice)  # validate early
+
+    @property
+    def uses_cgroups(self) -> bool:
+        return self.cpu is not None or self.memory is not None
+
+    @classmethod
+    def from_settings(cls, settings: Mapping[str, Any]) -> "LaunchPolicy":
+        unknown = set(settings) - {"cpu", "memory", "nice", "ionice", "cpu_affinity"}
+        if unknown:
+            raise ValueError(f"unknown limits: {', '.join(sorted(unknown))}")
+        return cls(
+            cpu=float(settings["cpu"]) if "cpu" in settings else None,
+            memory=_parse_memory(settings["memory"]) if "memory" in settings else None,
+            nice=int(settings["nice"]) if "nice" in settings else None,
+            ionice=str(settings["ionice"]) if "ionice" in settings else None,
+            cpu_affinity=(
+                {int(c) for c in settings["cpu_affinity"]}
+                if "cpu_affinity" in settings
+                else None
+            ),
+        )
+
+    def apply(self, name: str, pid: int) -> List[str]:
+        """Apply the policy to the (just started) process ``pid``, returning any errors"""
+        if sys.platform != "linux":
+            return [f"limits are only supported on Linux, not {sys.platform}"]
+
+        errors: List[str] = []
+        use_rlimit = self.memory is not None
+        if self.uses_cgroups:
+            try:
+                get_cgroups().add(name, pid, cpu=self.cpu, memory=self.memory)
+                use_rlimit = False
+            except CgroupError as e:
+                if self.cpu is not None:
+                    errors.append(f"cpu limit not applied: {e}")
+
+        if use_rlimit:
+            import resource
+
+            try:
+                assert self.memory is not None
+                resource.prlimit(pid, resource.RLIMIT_AS, (self.memory, self.memory))
+            except (OSError, ValueError) as e:
+                errors.append(f"memory limit not applied: {e}")
+
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, self.nice)
+            except OSError as e:
+                errors.append(f"nice not applied: {e}")
+
+        if self.ionice is not None:
+            try:
+                _ioprio_set(pid, _parse_ionice(self.ionice))
+            except OSError as e:
+                errors.append(f"ionice not applied: {e}")
+
+        if self.cpu_affinity is not None:
+            try:
+                os.sched_setaffinity(pid, self.cpu_affinity)
+            except OSError as e:
+                errors.append(f"cpu affinity not applied: {e}")
+
+        for error in errors:
+            logger.warning(f"{name}: {error}")
+        return errors
+
+
+def _ioprio_set(pid: int, ioprio: int) -> None:
+    import ctypes
+    import platform
+
+    nr = _SYS_ioprio_set.get(platform.machine())
+    if nr is None:
+        raise OSError(f"not supported on {platform.machine()}")
+    libc = ctypes.CDLL(None, use_errno=True)
+    IOPRIO_WHO_PROCESS = 1
+    if libc.syscall(nr, IOPRIO_WHO_PROCESS, pid, ioprio) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+class CgroupTree:
+    """
+    A cgroup v2 sub-tree with a cgroup for each module with CPU or memory limits.
+
+    The modules' cgroups are created next to the cgroup aw-qt itself runs in. Since a
+    cgroup can't both contain processes and delegate controllers to its children, aw-qt
+    first moves itself into a child cgroup of its own. So this only works if aw-qt is
+    alone in its cgroup (as when started as a systemd service), and is refused
+    otherwise, rather than moving e.g. the shell or desktop session aw-qt was started
+    from along with it. Modules then get rlimits instead.
+    """
+
+    def __init__(self, root: str = "/sys/fs/cgroup", proc: str = "/proc") -> None:
+        self.root = root
+        self.proc = proc
+        self._base: Optional[str] = None
+        self._error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def setup(self) -> None:
+        """Set up the tree, best done before any modules are started"""
+        with self._lock:
+            self._setup()
+
+    def _setup(self) -> str:
+        if self._base is not None:
+            return self._base
+        if self._error is not None:
+            raise CgroupError(self._error)
+        try:
+            self._base = self._create_base()
+        except (CgroupError, OSError) as e:
+            self._error = f"cgroup v2 not usable: {e}"
+            logger.info(self._error)
+            raise CgroupError(self._error)
+        return self._base
+
+    def _create_base(self) -> str:
+        own = None
+        with open(f"{self.proc}/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    own = line[3:].strip()
+        if own is None:
+            raise CgroupError("no cgroup v2 hierarchy")
+        base = os.path.join(self.root, own.lstrip("/"))
+        with open(os.path.join(base, "cgroup.controllers")) as f:
+            available = set(f.read().split())
+        missing = {"cpu", "memory"} - available
+        if missing:
+            raise CgroupError(f"controllers not delegated: {', '.join(sorted(missing))}")
+
+        with open(os.path.join(base, "cgroup.procs")) as f:
+            others = [pid for pid in f.read().split() if int(pid) != os.getpid()]
+        if others:
+            raise CgroupError(
+                f"{own} is shared with other processes ({', '.join(others[:5])})"
+            )
+
+        leaf = os.path.join(base, "aw-qt")
+        os.makedirs(leaf, exist_ok=True)
+        self._move(leaf, os.getpid())
+        with open(os.path.join(base, "cgroup.subtree_control"), "w") as f:
+            f.write("+cpu +memory")
+        return base
+
+    @staticmethod
+    def _move(cgroup: str, pid: int) -> None:
+        # One process per write
+        with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+
+    def add(
+        self, name: str, pid: int, cpu: Optional[float], memory: Optional[int]
+    ) -> None:
+        with self._lock:
+            base = self._setup()
+        path = os.path.join(base, f"module-{name}")
+        try:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "cpu.max"), "w") as f:
+                f.write(f"{int(cpu * 100_000)} 100000" if cpu is not None else "max")
+            with open(os.path.join(path, "memory.max"), "w") as f:
+                f.write(str(memory) if memory is not None else "max")
+            self._move(path, pid)
+        except OSError as e:
+            raise CgroupError(str(e))
+
+
+_cgroups: Optional[CgroupTree] = None
+
+
+def get_cgroups() -> CgroupTree:
+    global _cgroups
+    if _cgroups is None:
+        _cgroups = CgroupTree()
+    return _cgroups
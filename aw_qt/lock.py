@@ -0,0 +1,60 @@
+import os
+import sys
+from typing import Optional
+
+
+def get_lock_path(testing: bool) -> str:
+    import aw_core.dirs
+
+    data_dir = aw_core.dirs.get_data_dir("aw-qt")
+    suffix = "-testing" if testing else ""
+    return os.path.join(data_dir, f"aw-qt{suffix}.lock")
+
+
+class InstanceLock:
+    """
+    An exclusive lock on a file, held until ``unlock`` is called or the process exits.
+
+    Uses ``flock`` on Unix and ``msvcrt.locking`` on Windows, so that no Qt is needed to
+    enforce a single instance, and a lock left behind by a crashed process is released
+    by the OS rather than needing stale lock detection.
+    The PID of the holder is written to the file to help report who holds it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def try_lock(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def unlock(self) -> None:
+        if self._fd is None:
+            return
+        os.close(self._fd)  # also releases the lock
+        self._fd = None
+
+    def holder_pid(self) -> Optional[int]:
+        """The PID of the process holding the lock, if known"""
+        try:
+            with open(self.path) as f:
+                return int(f.readline().strip())
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,101 @@
+"""
+Reading the end of module logs without loading whole log files into memory.
+
+Module logs are written by aw_core's rotating file handler: one file per session named
+``<module>_[testing-]<timestamp>.log``, rotated to ``.log.1``, ``.log.2`` and so on when
+they grow too large. Logs can be tens of megabytes after a long uptime, so files are read
+backwards from the end in blocks, stopping once enough lines have been read.
+"""
+
+import os
+import re
+from typing import List, Optional, Tuple
+
+BLOCK_SIZE = 8 * 1024
+DEFAULT_MAX_LINES = 200
+DEFAULT_MAX_BYTES = 64 * 1024
+
+_rotation_re = re.compile(r"^(.*?)(?:\.(\d+))?$")
+
+
+def _read_tail(path: str, max_lines: int, max_bytes: int) -> Tuple[bytes, bool]:
+    """
+    Read the end of ``path``: at least ``max_lines`` lines, or ``max_bytes`` bytes,
+    whichever is shorter. Also returns whether the whole file was read.
+    """
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        chunks: List[bytes] = []
+        size = 0
+        newlines = 0
+        # One more newline than lines wanted, to be sure the first line is complete
+        while pos > 0 and size < max_bytes and newlines <= max_lines:
+            n = min(BLOCK_SIZE, pos, max_bytes - size)
+            pos -= n
+            f.seek(pos)
+            chunk = f.read(n)
+            chunks.append(chunk)
+            size += len(chunk)
+            newlines += chunk.count(b"\n")
+    return b"".join(reversed(chunks)), pos == 0
+
+
+def tail(
+    paths: List[str],
+    max_lines: int = DEFAULT_MAX_LINES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> str:
+    """
+    The last ``max_lines`` lines (and at most about ``max_bytes`` bytes) of the
+    concatenation of ``paths``, which are ordered newest first.
+    """
+    data = b""
+    at_start = True
+    for path in paths:
+        if data.count(b"\n") > max_lines or len(data) >= max_bytes:
+            at_start = False
+            break
+        try:
+            chunk, at_start = _read_tail(path, max_lines, max_bytes - len(data))
+        except OSError:
+            continue
+        if chunk and not chunk.endswith(b"\n") and data:
+            chunk += b"\n"
+        data = chunk + data
+        if not at_start:
+            break
+
+    lines = data.splitlines()
+    if not at_start and lines:
+        # Most likely starts in the middle of a line
+        lines = lines[1:]
+    return b"\n".join(lines[-max_lines:]).decode("utf-8", errors="replace")
+
+
+def _log_sort_key(filename: str) -> Tuple[str, int]:
+    match = _rotation_re.match(filename)
+    assert match
+    base, rotation = match.groups()
+    # Newest session first (descending timestamp), and within it, the current file
+    # first, then .1, .2 and so on.
+    return base, -int(rotation or 0)
+
+
+def find_log_files(name: str, testing: bool, log_dir: Optional[str] = None) -> List[str]:
+    """All log files of module ``name``, newest first, including rotated files"""
+    import aw_core.dirs
+
+    if log_dir is None:
+        log_dir = aw_core.dirs.get_log_dir(name)
+    try:
+        filenames = os.listdir(log_dir)
+    except OSError:
+        return []
+    filenames = [f for f in filenames if f.startswith(name + "_")]
+    # Like aw_core.log: testing logs only have "testing" in their names if they share
+    # a log dir with the normal ones, which isolated testing roots don't
+    isolated_testing = testing and not aw_core.dirs.legacy_testing_suffix(testing)
+    if not isolated_testing:
+        filenames = [f for f in filenames if ("testing" in f) == testing]
+    filenames.sort(key=_log_sort_key, reverse=True)
+    return [os.path.join(log_dir, f) for f in filenames]
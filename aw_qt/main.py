@@ -6,40 +6,37 @@ import platform
 import signal
 import threading
 from typing import Optional
-from time import sleep
+from time import monotonic, sleep
 
 import click
-from PyQt6.QtCore import QLockFile
 from aw_core.log import setup_logging
 
+from . import tracing
 from .manager import Manager
 from .config import AwQtSettings
+from .control import ControlServer, get_socket_path
+from .lock import InstanceLock, get_lock_path
+from .quarantine import QuarantineStore
 
 logger = logging.getLogger(__name__)
 
 
-def _acquire_single_instance_lock(testing: bool) -> QLockFile:
+def _acquire_single_instance_lock(testing: bool) -> InstanceLock:
     """Ensure only one instance of aw-qt runs at a time.
 
-    Uses QLockFile for cross-platform single-instance enforcement.
+    Uses a file lock rather than QLockFile, so that headless modes don't need Qt.
     The returned lock must be kept alive for the duration of the process.
     Exits with code 1 if another instance is already running.
     """
-    import aw_core.dirs
-
-    data_dir = aw_core.dirs.get_data_dir("aw-qt")
-    suffix = "-testing" if testing else ""
-    lock_path = os.path.join(data_dir, f"aw-qt{suffix}.lock")
-
-    lock = QLockFile(lock_path)
-    lock.setStaleLockTime(0)  # Only release when the process explicitly unlocks
-
-    if not lock.tryLock(100):
-        if lock.error() == QLockFile.LockError.LockFailedError:
-            _ok, pid, _hostname, _appname = lock.getLockInfo()
-            msg = f"Another instance of aw-qt is already running (PID {pid}). Exiting."
-        else:
-            msg = f"Failed to acquire instance lock ({lock.error()}). Exiting."
+    lock = InstanceLock(get_lock_path(testing))
+
+    if not lock.try_lock():
+        pid = lock.holder_pid()
+        msg = (
+            f"Another instance of aw-qt is already running (PID {pid}). Exiting."
+            if pid
+            else "Another instance of aw-qt is already running. Exiting."
+        )
         logger.warning(msg)
         print(msg)
         sys.exit(1)
@@ -61,6 +58,17 @@ def _acquire_single_instance_lock(testing: bool) -> QLockFile:
     is_flag=True,
     help="Start aw-qt without a graphical user interface (terminal output only)",
 )
+@click.option(
+    "--trace",
+    "trace_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record a timeline of startup and module events to FILE, in Chrome trace-event format (for Perfetto or chrome://tracing)",
+)
+@click.option(
+    "--rediscover",
+    is_flag=True,
+    help="Rescan all directories for modules instead of using the discovery cache",
+)
 @click.option(
     "-i",
     "--interactive",
@@ -73,13 +81,20 @@ def main(
     verbose: bool,
     autostart_modules: Optional[str],
     no_gui: bool,
+    rediscover: bool,
+    trace_file: Optional[str],
     interactive_cli: bool,
 ) -> None:
+    started_at = monotonic()
+    if trace_file:
+        tracing.enable(trace_file)
+
     # Since the .app can crash when started from Finder for unknown reasons, we send a syslog message here to make debugging easier.
     if platform.system() == "Darwin":
         subprocess.call("syslog -s 'aw-qt started'", shell=True)
 
-    setup_logging("aw-qt", testing=testing, verbose=verbose, log_file=True)
+    with tracing.span("setup logging", cat="startup"):
+        setup_logging("aw-qt", testing=testing, verbose=verbose, log_file=True)
     logger.info("Started aw-qt...")
 
     # Since the .app can crash when started from Finder for unknown reasons, we send a syslog message here to make debugging easier.
@@ -87,7 +102,8 @@ def main(
         subprocess.call("syslog -s 'aw-qt successfully started logging'", shell=True)
 
     # Prevent multiple instances from running simultaneously
-    _lock = _acquire_single_instance_lock(testing)  # noqa: F841 (must stay alive)
+    with tracing.span("acquire instance lock", cat="startup"):
+        _lock = _acquire_single_instance_lock(testing)  # noqa: F841 (must stay alive)
 
     # Create a process group, become its leader
     # TODO: This shouldn't go here
@@ -100,21 +116,52 @@ def main(
         except PermissionError:
             pass
 
-    config = AwQtSettings(testing=testing)
+    with tracing.span("load settings", cat="startup"):
+        config = AwQtSettings(testing=testing)
     _autostart_modules = (
         [m.strip() for m in autostart_modules.split(",") if m and m.lower() != "none"]
         if autostart_modules
         else config.autostart_modules
     )
 
-    manager = Manager(testing=testing)
-    manager.autostart(_autostart_modules)
+    forkserver = None
+    if config.forkserver:
+        from .forkserver import ForkServerPool
+
+        forkserver = ForkServerPool(config.forkserver_preload)
+    manager = Manager(
+        testing=testing,
+        module_settings=config.module_settings,
+        rediscover=rediscover,
+        # The rest of the modules are discovered when the tray menu needs them
+        discover_only=_autostart_modules,
+        shutdown_timeout=config.shutdown_timeout,
+        sample_interval=config.sample_interval,
+        stall_check_interval=config.stall_check_interval,
+        quarantine=QuarantineStore.default(testing),
+        forkserver=forkserver,
+    )
+    manager.autostart(_autostart_modules, config.dependencies)
+    logger.info(f"Modules started {monotonic() - started_at:.2f}s after launch")
+    tracing.instant("modules started", cat="startup")
+    manager.sampler.start()
+    manager.stall_detector.start()
+    metrics_server = None
+    if config.metrics_port:
+        from .metrics import MetricsServer
+
+        metrics_server = MetricsServer(manager, config.metrics_port)
+        metrics_server.start()
+    control = ControlServer(manager, get_socket_path(testing))
+    control.start()
 
     if not no_gui and not interactive_cli:
         from . import trayicon  # pylint: disable=import-outside-toplevel
 
         # run the trayicon, wait for signal to quit
-        error_code = trayicon.run(manager, testing=testing, port=config.port)
+        error_code = trayicon.run(
+            manager, testing=testing, server_config=config.server_config
+        )
     elif interactive_cli:
         # just an experiment, don't really see the use right now
         _interactive_cli(manager)
@@ -132,6 +179,9 @@ def main(
 
         error_code = 0
 
+    control.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
     manager.stop_all()
     sys.exit(error_code)
 
@@ -146,7 +196,7 @@ def _interactive_cli(manager: Manager) -> None:
         t = tokens[0]
         if t == "start":
             if len(tokens) == 2:
-                manager.start(tokens[1])
+                manager.start(tokens[1], by_hand=True)
             else:
                 print("Usage: start <module>")
         elif t == "stop":
@@ -159,6 +209,20 @@ def _interactive_cli(manager: Manager) -> None:
                 manager.print_status()
             elif len(tokens) == 2:
                 manager.print_status(tokens[1])
+        elif t == "log":
+            if len(tokens) == 2:
+                manager.print_log(tokens[1])
+            elif len(tokens) == 3 and tokens[2].isdigit():
+                manager.print_log(tokens[1], max_lines=int(tokens[2]))
+            else:
+                print("Usage: log <module> [lines]")
+        elif t == "output":
+            if len(tokens) == 2:
+                manager.print_output(tokens[1])
+            elif len(tokens) == 3 and tokens[2].isdigit():
+                manager.print_output(tokens[1], max_lines=int(tokens[2]))
+            else:
+                print("Usage: output <module> [lines]")
         elif not t.strip():
             # if t was empty string, or just whitespace, pretend like we didn't see that
             continue
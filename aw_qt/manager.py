@@ -1,19 +1,58 @@
 import os
 import sys
 import logging
+import random
 import subprocess
 import platform
-import urllib.error
-import urllib.request
+import signal
+import threading
 from pathlib import Path
-from glob import glob
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from time import monotonic, sleep
-from typing import Optional, List, Hashable, Set, Iterable
-
-import aw_core
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Optional,
+    List,
+    Hashable,
+    Mapping,
+    NamedTuple,
+    Set,
+    Iterable,
+    Union,
+)
+
+from . import logs, metrics, tracing
+from .discovery import DiscoveryCache, Entry
+from .lifecycle import ALIVE, STARTABLE, Lifecycle, State, Transition
+from .output import OutputBuffer, OutputConfig, _output_reader
+from .procstats import ProcessStats, Sampler, format_uptime
+from .probes import (
+    HttpProbe,
+    ProbeWorker,
+    ReadinessProbe,
+    ServerProbeClient,
+    make_readiness_probe,
+    wait_until_ready,
+)
+from .quarantine import QuarantineStore
+from .selectorthread import SelectorThread
+from .stall import StallDetector, StallPolicy
+
+if TYPE_CHECKING:
+    # Only needed once modules are forked, or have limits
+    from .forkserver import ForkedProcess, ForkServerPool
+    from .limits import LaunchPolicy
 
 logger = logging.getLogger(__name__)
 
+# A module's process, either started directly or forked from a forkserver
+Process = Union["subprocess.Popen[str]", "ForkedProcess"]
+
 # The path of aw_qt
 _module_dir = os.path.dirname(os.path.realpath(__file__))
 
@@ -38,6 +77,10 @@ def filter_modules(modules: Iterable["Module"]) -> Set["Module"]:
 def is_executable(path: str, filename: str) -> bool:
     if not os.path.isfile(path):
         return False
+    return _is_executable_file(path, filename)
+
+
+def _is_executable_file(path: str, filename: str) -> bool:
     # On Windows, .exe/.bat/.cmd files are executables
     if platform.system() == "Windows":
         return (
@@ -55,21 +98,70 @@ def is_executable(path: str, filename: str) -> bool:
         return True
 
 
-def _discover_modules_in_directory(path: str) -> List["Module"]:
+def _scan_directory(path: str) -> List[Entry]:
+    """List the entries of a directory that may be modules, and what kind they are"""
+    entries: List[Entry] = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith("aw-"):
+                entries.append((entry.name, _entry_kind(entry)))
+    return entries
+
+
+def _entry_kind(entry: "os.DirEntry[str]") -> str:
+    # is_file() and is_dir() use the file type from the directory listing,
+    # so only symlinks need an extra stat
+    try:
+        if entry.is_file():
+            if _is_executable_file(entry.path, entry.name):
+                return "executable"
+        elif entry.is_dir():
+            if os.access(entry.path, os.X_OK):
+                return "directory"
+    except OSError:
+        pass
+    return "other"
+
+
+def _lookup_executables(path: str, names: Iterable[str]) -> List[Entry]:
+    """Look up specific module names in a directory, without listing it"""
+    extensions = [".exe", ".bat", ".cmd"] if platform.system() == "Windows" else [""]
+    entries: List[Entry] = []
+    for name in names:
+        for ext in extensions:
+            basename = name + ext
+            if is_executable(os.path.join(path, basename), basename):
+                entries.append((basename, "executable"))
+                break
+    return entries
+
+
+def _list_directory(path: str, cache: Optional[DiscoveryCache]) -> List[Entry]:
+    if cache is None:
+        return _scan_directory(path)
+    return cache.list_directory(path, _scan_directory)
+
+
+def _discover_modules_in_directory(
+    path: str, cache: Optional[DiscoveryCache] = None
+) -> List["Module"]:
     """Look for modules in given directory path and recursively in subdirs matching aw-*"""
     modules = []
-    matches = glob(os.path.join(path, "aw-*"))
-    for path in matches:
-        basename = os.path.basename(path)
+    try:
+        entries = _list_directory(path, cache)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return []
+    for basename, kind in entries:
         name = _filename_to_name(basename)
         if name in ignored_filenames:
             continue
-        if is_executable(path, basename) and basename.startswith("aw-"):
-            modules.append(Module(name, Path(path), "bundled"))
-        elif os.path.isdir(path) and os.access(path, os.X_OK):
-            modules.extend(_discover_modules_in_directory(path))
+        entry_path = os.path.join(path, basename)
+        if kind == "executable":
+            modules.append(Module(name, Path(entry_path), "bundled"))
+        elif kind == "directory":
+            modules.extend(_discover_modules_in_directory(entry_path, cache))
         else:
-            logger.warning(f"Found matching file but was not executable: {path}")
+            logger.warning(f"Found matching file but was not executable: {entry_path}")
     return modules
 
 
@@ -81,8 +173,11 @@ def _filename_to_name(filename: str) -> str:
     return filename
 
 
-def _discover_modules_bundled() -> List["Module"]:
-    """Use ``_discover_modules_in_directory`` to find all bundled modules"""
+def _discover_modules_bundled(
+    cache: Optional[DiscoveryCache] = None,
+    names: Optional[Iterable[str]] = None,
+) -> List["Module"]:
+    """Use ``_discover_modules_in_directory`` to find all bundled modules, or only the ones in ``names``"""
     search_paths = [_module_dir, _parent_dir]
     if platform.system() == "Darwin":
         macos_dir = os.path.abspath(os.path.join(_parent_dir, os.pardir, "MacOS"))
@@ -91,16 +186,18 @@ def _discover_modules_bundled() -> List["Module"]:
 
     modules: List[Module] = []
     for path in search_paths:
-        modules += _discover_modules_in_directory(path)
+        modules += _discover_modules_in_directory(path, cache)
 
     modules = list(filter_modules(modules))
+    if names is not None:
+        wanted = set(names)
+        modules = [m for m in modules if m.name in wanted]
     logger.info(f"Found {len(modules)} bundled modules")
     _log_modules(modules)
     return modules
 
 
-def _discover_modules_system() -> List["Module"]:
-    """Find all aw- modules in PATH"""
+def _system_search_paths() -> List[str]:
     search_paths = os.get_exec_path()
 
     # Needed because PyInstaller adds the executable dir to the PATH
@@ -122,23 +219,43 @@ def _discover_modules_system() -> List["Module"]:
                 search_paths.append(extra_path)
 
     # logger.debug(f"Searching for system modules in PATH: {search_paths}")
-    modules: List["Module"] = []
-    paths = [p for p in search_paths if os.path.isdir(p)]
-    for path in paths:
-        try:
-            ls = os.listdir(path)
-        except PermissionError:
-            logger.warning(f"PermissionError while listing {path}, skipping")
-            continue
+    return [p for p in search_paths if os.path.isdir(p)]
+
+
+def _discover_modules_system(
+    cache: Optional[DiscoveryCache] = None,
+    names: Optional[Iterable[str]] = None,
+) -> List["Module"]:
+    """
+    Find all aw- modules in PATH.
+
+    If ``names`` is given, only those modules are looked up (without listing any
+    directories), and the search stops as soon as all of them have been found.
+    """
+    wanted = set(names) - set(ignored_filenames) if names is not None else None
 
-        for basename in ls:
-            if not basename.startswith("aw-"):
+    modules: List["Module"] = []
+    seen: Set[str] = set()
+    for path in _system_search_paths():
+        if wanted is not None:
+            missing = wanted - seen
+            if not missing:
+                break
+            entries = _lookup_executables(path, sorted(missing))
+        else:
+            try:
+                entries = _list_directory(path, cache)
+            except PermissionError:
+                logger.warning(f"PermissionError while listing {path}, skipping")
                 continue
-            if not is_executable(os.path.join(path, basename), basename):
+
+        for basename, kind in entries:
+            if kind != "executable":
                 continue
             name = _filename_to_name(basename)
             # Only pick the first match (to respect PATH priority)
-            if name not in [m.name for m in modules]:
+            if name not in seen:
+                seen.add(name)
                 modules.append(Module(name, Path(path) / basename, "system"))
 
     modules = list(filter_modules(modules))
@@ -147,6 +264,127 @@ def _discover_modules_system() -> List["Module"]:
     return modules
 
 
+class _ChildWatcher:
+    """
+    Notifies a callback as soon as a watched child process exits.
+
+    On Linux, every child gets a pidfd and a single selector thread sleeps until one of
+    them becomes readable, so there is no periodic work while all children are alive.
+    Where pidfds aren't available, each child gets a waiter thread blocking in ``wait()``.
+    """
+
+    def __init__(self) -> None:
+        self._selector_thread = SelectorThread("aw-qt-child-watcher")
+
+    def watch(
+        self,
+        process: "subprocess.Popen[str]",
+        callback: Callable[["subprocess.Popen[str]"], None],
+    ) -> None:
+        pidfd = self._open_pidfd(process.pid)
+        if pidfd is None:
+            threading.Thread(
+                target=self._wait_blocking,
+                args=(process, callback),
+                name=f"aw-qt-wait-{process.pid}",
+                daemon=True,
+            ).start()
+            return
+
+        def on_exit(fd: int) -> None:
+            self._selector_thread.unregister(fd)
+            os.close(fd)
+            # Reap the child so that returncode gets set
+            process.poll()
+            self._notify(process, callback)
+
+        self._selector_thread.register(pidfd, on_exit)
+
+    @staticmethod
+    def _open_pidfd(pid: int) -> Optional[int]:
+        if not hasattr(os, "pidfd_open"):
+            return None
+        try:
+            return os.pidfd_open(pid)
+        except OSError:
+            # Kernel too old (< 5.3), or the process has already been reaped
+            return None
+
+    def _wait_blocking(
+        self,
+        process: "subprocess.Popen[str]",
+        callback: Callable[["subprocess.Popen[str]"], None],
+    ) -> None:
+        process.wait()
+        self._notify(process, callback)
+
+    @staticmethod
+    def _notify(
+        process: "subprocess.Popen[str]",
+        callback: Callable[["subprocess.Popen[str]"], None],
+    ) -> None:
+        try:
+            callback(process)
+        except Exception:
+            logger.exception(f"Error in exit callback for PID {process.pid}")
+
+
+_child_watcher = _ChildWatcher()
+_probe_worker = ProbeWorker()
+# Shared by every server module, so that those on the same port share a connection
+_probe_client = ServerProbeClient()
+
+
+class ExitInfo(NamedTuple):
+    """
+    An unexpected exit of a module, classified by ``classify_exit``, or the loss of the
+    external server a server module was using ("lost")
+    """
+
+    returncode: Optional[int]  # None if it ended without a process exiting
+    runtime: float  # seconds since the module was launched
+    kind: str  # "clean", "error", "killed", "signal", "early" or "lost"
+    reason: str = ""  # what happened instead, if returncode is None
+
+    def describe(self) -> str:
+        if self.returncode is None:
+            return self.reason
+        if self.returncode >= 0:
+            what = f"exit code {self.returncode}"
+        else:
+            what = f"killed by {_signal_name(-self.returncode)}"
+            if self.kind == "killed":
+                what += " (possibly out of memory)"
+        return f"{what} after {self.runtime:.1f}s"
+
+
+def _signal_name(signum: int) -> str:
+    try:
+        return signal.Signals(signum).name
+    except ValueError:
+        return f"signal {signum}"
+
+
+def classify_exit(returncode: int, runtime: float, early_exit: float) -> ExitInfo:
+    """
+    Classify an unexpected exit as either a "clean" exit (code 0), an "early" exit (a
+    failure within ``early_exit`` seconds of launch, likely to happen again at every
+    launch), or otherwise as an "error" (non-zero exit code), "killed" (by SIGKILL, as
+    done by the OOM killer) or "signal" (any other signal, such as a segfault).
+    """
+    if returncode == 0:
+        kind = "clean"
+    elif runtime < early_exit:
+        kind = "early"
+    elif returncode > 0 or sys.platform == "win32":
+        kind = "error"
+    elif -returncode == getattr(signal, "SIGKILL", None):
+        kind = "killed"
+    else:
+        kind = "signal"
+    return ExitInfo(returncode, runtime, kind)
+
+
 class Module:
     def __init__(self, name: str, path: Path, type: str) -> None:
         self.name = name
@@ -158,12 +396,36 @@ class Module:
         )
         # assert location in ["system", "bundled"]
         # self.location = "system" if _is_system_module(name) else "bundled"
-        self._process: Optional[subprocess.Popen[str]] = None
-        self._last_process: Optional[subprocess.Popen[str]] = None
+        self._process: Optional[Process] = None
+        self._last_process: Optional[Process] = None
         self._external_server: bool = False  # True if we detected an already-running server
         self._external_server_testing: bool = False
         self._external_server_probe_cache: Optional[bool] = None
-        self._external_server_probe_cache_at: float = 0.0
+        # The process stop() was last asked to terminate, whose exit isn't a crash
+        self._stopping_process: Optional[Process] = None
+        self._exit_listeners: List[Callable[["Module"], None]] = []
+        self.lifecycle = Lifecycle(name)
+
+        # Readiness, used to hold back dependents during autostart
+        self.readiness: Optional[ReadinessProbe] = None
+        self.ready_timeout: float = 30.0
+        self.time_to_ready: Optional[float] = None
+        self.stop_timeout: float = 5.0
+        self.shutdown_duration: Optional[float] = None
+        self.stats: Optional[ProcessStats] = None  # filled in by the Sampler
+        self.limits: Optional["LaunchPolicy"] = None
+        self.restart_policy = RestartPolicy()
+        self.last_exit: Optional[ExitInfo] = None
+        self.limit_errors: List[str] = []  # limits that couldn't be applied on start
+        self.output_config = OutputConfig()
+        self.output: Optional[OutputBuffer] = None  # output of the latest process
+        # Set by the Manager if Python modules are to be forked from a forkserver
+        self.forkserver: Optional["ForkServerPool"] = None
+        self.use_forkserver: bool = True
+        # How long the module's buckets may go without updates, see aw_qt/stall.py
+        self.stall_policy: Optional[StallPolicy] = StallPolicy.default(name)
+        self._started_at: float = 0.0
+        self._started_ts: float = 0.0  # the same, as a trace timestamp
 
     def __hash__(self) -> int:
         return hash((self.name, self.path))
@@ -174,6 +436,91 @@ class Module:
     def __repr__(self) -> str:
         return f"<Module {self.name} at {self.path}>"
 
+    def configure(self, settings: Mapping[str, Any]) -> None:
+        """Apply the module's settings from aw-qt.toml"""
+        if "readiness" in settings:
+            try:
+                self.readiness = make_readiness_probe(settings["readiness"], self.name)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Invalid readiness probe for {self.name}: {e}")
+        if "ready_timeout" in settings:
+            self.ready_timeout = float(settings["ready_timeout"])
+        if "stop_timeout" in settings:
+            self.stop_timeout = float(settings["stop_timeout"])
+        if "limits" in settings:
+            from .limits import LaunchPolicy
+
+            try:
+                self.limits = LaunchPolicy.from_settings(settings["limits"])
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Invalid limits for {self.name}: {e}")
+        if "restart" in settings:
+            try:
+                self.restart_policy = RestartPolicy.from_settings(settings["restart"])
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid restart policy for {self.name}: {e}")
+        if "forkserver" in settings:
+            self.use_forkserver = bool(settings["forkserver"])
+        if "output" in settings:
+            try:
+                self.output_config = OutputConfig.from_settings(settings["output"])
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid output settings for {self.name}: {e}")
+        if "stall" in settings:
+            try:
+                self.stall_policy = StallPolicy.from_settings(settings["stall"], self.name)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid stall settings for {self.name}: {e}")
+
+    def add_exit_listener(self, callback: Callable[["Module"], None]) -> None:
+        """Call ``callback`` (from a background thread) when the module's process exits unexpectedly."""
+        self._exit_listeners.append(callback)
+
+    def add_state_listener(
+        self, callback: Callable[["Module", Transition], None]
+    ) -> None:
+        """
+        Call ``callback`` with the module and the transition whenever the module's
+        lifecycle state changes, see ``aw_qt.lifecycle``.
+
+        Callbacks may be invoked from any thread, and must not block.
+        """
+        self.lifecycle.add_listener(lambda transition: callback(self, transition))
+
+    @property
+    def state(self) -> State:
+        return self.lifecycle.state
+
+    def _on_process_exit(self, process: Process) -> None:
+        # Ignore exits we caused ourselves, and exits of processes we've already replaced
+        if process is self._stopping_process or process is not self._process:
+            return
+        if self.output is not None:
+            # Let the output reader catch up, so the last output is there for listeners
+            self.output.wait_closed(timeout=0.5)
+        assert process.returncode is not None
+        self.last_exit = classify_exit(
+            process.returncode,
+            monotonic() - self._started_at,
+            self.restart_policy.early_exit,
+        )
+        logger.warning(
+            f"Module {self.name} exited unexpectedly ({self.last_exit.describe()})"
+        )
+        tracing.instant(
+            f"crash {self.name}", cat="module", returncode=process.returncode
+        )
+        metrics.inc("aw_qt_module_crashes", self.name)
+        self.lifecycle.set(State.CRASHED, self.last_exit.describe())
+        for callback in self._exit_listeners:
+            callback(self)
+
+    def _on_start_failed(self, error: Exception) -> None:
+        """Report a failure to launch like an exit right after launch"""
+        self.last_exit = ExitInfo(None, 0.0, "early", f"failed to start: {error}")
+        for callback in self._exit_listeners:
+            callback(self)
+
     def _get_server_port(self, testing: bool) -> Optional[int]:
         if self.name not in ("aw-server", "aw-server-rust"):
             return None
@@ -189,29 +536,61 @@ class Module:
         if port is None:
             return False
 
-        try:
-            with urllib.request.urlopen(
-                f"http://localhost:{port}/api/0/info", timeout=timeout
-            ):
-                return True
-        except (urllib.error.URLError, OSError):
-            return False
-
-    def _probe_external_server_cached(self, testing: bool, max_age: float = 1.0) -> bool:
-        now = monotonic()
-        if (
-            self._external_server_probe_cache is not None
-            and now - self._external_server_probe_cache_at < max_age
-        ):
-            return self._external_server_probe_cache
-
-        alive = self._probe_external_server(testing)
+        started_at = monotonic()
+        with tracing.span(f"probe {self.name}", cat="probe", port=port):
+            try:
+                return _probe_client.probe(port, timeout)
+            finally:
+                metrics.observe(
+                    "aw_qt_probe_latency_seconds", self.name, monotonic() - started_at
+                )
+
+    def _on_external_server_probe(self, alive: bool) -> None:
+        """Called from the probe worker with the result of re-probing an external server."""
+        if not self._external_server:
+            # Stopped while the probe was in flight
+            return
         self._external_server_probe_cache = alive
-        self._external_server_probe_cache_at = now
-        return alive
+        if not alive:
+            logger.warning(f"External server for {self.name} is no longer reachable")
+            self._clear_external_server()
+            self.last_exit = ExitInfo(
+                None,
+                monotonic() - self._started_at,
+                "lost",
+                "external server no longer reachable",
+            )
+            self.lifecycle.set(State.CRASHED, self.last_exit.reason)
+            for callback in self._exit_listeners:
+                callback(self)
+
+    def _clear_external_server(self) -> None:
+        _probe_worker.unmonitor(self)
+        self._external_server = False
+        self._external_server_testing = False
+        self._external_server_probe_cache = None
 
     def start(self, testing: bool) -> None:
+        """
+        Start the module, unless it's already starting or running, in which case the
+        request is merged with the one already in progress.
+        """
+        if not self.lifecycle.compare_and_set(STARTABLE, State.STARTING):
+            logger.info(f"Module {self.name} is {self.state}, not starting it again")
+            return
+        try:
+            with tracing.span(f"start {self.name}", cat="module"):
+                self._start(testing)
+        except BaseException as e:
+            self.lifecycle.set(State.CRASHED, f"failed to start: {e}")
+            raise
+
+    def _start(self, testing: bool) -> None:
         logger.info(f"Starting module {self.name}")
+        self._started_at = monotonic()
+        self._started_ts = tracing.now()
+        self.time_to_ready = None
+        self.last_exit = None
 
         # For server modules, check if a server is already running before attempting
         # to start one. This avoids port conflicts and the confusing "Restart" requirement
@@ -225,8 +604,9 @@ class Module:
             self._external_server = True
             self._external_server_testing = testing
             self._external_server_probe_cache = True
-            self._external_server_probe_cache_at = monotonic()
             self.started = True
+            _probe_worker.monitor(self, testing)
+            self.lifecycle.set(State.EXTERNAL, f"server already running on port {port}")
             return
 
         exec_cmd = [str(self.path)]
@@ -246,18 +626,108 @@ class Module:
 
             AppKit.NSBundle.mainBundle().infoDictionary()["LSBackgroundOnly"] = "1"
 
-        # There is a very good reason stdout and stderr is not PIPE here
+        if self.readiness is not None:
+            self.readiness.reset()
+        if self._process is not None:
+            self._last_process = self._process
+
+        # Output goes to a pipe that the output reader drains continuously, since a
+        # pipe that isn't read blocks the module once it's full.
         # See: https://github.com/ActivityWatch/aw-server/issues/27
-        self._process = subprocess.Popen(
-            exec_cmd, universal_newlines=True, startupinfo=startupinfo
-        )
+        read_fd, write_fd = os.pipe()
+        forked: Optional["ForkedProcess"] = None
+        popen: Optional["subprocess.Popen[str]"] = None
+        try:
+            if self.forkserver is not None and self.use_forkserver:
+                forked = self.forkserver.spawn(exec_cmd, write_fd)
+            if forked is not None:
+                logger.debug(f"Forked module {self.name} from forkserver")
+                self._process = forked
+            else:
+                self._process = popen = subprocess.Popen(
+                    exec_cmd,
+                    universal_newlines=True,
+                    startupinfo=startupinfo,
+                    stdout=write_fd,
+                    stderr=write_fd,
+                )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        self.output = self.output_config.create_buffer(self.name, testing)
+        _output_reader.add(read_fd, self.output)
         self.started = True
+        metrics.inc("aw_qt_module_starts", self.name)
+        # Before watching for its exit, which may come right away and would otherwise
+        # be overwritten
+        self.lifecycle.set(State.RUNNING)
+        if forked is not None:
+            # Only the forkserver can wait for it, and reports its exit
+            forked.add_exit_callback(self._on_process_exit)
+        else:
+            assert popen is not None
+            _child_watcher.watch(popen, self._on_process_exit)
+        if self.limits is not None:
+            self.limit_errors = self.limits.apply(self.name, self._process.pid)
+
+    def _get_readiness_probe(self, testing: bool) -> Optional[ReadinessProbe]:
+        if self.readiness is not None:
+            return self.readiness
+        # Servers are ready once they respond to API requests
+        port = self._get_server_port(testing)
+        if port is not None:
+            return HttpProbe(f"http://localhost:{port}/api/0/info")
+        return None
+
+    def wait_ready(self, testing: bool) -> bool:
+        """
+        Blocks until the module reports ready (or the ready timeout is hit), and records
+        the time it took in ``time_to_ready``.
+
+        Modules without a readiness probe are considered ready once started.
+        """
+        if not self.started:
+            return False
+        probe = self._get_readiness_probe(testing)
+        if probe is None or self._external_server:
+            ready = True
+        else:
+            ready = wait_until_ready(
+                probe, self.ready_timeout, abort=lambda: not self.is_alive()
+            )
+
+        if ready:
+            self.time_to_ready = monotonic() - self._started_at
+            metrics.observe(
+                "aw_qt_module_time_to_ready_seconds", self.name, self.time_to_ready
+            )
+            self.lifecycle.compare_and_set({State.RUNNING}, State.READY)
+            logger.info(f"Module {self.name} ready after {self.time_to_ready:.2f}s")
+            tracing.complete(
+                f"{self.name} start to ready",
+                self._started_ts,
+                tracing.now(),
+                cat="module",
+            )
+        elif not self.is_alive():
+            logger.warning(f"Module {self.name} exited before becoming ready")
+        else:
+            logger.warning(
+                f"Module {self.name} not ready after {self.ready_timeout:.0f}s ({probe})"
+            )
+        return ready
 
-    def stop(self) -> None:
+    def stop(self, timeout: Optional[float] = None) -> None:
         """
         Stops a module, and waits until it terminates.
+
+        If the module hasn't exited ``timeout`` seconds (default: ``stop_timeout``)
+        after being asked to, it's killed.
         """
-        # TODO: What if a module doesn't stop? Add timeout to p.wait() and then do a p.kill() if timeout is hit
+        if timeout is None:
+            timeout = self.stop_timeout
         if not self.started:
             logger.warning(
                 f"Tried to stop module {self.name}, but it hasn't been started"
@@ -268,11 +738,9 @@ class Module:
             logger.info(
                 f"Module {self.name} is using an external server instance, not stopping it"
             )
-            self._external_server = False
-            self._external_server_testing = False
-            self._external_server_probe_cache = None
-            self._external_server_probe_cache_at = 0.0
+            self._clear_external_server()
             self.started = False
+            self.lifecycle.set(State.STOPPED)
             return
         elif not self.is_alive():
             logger.warning(f"Tried to stop module {self.name}, but it wasn't running")
@@ -280,17 +748,37 @@ class Module:
             if not self._process:
                 logger.error("No reference to process object")
             logger.debug(f"Stopping module {self.name}")
-            if self._process:
-                self._process.terminate()
-            logger.debug(f"Waiting for module {self.name} to shut down")
-            if self._process:
-                self._process.wait()
-            logger.info(f"Stopped module {self.name}")
+            self._stopping_process = self._process
+            self.lifecycle.set(State.STOPPING)
+            started_at = monotonic()
+            with tracing.span(f"stop {self.name}", cat="module"):
+                if self._process:
+                    self._terminate(self._process, timeout)
+            self.shutdown_duration = monotonic() - started_at
+            logger.info(
+                f"Stopped module {self.name} in {self.shutdown_duration:.2f}s"
+            )
 
         assert not self.is_alive()
         self._last_process = self._process
         self._process = None
         self.started = False
+        # A quarantined module stays quarantined until released (see reset_crash_state)
+        self.lifecycle.compare_and_set(set(State) - {State.QUARANTINED}, State.STOPPED)
+
+    def _terminate(self, process: Process, timeout: float) -> None:
+        process.terminate()
+        logger.debug(f"Waiting for module {self.name} to shut down")
+        try:
+            process.wait(timeout=max(timeout, 0))
+            return
+        except subprocess.TimeoutExpired:
+            pass
+        logger.warning(
+            f"Module {self.name} didn't shut down within {timeout:.1f}s, killing it"
+        )
+        process.kill()
+        process.wait()
 
     def toggle(self, testing: bool) -> None:
         if self.is_alive():
@@ -303,16 +791,9 @@ class Module:
 
     def is_alive(self) -> bool:
         if self._external_server:
-            # We don't own this process, so re-probe the server instead.
-            # Cache short-lived probe results to avoid blocking repeated UI poll
-            # cycles on the main thread when multiple checks happen close together.
-            alive = self._probe_external_server_cached(self._external_server_testing)
-            if not alive:
-                self._external_server = False
-                self._external_server_testing = False
-                self._external_server_probe_cache = None
-                self._external_server_probe_cache_at = 0.0
-            return alive
+            # We don't own this process, so the probe worker keeps re-probing the server
+            # in the background. Never block the caller (usually the GUI thread) on it.
+            return bool(self._external_server_probe_cache)
         if self._process is None:
             return False
 
@@ -320,22 +801,338 @@ class Module:
         # If returncode is none after p.poll(), module is still running
         return True if self._process.returncode is None else False
 
-    def read_log(self, testing: bool) -> str:
-        """Useful if you want to retrieve the logs of a module"""
-        log_path = aw_core.log.get_latest_log_file(self.name, testing)
-        if log_path:
-            with open(log_path) as f:
-                return f.read()
-        else:
+    def uptime(self) -> Optional[float]:
+        """Seconds since the module's process was started, if it's running"""
+        if self._external_server or not self.is_alive():
+            return None
+        return monotonic() - self._started_at
+
+    def usage_summary(self) -> str:
+        """Uptime and resource usage of the module, or an empty string if not running"""
+        uptime = self.uptime()
+        if uptime is None:
+            return ""
+        stats = self.stats
+        process = self._process
+        # Stats of a previous process are kept until the new one is first sampled
+        current = stats is not None and process is not None and stats.pid == process.pid
+        usage = stats.summary() if stats is not None and current else ""
+        return f"up {format_uptime(uptime)}" + (f", {usage}" if usage else "")
+
+    def read_output(self, max_lines: int = 50) -> str:
+        """The last ``max_lines`` lines of stdout and stderr of the module's latest process"""
+        if self.output is None:
+            return ""
+        return self.output.tail(max_lines)
+
+    def read_log(self, testing: bool, max_lines: int = logs.DEFAULT_MAX_LINES) -> str:
+        """
+        The last ``max_lines`` lines of the module's logs, spanning rotated log files.
+
+        Only the end of the log files is read, so this is cheap even for huge logs.
+        """
+        log_files = logs.find_log_files(self.name, testing)
+        if not log_files:
             return "No log file found"
+        return logs.tail(log_files, max_lines=max_lines)
+
+
+def _dependency_graph(
+    names: List[str], dependencies: Dict[str, List[str]]
+) -> Dict[str, Set[str]]:
+    """Map each module name to the set of modules in ``names`` it depends on."""
+    servers = [n for n in ("aw-server-rust", "aw-server") if n in names]
+    graph: Dict[str, Set[str]] = {}
+    for name in names:
+        if name in dependencies:
+            deps = set(dependencies[name])
+        elif name in ("aw-server", "aw-server-rust"):
+            deps = set()
+        else:
+            deps = set(servers)
+        graph[name] = (deps & set(names)) - {name}
+    return graph
+
+
+def _reverse_graph(graph: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    """Map each node of ``graph`` to the set of nodes that depend on it."""
+    reverse: Dict[str, Set[str]] = {name: set() for name in graph}
+    for name, deps in graph.items():
+        for dep in deps:
+            reverse[dep].add(name)
+    return reverse
+
+
+def _run_in_dependency_order(
+    graph: Dict[str, Set[str]], fn: Callable[[str], None], verb: str
+) -> None:
+    """
+    Call ``fn`` for every node in ``graph``, each once ``fn`` has returned for all of
+    its dependencies, and concurrently where dependencies allow.
+    """
+    pending = {name: set(deps) for name, deps in graph.items()}
+    if not pending:
+        return
+
+    with ThreadPoolExecutor(
+        max_workers=len(pending), thread_name_prefix=f"aw-qt-{verb}"
+    ) as executor:
+        running: Dict["Future[None]", str] = {}
+
+        def launch_ready() -> None:
+            for name in [n for n, deps in pending.items() if not deps]:
+                del pending[name]
+                running[executor.submit(fn, name)] = name
+
+        launch_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                exc = future.exception()
+                if exc is not None:
+                    logger.error(f"Failed to {verb} {name}", exc_info=exc)
+                for deps in pending.values():
+                    deps.discard(name)
+            launch_ready()
+
+        if pending:
+            logger.error(
+                f"Dependency cycle between {', '.join(sorted(pending))}, "
+                f"ignoring the order between them"
+            )
+            futures = {executor.submit(fn, name): name for name in sorted(pending)}
+            for future, name in futures.items():
+                exc = future.exception()
+                if exc is not None:
+                    logger.error(f"Failed to {verb} {name}", exc_info=exc)
+
+
+class RestartPolicy:
+    """
+    How a module is restarted after it crashes: after a delay growing exponentially with
+    the number of recent restarts, and at most ``max_restarts`` times within ``window``
+    seconds, after which it's quarantined. A module that exits within ``early_exit``
+    seconds of being launched ``max_early_exits`` times in a row (even across restarts
+    of aw-qt) is quarantined right away, since it's unlikely to ever come up. The count
+    starts over once a launch lasts longer than that, or the module is stopped.
+
+    Configured with a ``restart`` table in the module's settings in aw-qt.toml.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float = 1.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.1,
+        max_delay: float = 60.0,
+        max_restarts: int = 3,
+        window: float = 600.0,
+        early_exit: float = 5.0,
+        max_early_exits: int = 3,
+    ) -> None:
+        if initial_delay < 0 or multiplier < 1 or not 0 <= jitter < 1:
+            raise ValueError("invalid restart policy")
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_delay = max_delay
+        self.max_restarts = max_restarts
+        self.window = window
+        self.early_exit = early_exit
+        self.max_early_exits = max_early_exits
+
+    @classmethod
+    def from_settings(cls, settings: Mapping[str, Any]) -> "RestartPolicy":
+        fields = {
+            "initial_delay": float,
+            "multiplier": float,
+            "jitter": float,
+            "max_delay": float,
+            "max_restarts": int,
+            "window": float,
+            "early_exit": float,
+            "max_early_exits": int,
+        }
+        unknown = set(settings) - set(fields)
+        if unknown:
+            raise ValueError(f"unknown restart settings: {', '.join(sorted(unknown))}")
+        return cls(**{k: fields[k](v) for k, v in settings.items()})
+
+    def delay(self, attempt: int) -> float:
+        """The delay before restart number ``attempt`` (counting from 0) in the window"""
+        delay = min(self.initial_delay * self.multiplier**attempt, self.max_delay)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class _RestartHistory:
+    def __init__(self, policy: RestartPolicy) -> None:
+        self.policy = policy
+        # Only the last max_restarts restarts matter for the budget
+        self._times: Deque[float] = deque(maxlen=max(policy.max_restarts, 1))
+
+    def recent(self, now: float) -> int:
+        cutoff = now - self.policy.window
+        return sum(1 for t in self._times if t > cutoff)
+
+    def record(self, now: float) -> None:
+        self._times.append(now)
+
+
+class Restarter:
+    """
+    Restarts crashed modules according to their ``RestartPolicy``, from a timer thread.
+
+    Used by the Manager for every unexpected exit, so crashed modules are restarted with
+    or without the tray.
+    """
+
+    def __init__(self, testing: bool) -> None:
+        self.testing = testing
+        self._lock = threading.Lock()
+        self._histories: Dict[Module, _RestartHistory] = {}
+        self._timers: Dict[Module, threading.Timer] = {}
+
+    def _history(self, module: Module) -> _RestartHistory:
+        history = self._histories.get(module)
+        if history is None or history.policy is not module.restart_policy:
+            history = self._histories[module] = _RestartHistory(module.restart_policy)
+        return history
+
+    def recent_restarts(self, module: Module) -> int:
+        with self._lock:
+            return self._history(module).recent(monotonic())
+
+    def is_scheduled(self, module: Module) -> bool:
+        with self._lock:
+            return module in self._timers
+
+    def on_exit(self, module: Module) -> Optional[float]:
+        """
+        Schedule a restart of ``module``, which has exited unexpectedly, returning the
+        delay until it's restarted, or None if its restart budget is used up. If a
+        restart is already scheduled, that one's delay is returned instead.
+        """
+        policy = module.restart_policy
+        with self._lock:
+            if module in self._timers:
+                return self._timers[module].interval
+            history = self._history(module)
+            now = monotonic()
+            recent = history.recent(now)
+            if recent >= policy.max_restarts:
+                logger.warning(
+                    f"Module {module.name} crashed {recent} times within "
+                    f"{policy.window / 60:.0f} minutes, not restarting it"
+                )
+                return None
+            delay = policy.delay(recent)
+            history.record(now)
+            timer = threading.Timer(delay, self._restart, args=(module,))
+            timer.name = f"aw-qt-restart-{module.name}"
+            timer.daemon = True
+            self._timers[module] = timer
+        module.lifecycle.set(State.BACKOFF, f"restarting in {delay:.1f}s")
+        logger.info(
+            f"Restarting crashed module {module.name} in {delay:.1f}s "
+            f"(attempt {recent + 1}/{policy.max_restarts} "
+            f"in {policy.window / 60:.0f}min window)"
+        )
+        timer.start()
+        return delay
+
+    def _restart(self, module: Module) -> None:
+        with self._lock:
+            if self._timers.pop(module, None) is None:
+                return  # cancelled
+        # Stopped, or restarted by hand, while we were waiting
+        if not module.started or module.state is not State.BACKOFF:
+            return
+        tracing.instant(f"restart {module.name}", cat="module")
+        metrics.inc("aw_qt_module_auto_restarts", module.name)
+        # Merged with a start by hand if one is in progress
+        try:
+            module.start(self.testing)
+        except Exception as e:
+            # e.g. its executable was removed while waiting
+            logger.error(f"Failed to restart module {module.name}: {e}")
+            module._on_start_failed(e)
+
+    def cancel(self, module: Module) -> None:
+        with self._lock:
+            timer = self._timers.pop(module, None)
+        if timer is not None:
+            timer.cancel()
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            timers = list(self._timers.values())
+            self._timers.clear()
+        for timer in timers:
+            timer.cancel()
+
+    def reset(self, module: Module) -> None:
+        """Forget the restart history of ``module``, e.g. when it's restarted by hand"""
+        self.cancel(module)
+        with self._lock:
+            self._histories.pop(module, None)
 
 
 class Manager:
-    def __init__(self, testing: bool = False) -> None:
-        self.modules: List[Module] = []
+    def __init__(
+        self,
+        testing: bool = False,
+        module_settings: Optional[Dict[str, Dict[str, Any]]] = None,
+        rediscover: bool = False,
+        discover_only: Optional[Iterable[str]] = None,
+        shutdown_timeout: float = 10.0,
+        sample_interval: float = 5.0,
+        quarantine: Optional[QuarantineStore] = None,
+        forkserver: Optional["ForkServerPool"] = None,
+        stall_check_interval: float = 60.0,
+    ) -> None:
+        """
+        If ``discover_only`` is given, only those modules (usually the ones to
+        autostart) are discovered up front, so they can be started right away.
+        The rest are discovered on first use of ``ensure_discovered``.
+
+        If ``forkserver`` is given, Python modules are forked from it rather than
+        started as a fresh interpreter.
+        """
+        self._modules: List[Module] = []
+        self._modules_by_name: Dict[str, List[Module]] = {}
+        self._registry_lock = threading.Lock()
+        self._fully_discovered = False
         self.testing = testing
+        self.module_settings = module_settings or {}
+        self._exit_listeners: List[Callable[[Module], None]] = []
+        self._state_listeners: List[Callable[[Module, Transition], None]] = []
+        self.probe_worker = _probe_worker
+        self.restarter = Restarter(testing)
+        self.quarantine = quarantine or QuarantineStore(None)
+        self.forkserver = forkserver
+        self.autostart_duration: Optional[float] = None
+        self.dependencies: Dict[str, List[str]] = {}
+        self.shutdown_timeout = shutdown_timeout
+        # Started by whoever runs the modules, with start()
+        self.sampler = Sampler(lambda: self.modules, sample_interval)
+        self.stall_detector = StallDetector(self, _probe_client, stall_check_interval)
+        self._rediscover = rediscover
+        self._discovery_cache: Optional[DiscoveryCache] = None
+
+        self.discover_modules(discover_only)
 
-        self.discover_modules()
+    @property
+    def modules(self) -> List[Module]:
+        return self._modules
+
+    @modules.setter
+    def modules(self, modules: List[Module]) -> None:
+        with self._registry_lock:
+            self._modules = []
+            self._modules_by_name = {}
+        for m in modules:
+            self._add_module(m)
 
     @property
     def modules_system(self) -> List[Module]:
@@ -345,73 +1142,322 @@ class Manager:
     def modules_bundled(self) -> List[Module]:
         return [m for m in self.modules if m.type == "bundled"]
 
-    def discover_modules(self) -> None:
-        # These should always be bundled with aw-qt
-        modules = set(_discover_modules_bundled())
-        modules |= set(_discover_modules_system())
-        modules = filter_modules(modules)
+    def discover_modules(self, names: Optional[Iterable[str]] = None) -> None:
+        """Discover all modules, or only the ones in ``names``, and add them to the registry"""
+        if names is not None:
+            names = list(names)
+            if not names:
+                return
+        if self._discovery_cache is None:
+            self._discovery_cache = DiscoveryCache.default(force=self._rediscover)
+        cache = self._discovery_cache
+
+        with tracing.span(
+            "discover modules" if names is None else "discover autostart modules",
+            cat="startup",
+        ):
+            # These should always be bundled with aw-qt
+            modules = set(_discover_modules_bundled(cache, names))
+            modules |= set(_discover_modules_system(cache, names))
+            modules = filter_modules(modules)
+        logger.debug(
+            f"Module discovery: {cache.hits} directories unchanged, {cache.misses} scanned"
+        )
+        cache.save()
 
         # update one by one
         for m in modules:
-            if m not in self.modules:
-                self.modules.append(m)
+            self._add_module(m)
+        if names is None:
+            self._fully_discovered = True
+
+    @property
+    def fully_discovered(self) -> bool:
+        return self._fully_discovered
+
+    def ensure_discovered(self) -> None:
+        """Discover the full catalogue of modules, if that hasn't been done yet"""
+        if not self._fully_discovered:
+            self.discover_modules()
+
+    def _add_module(self, m: Module) -> None:
+        with self._registry_lock:
+            same_name = self._modules_by_name.setdefault(m.name, [])
+            if m in same_name:
+                return
+            same_name.append(m)
+            self._modules.append(m)
+        m.configure(self.module_settings.get(m.name, {}))
+        m.forkserver = self.forkserver
+        m.add_exit_listener(self._on_module_exit)
+        m.add_state_listener(self._on_module_transition)
+        reason = self.quarantine.reason(m.name)
+        if reason:
+            m.lifecycle.compare_and_set({State.STOPPED}, State.QUARANTINED, reason)
+
+    def add_exit_listener(self, callback: Callable[[Module], None]) -> None:
+        """
+        Register a callback for unexpected module exits.
+
+        Callbacks are invoked from the child watcher thread as soon as a module's process
+        exits, so GUI code needs to hand the event over to its own thread.
+        """
+        self._exit_listeners.append(callback)
+
+    def _on_module_exit(self, module: Module) -> None:
+        self._handle_exit(module)
+        for callback in self._exit_listeners:
+            callback(module)
+
+    def _handle_exit(self, module: Module) -> None:
+        """Decide whether to restart or quarantine a module that exited unexpectedly"""
+        policy = module.restart_policy
+        info = module.last_exit
+        if info is not None and info.kind == "clean":
+            logger.info(f"Module {module.name} exited cleanly, not restarting it")
+            self.quarantine.reset_early_exits(module.name)
+            module.lifecycle.set(State.STOPPED, "exited cleanly")
+            return
+        if info is not None and info.kind == "early":
+            early_exits = self.quarantine.record_early_exit(module.name)
+            if early_exits >= policy.max_early_exits:
+                self.quarantine.quarantine(
+                    module.name,
+                    f"exited right after launch {early_exits} times in a row "
+                    f"(last: {info.describe()})",
+                )
+                module.lifecycle.set(State.QUARANTINED, self.quarantine_reason(module) or "")
+                return
+        elif info is not None and info.kind != "lost":
+            self.quarantine.reset_early_exits(module.name)
+
+        if self.restarter.on_exit(module) is None:
+            recent = self.restarter.recent_restarts(module)
+            self.quarantine.quarantine(
+                module.name,
+                f"crashed {recent + 1} times within {policy.window / 60:.0f} minutes"
+                + (f" (last: {info.describe()})" if info else ""),
+            )
+            module.lifecycle.set(State.QUARANTINED, self.quarantine_reason(module) or "")
+
+    def _watch_launch(self, module: Module) -> None:
+        """Forget the early exits of ``module`` once this launch outlasts ``early_exit``"""
+        if not self.quarantine.early_exits(module.name):
+            return
+        timer = threading.Timer(
+            module.restart_policy.early_exit,
+            self._on_launch_lasted,
+            args=(module, module._started_at),
+        )
+        timer.name = f"aw-qt-launch-{module.name}"
+        timer.daemon = True
+        timer.start()
+
+    def _on_launch_lasted(self, module: Module, started_at: float) -> None:
+        # Unless it has exited since, or been relaunched (which has a timer of its own)
+        if module.state in ALIVE and module._started_at == started_at:
+            self.quarantine.reset_early_exits(module.name)
+
+    def quarantine_reason(self, module: Module) -> Optional[str]:
+        return self.quarantine.reason(module.name)
+
+    def reset_crash_state(self, module: Module) -> None:
+        """Forget the crashes of ``module``, when it's started again by hand"""
+        self.restarter.reset(module)
+        self.quarantine.release(module.name)
+        module.lifecycle.compare_and_set({State.QUARANTINED}, State.STOPPED, "released")
+
+    def add_state_listener(
+        self, callback: Callable[[Module, Transition], None]
+    ) -> None:
+        """Register a callback for the transitions of every module, see ``Module.add_state_listener``"""
+        self._state_listeners.append(callback)
+
+    def _on_module_transition(self, module: Module, transition: Transition) -> None:
+        if transition.state is State.RUNNING and transition.previous is State.STARTING:
+            self._watch_launch(module)
+        elif transition.state is State.STOPPED and transition.previous is State.STOPPING:
+            # Stopped by hand or on quit, so it didn't fail at launch
+            self.quarantine.reset_early_exits(module.name)
+        for callback in self._state_listeners:
+            callback(module, transition)
 
     def get_unexpected_stops(self) -> List[Module]:
         return list(filter(lambda x: x.started and not x.is_alive(), self.modules))
 
-    def start(self, module_name: str) -> None:
+    def _find_module(self, module_name: str) -> Optional[Module]:
         # NOTE: Will always prefer a bundled version, if available. This will not affect the
         #       aw-qt menu since it directly calls the module's start() method.
-        bundled = [m for m in self.modules_bundled if m.name == module_name]
-        system = [m for m in self.modules_system if m.name == module_name]
-        if bundled:
-            bundled[0].start(self.testing)
-        elif system:
-            system[0].start(self.testing)
+        candidates = self._modules_by_name.get(module_name)
+        if not candidates and not self._fully_discovered:
+            self.discover_modules([module_name])
+            candidates = self._modules_by_name.get(module_name)
+        if not candidates:
+            return None
+        bundled = [m for m in candidates if m.type == "bundled"]
+        return bundled[0] if bundled else candidates[0]
+
+    def start(self, module_name: str, by_hand: bool = False) -> None:
+        """
+        Start a module. Its crash history (including quarantine) is only forgotten if
+        it's started ``by_hand``, so that it's kept across autostarts.
+        """
+        module = self._find_module(module_name)
+        if module:
+            if by_hand:
+                self.reset_crash_state(module)
+            module.start(self.testing)
         else:
             logger.error(f"Manager tried to start nonexistent module {module_name}")
 
-    def autostart(self, autostart_modules: List[str]) -> None:
+    def autostart(
+        self,
+        autostart_modules: List[str],
+        dependencies: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        """
+        Start the given modules, each as soon as the modules it depends on are ready.
+
+        Modules without an entry in ``dependencies`` depend on the autostarted server,
+        if any. Modules that don't depend on each other are started concurrently.
+        """
         # NOTE: Currently impossible to autostart a system module if a bundled module with the same name exists
 
         # We only want to autostart modules that are both in found modules and are asked to autostart.
+        found = set(self._modules_by_name)
         for name in autostart_modules:
-            if name not in [m.name for m in self.modules]:
+            if name not in found:
                 logger.error(f"Module {name} not found")
-        autostart_modules = list(set(autostart_modules))
+        names = [n for n in dict.fromkeys(autostart_modules) if n in found]
+        for name in list(names):
+            reason = self.quarantine.reason(name)
+            if reason:
+                logger.warning(f"Not starting quarantined module {name}: {reason}")
+                names.remove(name)
+        # Only one server can run at a time, prefer aw-server-rust
+        if "aw-server-rust" in names and "aw-server" in names:
+            names.remove("aw-server")
+
+        if dependencies is not None:
+            self.dependencies = dependencies
+        for name in names:
+            for dep in self.dependencies.get(name, []):
+                if dep not in names:
+                    logger.warning(
+                        f"{name} depends on {dep}, which isn't autostarted, ignoring"
+                    )
+        graph = _dependency_graph(names, self.dependencies)
+        has_dependents: Set[str] = set().union(*graph.values())
+
+        # Once any modules run in aw-qt's own cgroup, it can't have child cgroups
+        if sys.platform == "linux" and any(
+            m.limits is not None and m.limits.uses_cgroups for m in self.modules
+        ):
+            from .limits import CgroupError, get_cgroups
+
+            try:
+                get_cgroups().setup()
+            except CgroupError:
+                pass  # reported when the limits are applied
+
+        # Waits for modules nothing depends on, which can take up to the readiness
+        # timeout each, get threads of their own rather than holding up the probe
+        # worker's (which the tray's re-probes run on)
+        ready_waits = ThreadPoolExecutor(
+            max_workers=max(len(names), 1), thread_name_prefix="aw-qt-ready"
+        )
 
-        # Start aw-server-rust first
-        if "aw-server-rust" in autostart_modules:
-            self.start("aw-server-rust")
-        elif "aw-server" in autostart_modules:
-            self.start("aw-server")
+        def wait_ready(module: Module) -> None:
+            try:
+                module.wait_ready(self.testing)
+            except Exception:
+                logger.exception(f"Failed to wait for {module.name} to be ready")
 
-        autostart_modules = list(
-            set(autostart_modules) - {"aw-server", "aw-server-rust"}
-        )
-        for name in autostart_modules:
+        def start_until_ready(name: str) -> None:
             self.start(name)
+            module = self._find_module(name)
+            if module is None:
+                return
+            if name in has_dependents:
+                # Dependents are only launched once this returns
+                module.wait_ready(self.testing)
+            else:
+                # Still record time-to-ready, without holding up the rest of startup
+                ready_waits.submit(wait_ready, module)
+
+        started_at = monotonic()
+        try:
+            with tracing.span("autostart", cat="startup"):
+                _run_in_dependency_order(graph, start_until_ready, "start")
+        finally:
+            # The threads exit once their waits are done
+            ready_waits.shutdown(wait=False)
+        self.autostart_duration = monotonic() - started_at
+        logger.info(
+            f"Autostarted {len(names)} modules in {self.autostart_duration:.2f}s"
+        )
 
     def stop(self, module_name: str) -> None:
-        for m in self.modules:
-            if m.name == module_name:
-                m.stop()
-                break
+        for m in self._modules_by_name.get(module_name, []):
+            m.stop()
+            break
         else:
             logger.error(f"Manager tried to stop nonexistent module {module_name}")
 
-    def stop_all(self) -> None:
-        for module in filter(lambda m: m.is_alive(), self.modules):
-            module.stop()
+    def stop_all(self, timeout: Optional[float] = None) -> Dict[str, float]:
+        """
+        Stop all running modules, and return how long each of them took to stop.
+
+        Modules are stopped concurrently, each after the modules depending on it (so
+        watchers before the server). Modules still running ``timeout`` seconds
+        (default: ``shutdown_timeout``) after the shutdown began are killed, as are
+        modules that don't stop within their own ``stop_timeout``.
+        """
+        if timeout is None:
+            timeout = self.shutdown_timeout
+        self.sampler.stop()
+        self.stall_detector.stop()
+        self.restarter.cancel_all()
+        deadline = monotonic() + timeout
+
+        running: Dict[str, List[Module]] = {}
+        for module in self.modules:
+            if module.is_alive():
+                running.setdefault(module.name, []).append(module)
+        durations: Dict[str, float] = {}
+
+        def stop(name: str) -> None:
+            for module in running[name]:
+                remaining = deadline - monotonic()
+                module.stop(timeout=min(module.stop_timeout, remaining))
+                if module.shutdown_duration is not None:
+                    durations[name] = module.shutdown_duration
+
+        started_at = monotonic()
+        with tracing.span("stop all", cat="shutdown"):
+            graph = _dependency_graph(list(running), self.dependencies)
+            _run_in_dependency_order(_reverse_graph(graph), stop, "stop")
+        if self.forkserver is not None:
+            self.forkserver.stop()
+        _probe_client.close()
+        if running:
+            logger.info(
+                f"Stopped {len(running)} modules in {monotonic() - started_at:.2f}s ("
+                + ", ".join(f"{n}: {d:.2f}s" for n, d in durations.items())
+                + ")"
+            )
+        return durations
 
     def print_status(self, module_name: Optional[str] = None) -> None:
-        header = "name                status      type"
+        header = "name                status      type      usage"
+        self.ensure_discovered()
         if module_name:
             # find module
             module = next((m for m in self.modules if m.name == module_name), None)
             if module:
                 logger.info(header)
                 self._print_status_module(module)
+                self.print_log(module_name, max_lines=10)
             else:
                 logger.error(f"Module {module_name} not found")
         else:
@@ -420,9 +1466,32 @@ class Manager:
                 self._print_status_module(module)
 
     def _print_status_module(self, module: Module) -> None:
+        state = module.state
         logger.info(
-            f"{module.name:18}  {'running' if module.is_alive() else 'stopped' :10}  {module.type}"
+            f"{module.name:18}  {state.value:11} "
+            f"{module.type:8}  {module.usage_summary()}".rstrip()
         )
+        if state in ALIVE:
+            for error in module.limit_errors:
+                logger.warning(f"{'':18}  {error}")
+        if (state not in ALIVE or state is State.DEGRADED) and module.lifecycle.history:
+            reason = module.lifecycle.history[-1].reason
+            if reason:
+                logger.warning(f"{'':18}  {reason}")
+
+    def print_log(self, module_name: str, max_lines: int = 50) -> None:
+        module = self._find_module(module_name)
+        if module:
+            print(module.read_log(self.testing, max_lines=max_lines))
+        else:
+            logger.error(f"Module {module_name} not found")
+
+    def print_output(self, module_name: str, max_lines: int = 50) -> None:
+        module = self._find_module(module_name)
+        if module:
+            print(module.read_output(max_lines) or "No output captured")
+        else:
+            logger.error(f"Module {module_name} not found")
 
 
 def main_test():
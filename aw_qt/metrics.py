@@ -0,0 +1,222 @@
+"""
+Supervisor metrics, optionally served in the OpenMetrics text format.
+
+Counters and histograms are always recorded (it's cheap), the HTTP endpoint is only
+started if ``metrics_port`` is set in aw-qt.toml. It listens on localhost only, and serves
+requests from its own thread, so a slow scraper never blocks the GUI.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .manager import Manager, Module
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+COUNTERS = {
+    "aw_qt_module_starts": "Number of times a module process was started",
+    "aw_qt_module_crashes": "Number of unexpected module exits",
+    "aw_qt_module_auto_restarts": "Number of automatic restarts after a crash",
+    "aw_qt_module_stalls": "Number of times a running module stopped reporting",
+}
+
+HISTOGRAMS: Dict[str, Tuple[str, List[float]]] = {
+    "aw_qt_module_time_to_ready_seconds": (
+        "Time from starting a module until it was ready",
+        [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30],
+    ),
+    "aw_qt_probe_latency_seconds": (
+        "Latency of server health probes",
+        [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1],
+    ),
+}
+
+
+class _Histogram:
+    def __init__(self, buckets: List[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Counters and histograms per module, safe to update from any thread"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {name: {} for name in COUNTERS}
+        self._histograms: Dict[str, Dict[str, _Histogram]] = {
+            name: {} for name in HISTOGRAMS
+        }
+
+    def inc(self, name: str, module: str, value: float = 1) -> None:
+        with self._lock:
+            counter = self._counters[name]
+            counter[module] = counter.get(module, 0) + value
+
+    def observe(self, name: str, module: str, value: float) -> None:
+        with self._lock:
+            histograms = self._histograms[name]
+            if module not in histograms:
+                histograms[module] = _Histogram(HISTOGRAMS[name][1])
+            histograms[module].observe(value)
+
+    def render(self, manager: Optional["Manager"] = None) -> str:
+        """The metrics, and gauges of the state of ``manager``'s modules, as OpenMetrics"""
+        lines: List[str] = []
+        with self._lock:
+            for name, help in COUNTERS.items():
+                lines += [f"# TYPE {name} counter", f"# HELP {name} {help}."]
+                for module, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}_total{_labels(module=module)} {_num(value)}")
+            for name, (help, buckets) in HISTOGRAMS.items():
+                lines += [f"# TYPE {name} histogram", f"# HELP {name} {help}."]
+                for module, h in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for le, count in zip(buckets + [float("inf")], h.counts):
+                        cumulative += count
+                        labels = _labels(module=module, le=_num(le))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(module=module)} {_num(h.sum)}")
+                    lines.append(f"{name}_count{_labels(module=module)} {cumulative}")
+        if manager is not None:
+            lines += _render_gauges(manager)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _render_gauges(manager: "Manager") -> List[str]:
+    gauges: Dict[str, Tuple[str, List[str]]] = {
+        "aw_qt_module_up": ("Whether the module is running", []),
+        "aw_qt_module_uptime_seconds": ("Time since the module was started", []),
+        "aw_qt_module_cpu_ratio": ("CPU usage, as a fraction of one CPU", []),
+        "aw_qt_module_resident_memory_bytes": ("Resident memory of the module", []),
+        "aw_qt_module_resident_memory_peak_bytes": (
+            "Peak resident memory of the module since it was started",
+            [],
+        ),
+    }
+
+    def add(name: str, module: "Module", value: float) -> None:
+        labels = _labels(module=module.name, type=module.type)
+        gauges[name][1].append(f"{name}{labels} {_num(value)}")
+
+    from .lifecycle import ALIVE, State
+
+    states: List[str] = []
+    for module in sorted(manager.modules, key=lambda m: (m.name, m.type)):
+        # The lifecycle state is kept current by the module, so nothing is polled here
+        for state in State:
+            labels = _labels(
+                module=module.name, type=module.type, aw_qt_module_state=state.value
+            )
+            states.append(f"aw_qt_module_state{labels} {int(module.state is state)}")
+        alive = module.state in ALIVE
+        add("aw_qt_module_up", module, alive)
+        uptime = module.uptime()
+        if uptime is not None:
+            add("aw_qt_module_uptime_seconds", module, uptime)
+        stats = module.stats
+        if alive and stats is not None:
+            cpu, rss = stats.cpu.latest(), stats.rss.latest()
+            if cpu is not None:
+                add("aw_qt_module_cpu_ratio", module, cpu / 100)
+            if rss is not None:
+                add("aw_qt_module_resident_memory_bytes", module, rss)
+                add("aw_qt_module_resident_memory_peak_bytes", module, stats.peak_rss)
+
+    lines: List[str] = []
+    for name, (help, samples) in gauges.items():
+        lines += [f"# TYPE {name} gauge", f"# HELP {name} {help}."] + samples
+    lines += [
+        "# TYPE aw_qt_module_state stateset",
+        "# HELP aw_qt_module_state Lifecycle state of the module.",
+    ] + states
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: Any) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+registry = Registry()
+
+inc = registry.inc
+observe = registry.observe
+
+
+class MetricsServer:
+    """Serves ``registry`` at /metrics on localhost, from a background thread"""
+
+    def __init__(
+        self, manager: "Manager", port: int, host: str = "127.0.0.1"
+    ) -> None:
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self._server: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        # Imported here since it's only needed if metrics are enabled (see test_startup)
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        manager = self.manager
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render(manager).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format, *args)
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"Failed to serve metrics on {self.host}:{self.port}: {e}")
+            return
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="aw-qt-metrics", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
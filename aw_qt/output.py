@@ -0,0 +1,235 @@
+"""
+Capture of the stdout and stderr of modules.
+
+Module output used to be left going to aw-qt's own stdout and stderr, since a pipe that
+isn't read fills up and then blocks the module writing to it (see
+https://github.com/ActivityWatch/aw-server/issues/27). Now every module's output goes
+through a pipe that's drained continuously by a single reader thread, sleeping in a
+selector until any of the pipes has data. Output is kept in a bounded in-memory buffer
+per module, and optionally also written to a size-rotated file, so that crash reports can
+show the last output of a module.
+
+Configured in an ``output`` table in the module's settings, for example:
+
+    [aw-qt.modules.aw-watcher-window]
+    output = { buffer = "64K", file = true, max_file_size = "1M", backups = 2 }
+
+buffer: how much of the latest output to keep in memory (default: 64K).
+file: whether to also write the output to ``<module>-output.log`` in aw-qt's log dir,
+    rotated to ``.log.1``, ``.log.2`` and so on once larger than max_file_size
+    (default: false, 1M and 2 backups).
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+from typing import Any, Dict, Mapping, Optional
+
+from .selectorthread import SelectorThread
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_MAX_FILE_SIZE = 1024**2
+DEFAULT_MAX_LINES = 50
+
+
+class _RotatingFile:
+    """Appends raw output to ``path``, rotating it once it grows past ``max_bytes``"""
+
+    def __init__(self, path: str, max_bytes: int, backups: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._f: Optional[Any] = open(path, "ab")
+        self._size = self._f.tell()
+
+    def write(self, data: bytes) -> None:
+        if self._f is None:
+            return
+        try:
+            if self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._f.write(data)
+            self._f.flush()
+            self._size += len(data)
+        except OSError as e:
+            logger.warning(f"Failed to write module output to {self.path}: {e}")
+            self.close()
+
+    def _rotate(self) -> None:
+        assert self._f is not None
+        self._f.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._f = open(self.path, "wb")
+        self._size = 0
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class OutputBuffer:
+    """The latest ``max_bytes`` of output of a module process, safe to read from any thread"""
+
+    def __init__(self, max_bytes: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.max_bytes = max_bytes
+        self.total = 0  # bytes written in total, including those no longer kept
+        self._data = bytearray()
+        self._file: Optional[_RotatingFile] = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            self._data += data
+            self.total += len(data)
+            if len(self._data) > self.max_bytes:
+                del self._data[: len(self._data) - self.max_bytes]
+        if self._file is not None:
+            self._file.write(data)
+
+    def close(self) -> None:
+        """Called once the process has closed its end of the pipe"""
+        if self._file is not None:
+            self._file.close()
+        self._closed.set()
+
+    def wait_closed(self, timeout: float) -> bool:
+        """Wait until all the output of the process has been read"""
+        return self._closed.wait(timeout)
+
+    def tail(self, max_lines: int = DEFAULT_MAX_LINES) -> str:
+        """The last ``max_lines`` lines of output"""
+        with self._lock:
+            data = bytes(self._data)
+            truncated = self.total > len(data)
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        if truncated and lines:
+            # Most likely starts in the middle of a line
+            lines = lines[1:]
+        return "\n".join(lines[-max_lines:])
+
+
+class OutputConfig:
+    def __init__(
+        self,
+        buffer: int = DEFAULT_BUFFER_SIZE,
+        file: bool = False,
+        max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+        backups: int = 2,
+    ) -> None:
+        self.buffer = buffer
+        self.file = file
+        self.max_file_size = max_file_size
+        self.backups = backups
+
+    @classmethod
+    def from_settings(cls, settings: Mapping[str, Any]) -> "OutputConfig":
+        from .limits import _parse_memory
+
+        unknown = set(settings) - {"buffer", "file", "max_file_size", "backups"}
+        if unknown:
+            raise ValueError(f"unknown output settings: {', '.join(sorted(unknown))}")
+        kwargs: Dict[str, Any] = {}
+        if "buffer" in settings:
+            kwargs["buffer"] = _parse_memory(settings["buffer"])
+        if "file" in settings:
+            kwargs["file"] = bool(settings["file"])
+        if "max_file_size" in settings:
+            kwargs["max_file_size"] = _parse_memory(settings["max_file_size"])
+        if "backups" in settings:
+            kwargs["backups"] = int(settings["backups"])
+        return cls(**kwargs)
+
+    def create_buffer(
+        self, name: str, testing: bool, log_dir: Optional[str] = None
+    ) -> OutputBuffer:
+        """A new buffer for the output of a process of module ``name``"""
+        buffer = OutputBuffer(self.buffer)
+        if self.file:
+            if log_dir is None:
+                import aw_core.dirs
+
+                log_dir = aw_core.dirs.get_log_dir("aw-qt")
+            filename = f"{name}-output{'-testing' if testing else ''}.log"
+            path = os.path.join(log_dir, filename)
+            try:
+                buffer._file = _RotatingFile(path, self.max_file_size, self.backups)
+            except OSError as e:
+                logger.warning(f"Failed to open {path} for the output of {name}: {e}")
+        return buffer
+
+
+class OutputReader:
+    """
+    Drains the output pipes of all modules into their buffers.
+
+    A single selector thread reads whichever pipes have data, a bounded amount at a time
+    so that a chatty module can't starve the others. Windows doesn't support selecting on
+    pipes, so there each pipe gets a reader thread blocking in ``read()`` instead.
+    """
+
+    def __init__(self) -> None:
+        self._selector_thread = SelectorThread("aw-qt-output-reader")
+
+    def add(self, fd: int, buffer: OutputBuffer) -> None:
+        """Read ``fd`` into ``buffer`` until EOF, taking ownership of ``fd``"""
+        if sys.platform == "win32":
+            threading.Thread(
+                target=self._read_blocking,
+                args=(fd, buffer),
+                name=f"aw-qt-output-{fd}",
+                daemon=True,
+            ).start()
+            return
+
+        os.set_blocking(fd, False)
+        self._selector_thread.register(fd, functools.partial(self._on_readable, buffer))
+
+    def _on_readable(self, buffer: OutputBuffer, fd: int) -> None:
+        try:
+            data = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            self._write(buffer, data)
+            return
+        # EOF: every process holding the write end has exited
+        self._selector_thread.unregister(fd)
+        os.close(fd)
+        buffer.close()
+
+    def _read_blocking(self, fd: int, buffer: OutputBuffer) -> None:
+        try:
+            while True:
+                data = os.read(fd, READ_SIZE)
+                if not data:
+                    break
+                self._write(buffer, data)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+            buffer.close()
+
+    @staticmethod
+    def _write(buffer: OutputBuffer, data: bytes) -> None:
+        # Never let the reader thread die, or the modules would block on a full pipe
+        try:
+            buffer.write(data)
+        except Exception:
+            logger.exception("Error buffering module output")
+
+
+_output_reader = OutputReader()
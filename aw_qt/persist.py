@@ -0,0 +1,42 @@
+"""
+State that aw-qt keeps between launches, as JSON files with a version number. Files of
+another version are ignored, so that a change of format just starts over from scratch.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def load_state(path: str, version: int, what: str) -> Optional[Dict[str, Any]]:
+    """The state saved in ``path``, or None if there is none of this ``version``"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable {what}: {e}")
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def save_state(path: str, version: int, state: Dict[str, Any], what: str) -> bool:
+    """
+    Atomically replace ``path`` with ``state``, so that it's never left half-written.
+    Returns whether that succeeded.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version, **state}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to save {what}: {e}")
+        return False
+    return True
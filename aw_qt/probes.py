@@ -0,0 +1,409 @@
+import abc
+import logging
+import os
+import re
+import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from glob import glob
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional
+
+if TYPE_CHECKING:
+    from http.client import HTTPConnection
+
+    from .manager import Module
+
+logger = logging.getLogger(__name__)
+
+ProbeListener = Callable[["Module", bool], None]
+
+
+class ProbeWorker:
+    """
+    Owns every server health probe, running them on a small background thread pool so
+    that callers on the GUI thread never block on network I/O.
+
+    Results are delivered from a worker thread, both to the callback passed with a probe
+    request and to every listener registered with ``add_listener``.
+    """
+
+    MONITOR_INTERVAL = 5.0  # seconds between re-probes of an external server
+    MONITOR_TIMEOUT = 1.0
+
+    def __init__(self, max_workers: int = 2) -> None:
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight: Dict["Module", "Future[bool]"] = {}
+        self._listeners: List[ProbeListener] = []
+
+        self._monitored: Dict["Module", bool] = {}  # module -> testing
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._monitor_wakeup = threading.Event()
+
+    def add_listener(self, callback: ProbeListener) -> None:
+        self._listeners.append(callback)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "Future[Any]":
+        """Run ``fn`` on the worker pool, e.g. a module start that may need to probe."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="aw-qt-probe"
+                )
+            executor = self._executor
+        future = executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(_log_exception)
+        return future
+
+    def probe(
+        self,
+        module: "Module",
+        testing: bool,
+        timeout: float = 0.2,
+        callback: Optional[Callable[[bool], None]] = None,
+    ) -> "Future[bool]":
+        """
+        Probe the server of ``module`` in the background.
+
+        If a probe for the same module is already running, its result is shared
+        instead of starting another request.
+        """
+        start = False
+        with self._lock:
+            future = self._in_flight.get(module)
+            if future is None:
+                future = Future()
+                self._in_flight[module] = future
+                start = True
+        if start:
+            self.submit(self._run_probe, module, testing, timeout, future)
+        if callback is not None:
+            future.add_done_callback(
+                lambda f: callback(f.result()) if not f.exception() else None
+            )
+        return future
+
+    def _run_probe(
+        self, module: "Module", testing: bool, timeout: float, future: "Future[bool]"
+    ) -> None:
+        try:
+            alive = module._probe_external_server(testing, timeout=timeout)
+        except Exception as e:
+            logger.exception(f"Probe of {module.name} failed")
+            with self._lock:
+                self._in_flight.pop(module, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._in_flight.pop(module, None)
+        future.set_result(alive)
+        for listener in self._listeners:
+            try:
+                listener(module, alive)
+            except Exception:
+                logger.exception("Error in probe listener")
+
+    def monitor(self, module: "Module", testing: bool) -> None:
+        """Keep re-probing an externally managed server until ``unmonitor`` is called."""
+        with self._lock:
+            self._monitored[module] = testing
+            if self._monitor_thread is None:
+                self._monitor_thread = threading.Thread(
+                    target=self._run_monitor, name="aw-qt-probe-monitor", daemon=True
+                )
+                self._monitor_thread.start()
+
+    def unmonitor(self, module: "Module") -> None:
+        with self._lock:
+            self._monitored.pop(module, None)
+            if not self._monitored:
+                # Let the monitor thread exit right away
+                self._monitor_wakeup.set()
+
+    def _run_monitor(self) -> None:
+        while True:
+            self._monitor_wakeup.wait(self.MONITOR_INTERVAL)
+            self._monitor_wakeup.clear()
+            with self._lock:
+                if not self._monitored:
+                    # Nothing left to watch, let the thread exit until needed again
+                    self._monitor_thread = None
+                    return
+                monitored = list(self._monitored.items())
+            for module, testing in monitored:
+                self.probe(
+                    module,
+                    testing,
+                    timeout=self.MONITOR_TIMEOUT,
+                    callback=module._on_external_server_probe,
+                )
+
+
+class ServerProbeClient:
+    """
+    Probes the ``/api/0/info`` endpoint of servers (and makes other requests to them
+    with ``get``), keeping one persistent HTTP/1.1 connection to each port instead of
+    connecting anew for every request.
+
+    Concurrent probes of the same port, e.g. by aw-server and aw-server-rust, which
+    share it by default, are merged into a single request. If the connection was
+    closed, e.g. because the server restarted, the request is retried once on a new
+    connection.
+    """
+
+    PATH = "/api/0/info"
+
+    def __init__(self, host: str = "localhost") -> None:
+        self.host = host
+        self._lock = threading.Lock()
+        # Only used by the thread whose request is in flight for the port
+        self._connections: Dict[int, "HTTPConnection"] = {}
+        self._in_flight: Dict[int, "Future[bool]"] = {}
+
+    def probe(self, port: int, timeout: float) -> bool:
+        """Whether the server on ``port`` responds successfully within ``timeout``"""
+        with self._lock:
+            future = self._in_flight.get(port)
+            if future is None:
+                future = Future()
+                self._in_flight[port] = future
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                return False
+
+        alive = False
+        try:
+            alive = self._request(port, self.PATH, timeout) is not None
+        finally:
+            with self._lock:
+                del self._in_flight[port]
+            future.set_result(alive)
+        return alive
+
+    def get(self, port: int, path: str, timeout: float) -> Optional[bytes]:
+        """The body of a successful response to GET ``path``, or None"""
+        return self._request(port, path, timeout)
+
+    def _request(self, port: int, path: str, timeout: float) -> Optional[bytes]:
+        # Imported here since it's slow to import and rarely needed (see test_startup)
+        import http.client
+
+        with self._lock:
+            connection = self._connections.pop(port, None)
+        for _ in range(2):
+            reused = connection is not None
+            if connection is None:
+                connection = http.client.HTTPConnection(self.host, port, timeout=timeout)
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                # Read the whole response, so the connection can be reused
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                connection = None
+                if reused:
+                    # The server may have closed the idle connection, or restarted
+                    continue
+                return None
+            with self._lock:
+                # Another request to the port may have opened a connection meanwhile
+                extra = self._connections.pop(port, None)
+                self._connections[port] = connection
+            if extra is not None:
+                extra.close()
+            return body if response.status < 400 else None
+        return None
+
+    def close(self) -> None:
+        """Close the idle connections, probing again reconnects"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+
+class ReadinessProbe(abc.ABC):
+    """
+    Tells whether a started module is ready to serve its dependents.
+
+    ``reset`` is called right after the module has been launched, ``check`` is then
+    called repeatedly (with backoff) until it returns True or the deadline passes.
+    """
+
+    def reset(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def check(self) -> bool:
+        ...
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__}>"
+
+
+class HttpProbe(ReadinessProbe):
+    """Ready once ``url`` responds successfully, like ``/api/0/info`` on a server."""
+
+    def __init__(self, url: str, timeout: float = 1.0) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def check(self) -> bool:
+        import urllib.error
+        import urllib.request
+
+        try:
+            with urllib.request.urlopen(self.url, timeout=self.timeout):
+                return True
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def __repr__(self) -> str:
+        return f"<HttpProbe {self.url}>"
+
+
+class TcpProbe(ReadinessProbe):
+    """Ready once a TCP connection to ``host:port`` can be established."""
+
+    def __init__(self, port: int, host: str = "localhost", timeout: float = 1.0) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def check(self) -> bool:
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.timeout):
+                return True
+        except OSError:
+            return False
+
+    def __repr__(self) -> str:
+        return f"<TcpProbe {self.host}:{self.port}>"
+
+
+class FileProbe(ReadinessProbe):
+    """Ready once ``path`` exists, e.g. a socket or pid file created by the module."""
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.expanduser(path)
+
+    def check(self) -> bool:
+        return os.path.exists(self.path)
+
+    def __repr__(self) -> str:
+        return f"<FileProbe {self.path}>"
+
+
+class LogLineProbe(ReadinessProbe):
+    """
+    Ready once a line matching ``pattern`` is written to a log file matching ``path``
+    (a glob), ignoring anything that was already in the files when the module started.
+    """
+
+    def __init__(self, path: str, pattern: str) -> None:
+        self.path = os.path.expanduser(path)
+        self.pattern = re.compile(pattern)
+        self._offsets: Dict[str, int] = {}
+        self._partial: Dict[str, str] = {}
+
+    def reset(self) -> None:
+        self._offsets = {f: _file_size(f) for f in glob(self.path)}
+        self._partial = {}
+
+    def check(self) -> bool:
+        for filename in glob(self.path):
+            offset = self._offsets.get(filename, 0)
+            size = _file_size(filename)
+            if size < offset:
+                # Truncated or rotated, start over
+                offset = 0
+            if size == offset:
+                continue
+            with open(filename, "rb") as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            self._offsets[filename] = offset + len(data)
+            lines = (self._partial.get(filename, "") + data.decode(errors="replace")).split("\n")
+            self._partial[filename] = lines.pop()
+            if any(self.pattern.search(line) for line in lines):
+                return True
+        return False
+
+    def __repr__(self) -> str:
+        return f"<LogLineProbe {self.pattern.pattern!r} in {self.path}>"
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def make_readiness_probe(settings: Mapping[str, Any], module_name: str) -> ReadinessProbe:
+    """
+    Create a readiness probe from a ``readiness`` table in aw-qt.toml, such as
+    ``{ type = "tcp", port = 5600 }``. Log probes default to the module's own logs.
+    """
+    kind = str(settings.get("type", ""))
+    if kind == "http":
+        return HttpProbe(str(settings["url"]))
+    elif kind == "tcp":
+        return TcpProbe(int(settings["port"]), str(settings.get("host", "localhost")))
+    elif kind == "file":
+        return FileProbe(str(settings["path"]))
+    elif kind == "log":
+        if "path" in settings:
+            path = str(settings["path"])
+        else:
+            import aw_core.dirs
+
+            path = os.path.join(aw_core.dirs.get_log_dir(module_name), "*.log")
+        return LogLineProbe(path, str(settings["pattern"]))
+    raise ValueError(f"Unknown readiness probe type: {kind!r}")
+
+
+def wait_until_ready(
+    probe: ReadinessProbe,
+    timeout: float,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+    multiplier: float = 2.0,
+    abort: Optional[Callable[[], bool]] = None,
+) -> bool:
+    """
+    Check ``probe`` with exponential backoff until it succeeds or ``timeout`` seconds
+    have passed. Returns early with False if ``abort`` returns True, e.g. when the
+    module being probed has exited.
+    """
+    deadline = monotonic() + timeout
+    delay = initial_delay
+    while True:
+        if probe.check():
+            return True
+        if abort is not None and abort():
+            return False
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return False
+        sleep(min(delay, remaining))
+        delay = min(delay * multiplier, max_delay)
+
+
+def _log_exception(future: "Future[Any]") -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Background task failed", exc_info=exc)
@@ -0,0 +1,218 @@
+"""
+CPU, memory and I/O usage of modules, sampled from /proc.
+
+Only available on Linux, elsewhere the sampler doesn't start and modules have no stats.
+"""
+
+import logging
+import os
+import threading
+from array import array
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Iterable, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from .manager import Module
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class RingBuffer:
+    """A fixed-size buffer of floats, overwriting the oldest value when full"""
+
+    def __init__(self, capacity: int) -> None:
+        self._values = array("d", bytes(8 * capacity))
+        self._capacity = capacity
+        self._next = 0
+        self._len = 0
+
+    def append(self, value: float) -> None:
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        self._len = min(self._len + 1, self._capacity)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def values(self) -> List[float]:
+        """The values in the buffer, oldest first"""
+        start = (self._next - self._len) % self._capacity
+        return [self._values[(start + i) % self._capacity] for i in range(self._len)]
+
+    def latest(self) -> Optional[float]:
+        if not self._len:
+            return None
+        return self._values[(self._next - 1) % self._capacity]
+
+
+class ProcSample(NamedTuple):
+    cpu_ticks: int  # user + system time
+    rss: int  # bytes
+    read_bytes: Optional[int]  # None if /proc/<pid>/io isn't readable
+    write_bytes: Optional[int]
+
+
+def read_proc_sample(pid: int, proc: str = "/proc") -> Optional[ProcSample]:
+    """Read the current usage of process ``pid``, or None if it's gone"""
+    try:
+        with open(f"{proc}/{pid}/stat", "rb") as f:
+            stat = f.read()
+        with open(f"{proc}/{pid}/statm", "rb") as f:
+            statm = f.read()
+    except OSError:
+        return None
+    # The command name (field 2) may contain spaces and parentheses, so start after it
+    name_end = stat.rindex(b")") + 2
+    fields = stat[name_end:].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    rss = int(statm.split()[1]) * _PAGE_SIZE
+
+    read_bytes = write_bytes = None
+    try:
+        with open(f"{proc}/{pid}/io", "rb") as f:
+            for line in f:
+                key, _, value = line.partition(b":")
+                if key == b"read_bytes":
+                    read_bytes = int(value)
+                elif key == b"write_bytes":
+                    write_bytes = int(value)
+    except OSError:
+        pass
+    return ProcSample(utime + stime, rss, read_bytes, write_bytes)
+
+
+class ProcessStats:
+    """Recent usage of a single process, plus the peak since it was started"""
+
+    def __init__(self, pid: int, capacity: int = 120) -> None:
+        self.pid = pid
+        self.cpu = RingBuffer(capacity)  # percent of one core
+        self.rss = RingBuffer(capacity)  # bytes
+        self.io = RingBuffer(capacity)  # bytes read and written per second
+        self.peak_cpu = 0.0
+        self.peak_rss = 0
+        self.read_bytes: Optional[int] = None
+        self.write_bytes: Optional[int] = None
+        self._last: Optional[ProcSample] = None
+        self._last_at = 0.0
+
+    def add(self, sample: ProcSample, now: float) -> None:
+        last, last_at = self._last, self._last_at
+        self._last, self._last_at = sample, now
+
+        self.rss.append(sample.rss)
+        self.peak_rss = max(self.peak_rss, sample.rss)
+        self.read_bytes, self.write_bytes = sample.read_bytes, sample.write_bytes
+        if last is None or now <= last_at:
+            return
+
+        elapsed = now - last_at
+        cpu = (sample.cpu_ticks - last.cpu_ticks) / _CLOCK_TICKS / elapsed * 100
+        self.cpu.append(cpu)
+        self.peak_cpu = max(self.peak_cpu, cpu)
+        if sample.read_bytes is not None and last.read_bytes is not None:
+            io = (sample.read_bytes - last.read_bytes) + (
+                (sample.write_bytes or 0) - (last.write_bytes or 0)
+            )
+            self.io.append(io / elapsed)
+
+    def summary(self) -> str:
+        rss = self.rss.latest()
+        if rss is None:
+            return ""
+        parts = []
+        cpu = self.cpu.latest()
+        if cpu is not None:
+            parts.append(f"{cpu:.1f}% CPU (peak {self.peak_cpu:.0f}%)")
+        parts.append(f"{_format_bytes(rss)} (peak {_format_bytes(self.peak_rss)})")
+        io = self.io.latest()
+        if io is not None:
+            parts.append(f"{_format_bytes(io)}/s I/O")
+        return ", ".join(parts)
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def format_uptime(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class Sampler:
+    """
+    Samples the usage of every running module we own on a background thread, every
+    ``interval`` seconds, into ``Module.stats``.
+    """
+
+    def __init__(
+        self,
+        modules: Callable[[], Iterable["Module"]],
+        interval: float = 5.0,
+        capacity: int = 120,
+    ) -> None:
+        self._modules = modules
+        self.interval = interval
+        self.capacity = capacity
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def available() -> bool:
+        return os.path.exists("/proc/self/stat")
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        if not self.available():
+            logger.debug("No /proc, not sampling module resource usage")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="aw-qt-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Failed to sample module resource usage")
+            self._stop.wait(self.interval)
+
+    def sample(self) -> None:
+        now = monotonic()
+        for module in list(self._modules()):
+            process = module._process
+            if process is None or process.returncode is not None:
+                continue
+            sample = read_proc_sample(process.pid)
+            if sample is None:
+                continue
+            stats = module.stats
+            if stats is None or stats.pid != process.pid:
+                stats = module.stats = ProcessStats(process.pid, self.capacity)
+            stats.add(sample, now)
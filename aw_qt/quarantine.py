@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .persist import load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+
+class QuarantineStore:
+    """
+    Persistent record of modules stuck in a crash loop, which aren't restarted or
+    autostarted until started again by hand, and of how many times in a row each module
+    has exited right after being launched.
+
+    Kept in the aw-qt data dir, so that a module failing at every launch isn't retried
+    all over again every time aw-qt is restarted.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._modules: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    @classmethod
+    def default(cls, testing: bool) -> "QuarantineStore":
+        import aw_core.dirs
+
+        data_dir = aw_core.dirs.get_data_dir("aw-qt")
+        filename = "quarantine-testing.json" if testing else "quarantine.json"
+        return cls(os.path.join(data_dir, filename))
+
+    def _load(self) -> None:
+        assert self.path
+        data = load_state(self.path, self.VERSION, "quarantine state")
+        if data is not None:
+            self._modules = data.get("modules", {})
+
+    def _save(self) -> None:
+        if self.path:
+            save_state(
+                self.path, self.VERSION, {"modules": self._modules}, "quarantine state"
+            )
+
+    def _update(self, name: str, **values: Any) -> None:
+        state = self._modules.setdefault(name, {})
+        if all(state.get(k) == v for k, v in values.items()):
+            return
+        state.update(values)
+        if not any(state.values()):
+            del self._modules[name]
+        self._save()
+
+    def reason(self, name: str) -> Optional[str]:
+        """Why module ``name`` is quarantined, or None if it isn't"""
+        with self._lock:
+            return self._modules.get(name, {}).get("reason")
+
+    def early_exits(self, name: str) -> int:
+        with self._lock:
+            return self._modules.get(name, {}).get("early_exits", 0)
+
+    def record_early_exit(self, name: str) -> int:
+        """Count an exit right after launch, returning the number of them in a row"""
+        with self._lock:
+            count = self._modules.get(name, {}).get("early_exits", 0) + 1
+            self._update(name, early_exits=count)
+            return count
+
+    def reset_early_exits(self, name: str) -> None:
+        with self._lock:
+            if name in self._modules:
+                self._update(name, early_exits=0)
+
+    def quarantine(self, name: str, reason: str) -> None:
+        logger.error(f"Quarantining module {name}: {reason}")
+        with self._lock:
+            self._update(name, reason=reason, since=time.time())
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            if name not in self._modules:
+                return
+            if self._modules[name].get("reason"):
+                logger.info(f"Releasing module {name} from quarantine")
+            self._update(name, reason=None, since=None, early_exits=0)
@@ -0,0 +1,69 @@
+"""
+A background thread that sleeps in a selector until one of its file descriptors is
+readable, so that waiting on any number of them takes one thread and no periodic work.
+Used both to watch for module exits (on pidfds) and to drain module output (on pipes).
+
+Not for Windows, which doesn't support selecting on anything but sockets.
+"""
+
+import logging
+import os
+import selectors
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorThread:
+    """
+    Calls the handler of a registered file descriptor, on the selector thread, whenever
+    it's readable. The thread is started on the first registration.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wakeup_r: int = -1
+        self._wakeup_w: int = -1
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, fd: int, handler: Callable[[int], None]) -> None:
+        with self._lock:
+            self._ensure_thread()
+            assert self._selector is not None
+            self._selector.register(fd, selectors.EVENT_READ, handler)
+        # Wake the selector so it picks up the new registration
+        os.write(self._wakeup_w, b"\0")
+
+    def unregister(self, fd: int) -> None:
+        with self._lock:
+            assert self._selector is not None
+            self._selector.unregister(fd)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        assert self._selector is not None
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wakeup_r, 512)
+                    except BlockingIOError:
+                        pass
+                    continue
+                # Never let the thread die, or the other descriptors would go unserved
+                try:
+                    key.data(key.fd)
+                except Exception:
+                    logger.exception(f"Error handling fd {key.fd} on {self.name}")
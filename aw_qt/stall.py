@@ -0,0 +1,235 @@
+"""
+Detection of watchers that are running but have stopped reporting, e.g. because they
+are deadlocked, which ``Popen.poll()`` can't tell from a healthy watcher.
+
+Every ``interval`` seconds the StallDetector asks the server for all buckets, in one
+request, and compares the ``last_updated`` time of each module's buckets (those the
+module is the client of, on this host) with the module's freshness threshold. A module
+whose buckets are older than that is marked degraded, and restarted if its policy says
+so. It's marked as running again once its buckets are updated.
+
+Configured with a ``stall`` table in the module's settings in aw-qt.toml, such as
+``{ threshold = 600, restart = true }``, or ``stall = false`` to not check a module.
+"""
+
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Union
+
+from . import metrics, tracing
+from .lifecycle import ALIVE, State
+from .procstats import format_uptime
+
+if TYPE_CHECKING:
+    from .manager import Manager, Module
+    from .probes import ServerProbeClient
+
+logger = logging.getLogger(__name__)
+
+# Watchers that send heartbeats every few seconds for as long as they run
+DEFAULT_THRESHOLDS = {
+    "aw-watcher-afk": 600.0,
+    "aw-watcher-window": 600.0,
+}
+
+
+class StallPolicy:
+    """How long a module's buckets may go without updates, and what to do then"""
+
+    def __init__(self, threshold: float, restart: bool = False) -> None:
+        if threshold <= 0:
+            raise ValueError("invalid stall threshold")
+        self.threshold = threshold
+        self.restart = restart
+
+    @classmethod
+    def from_settings(
+        cls, settings: Union[bool, Mapping[str, Any]], module_name: str
+    ) -> Optional["StallPolicy"]:
+        if settings is False:
+            return None
+        if settings is True:
+            settings = {}
+        unknown = set(settings) - {"threshold", "restart"}
+        if unknown:
+            raise ValueError(f"unknown stall settings: {', '.join(sorted(unknown))}")
+        default = cls.default(module_name)
+        threshold = settings.get("threshold", default.threshold if default else None)
+        if threshold is None:
+            raise ValueError("threshold is required")
+        return cls(float(threshold), bool(settings.get("restart", False)))
+
+    @classmethod
+    def default(cls, module_name: str) -> Optional["StallPolicy"]:
+        threshold = DEFAULT_THRESHOLDS.get(module_name)
+        return cls(threshold) if threshold is not None else None
+
+
+def last_updated(
+    buckets: Mapping[str, Any], client: str, hostname: str
+) -> Optional[float]:
+    """
+    When the buckets of ``client`` were last updated, as a timestamp. Buckets of other
+    hosts (e.g. synced ones) are ignored, unless the client only has those.
+    """
+    own = [b for b in buckets.values() if b.get("client") == client]
+    local = [b for b in own if b.get("hostname") == hostname]
+    times: List[float] = []
+    for b in local or own:
+        t = _parse_time(b["last_updated"]) if b.get("last_updated") else None
+        if t is not None:
+            times.append(t)
+    return max(times) if times else None
+
+
+def _parse_time(value: str) -> Optional[float]:
+    # datetime.fromisoformat only takes "Z" and fractions of other than 3 or 6 digits
+    # from Python 3.11 on
+    value = re.sub(r"Z$", "+00:00", value)
+    value = re.sub(r"\.(\d+)", lambda m: "." + m.group(1)[:6].ljust(6, "0"), value)
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class StallDetector:
+    """
+    Checks the freshness of the buckets of running modules on a background thread,
+    every ``interval`` seconds.
+    """
+
+    TIMEOUT = 5.0
+
+    def __init__(
+        self,
+        manager: "Manager",
+        client: "ServerProbeClient",
+        interval: float = 60.0,
+    ) -> None:
+        self.manager = manager
+        self.client = client
+        self.interval = interval
+        self.hostname = socket.gethostname()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # The state modules were in before being marked degraded
+        self._degraded_from: Dict["Module", State] = {}
+        self._checked_at: Optional[float] = None
+        self._checked_at_monotonic = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="aw-qt-stall-detector", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Failed to check modules for stalls")
+
+    def check(self) -> None:
+        # After a suspend, watchers haven't had a chance to report yet. The monotonic
+        # clock doesn't advance while suspended, so it falls behind the wall clock.
+        now, now_monotonic = time.time(), monotonic()
+        checked_at, self._checked_at = self._checked_at, now
+        suspended = (
+            checked_at is not None
+            and (now - checked_at) - (now_monotonic - self._checked_at_monotonic)
+            > self.interval
+        )
+        self._checked_at_monotonic = now_monotonic
+        if suspended:
+            logger.debug("Resumed from suspend, not checking modules for stalls")
+            return
+
+        modules = [
+            m
+            for m in self.manager.modules
+            if m.stall_policy is not None
+            and m.state in (State.RUNNING, State.READY, State.DEGRADED)
+        ]
+        if not modules:
+            return
+        port = self._server_port()
+        if port is None:
+            return
+        with tracing.span("check for stalls", cat="probe", port=port):
+            body = self.client.get(port, "/api/0/buckets/", self.TIMEOUT)
+        if body is None:
+            # Whether the server is up is the probes' business
+            return
+        try:
+            buckets = json.loads(body)
+        except ValueError as e:
+            logger.warning(f"Invalid response to the buckets request: {e}")
+            return
+        for module in modules:
+            self._check_module(module, buckets, now)
+
+    def _server_port(self) -> Optional[int]:
+        for module in self.manager.modules:
+            port = module._get_server_port(self.manager.testing)
+            if port is not None and module.state in ALIVE:
+                return port
+        return None
+
+    def _check_module(
+        self, module: "Module", buckets: Mapping[str, Any], now: float
+    ) -> None:
+        policy = module.stall_policy
+        assert policy is not None
+        uptime = module.uptime()
+        if uptime is None or uptime < policy.threshold:
+            # Buckets aren't expected to be fresh right after starting
+            return
+        updated = last_updated(buckets, module.name, self.hostname)
+        if updated is None:
+            # Either not a watcher, or one that hasn't created its buckets yet
+            return
+
+        age = now - updated
+        if age <= policy.threshold:
+            previous = self._degraded_from.pop(module, State.RUNNING)
+            if module.lifecycle.compare_and_set(
+                {State.DEGRADED}, previous, "reporting again"
+            ):
+                logger.info(f"Module {module.name} is reporting again")
+            return
+
+        reason = f"no updates to its buckets for {format_uptime(age)}"
+        state = module.state
+        if state is State.DEGRADED:
+            return
+        if not module.lifecycle.compare_and_set({state}, State.DEGRADED, reason):
+            return
+        self._degraded_from[module] = state
+        logger.warning(f"Module {module.name} seems to have stalled: {reason}")
+        tracing.instant(f"stall {module.name}", cat="module", age=age)
+        metrics.inc("aw_qt_module_stalls", module.name)
+        if policy.restart:
+            logger.info(f"Restarting stalled module {module.name}")
+            self._degraded_from.pop(module, None)
+            module.stop()
+            module.start(self.manager.testing)
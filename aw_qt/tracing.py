@@ -0,0 +1,124 @@
+"""
+Timeline tracing in the Chrome trace-event format.
+
+Enabled with ``aw-qt --trace FILE``, the resulting file can be loaded in Perfetto
+(https://ui.perfetto.dev) or chrome://tracing. When tracing is disabled (the default)
+every function here returns right away.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_t0 = perf_counter()
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def enable(self, path: str) -> None:
+        self.path = path
+        atexit.register(self.save)
+
+    def now(self) -> float:
+        """Current time, in the unit (microseconds) and origin used in the trace"""
+        return (perf_counter() - _t0) * 1e6
+
+    def _add(self, event: Dict[str, Any]) -> None:
+        tid = threading.get_ident()
+        event["pid"] = os.getpid()
+        event["tid"] = tid
+        with self._lock:
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            self._events.append(event)
+
+    def complete(
+        self, name: str, start: float, end: float, cat: str, **args: Any
+    ) -> None:
+        """Record a span between two timestamps from ``now``"""
+        if not self.enabled:
+            return
+        self._add(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": end - start,
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, cat: str = "aw-qt", **args: Any) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.complete(name, start, self.now(), cat, **args)
+
+    def instant(self, name: str, cat: str = "aw-qt", **args: Any) -> None:
+        if not self.enabled:
+            return
+        self._add(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "i",
+                "s": "p",
+                "ts": self.now(),
+                "args": args,
+            }
+        )
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            metadata = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._threads.items()
+            ]
+            events = metadata + self._events
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        except OSError as e:
+            logger.error(f"Failed to write trace to {self.path}: {e}")
+            return
+        logger.info(f"Wrote {len(events)} trace events to {self.path}")
+
+
+tracer = Tracer()
+
+enable = tracer.enable
+span = tracer.span
+instant = tracer.instant
+complete = tracer.complete
+now = tracer.now
+save = tracer.save
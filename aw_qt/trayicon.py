@@ -1,16 +1,16 @@
 import logging
 import os
 import signal
+import socket
 import subprocess
 import sys
-import time
 import webbrowser
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import aw_core
-from PyQt6 import QtCore
-from PyQt6.QtGui import QIcon
+from PyQt6 import QtCore, sip
+from PyQt6.QtGui import QAction, QIcon
 from PyQt6.QtWidgets import (
     QApplication,
     QMenu,
@@ -20,6 +20,9 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from . import tracing
+from .config import ServerConfig
+from .lifecycle import ALIVE, State
 from .manager import Manager, Module
 
 logger = logging.getLogger(__name__)
@@ -73,8 +76,11 @@ def open_dir(d: str) -> None:
 
 
 class TrayIcon(QSystemTrayIcon):
-    MAX_AUTO_RESTARTS = 3
-    RESTART_WINDOW_SECONDS = 600  # 10 minutes
+    # Emitted from background threads, delivered on the GUI thread
+    module_exited = QtCore.pyqtSignal(object)
+    module_changed = QtCore.pyqtSignal(object)
+    probe_finished = QtCore.pyqtSignal(object, bool)
+    modules_discovered = QtCore.pyqtSignal()
 
     def __init__(
         self,
@@ -83,6 +89,7 @@ class TrayIcon(QSystemTrayIcon):
         parent: Optional[QWidget] = None,
         testing: bool = False,
         port: Optional[int] = None,
+        server_config: Optional[ServerConfig] = None,
     ) -> None:
         QSystemTrayIcon.__init__(self, icon, parent)
         self._parent = parent  # QSystemTrayIcon also tries to save parent info but it screws up the type info
@@ -90,31 +97,50 @@ class TrayIcon(QSystemTrayIcon):
 
         self.manager = manager
         self.testing = testing
-        self._restart_timestamps: Dict[str, List[float]] = {}
+        self._module_actions: Dict[Module, QAction] = {}
+        # Messages can only be shown once the icon is in the tray
+        self._pending_messages: List[Tuple[str, QSystemTrayIcon.MessageIcon]] = []
 
         if port is None:
             port = 5666 if testing else 5600
-        self.root_url = f"http://localhost:{port}"
+        self._port = port
+        self._server_config = server_config
         self.activated.connect(self.on_activated)
 
+        self.module_exited.connect(self._on_module_exited)
+        self.manager.add_exit_listener(self.module_exited.emit)
+        self.module_changed.connect(self._update_module_action)
+        self.manager.add_state_listener(lambda m, transition: self.module_changed.emit(m))
+        self.probe_finished.connect(self._on_probe_finished)
+        self.manager.probe_worker.add_listener(self.probe_finished.emit)
+
         self._build_rootmenu()
 
-    def _recent_restart_count(self, module_name: str) -> int:
-        """Count restarts within the sliding time window."""
-        now = time.monotonic()
-        timestamps = self._restart_timestamps.get(module_name, [])
-        cutoff = now - self.RESTART_WINDOW_SECONDS
-        return sum(1 for t in timestamps if t > cutoff)
-
-    def _record_restart(self, module_name: str) -> None:
-        """Record a restart timestamp and prune old entries."""
-        now = time.monotonic()
-        cutoff = now - self.RESTART_WINDOW_SECONDS
-        timestamps = self._restart_timestamps.get(module_name, [])
-        # Prune old timestamps and add current
-        self._restart_timestamps[module_name] = [
-            t for t in timestamps if t > cutoff
-        ] + [now]
+    def show_in_tray(self) -> None:
+        """Show the icon, once the system tray is available"""
+        self.show()
+        # Re-apply tooltip after show() to ensure it registers with the
+        # platform's system tray backend.  On Windows 11 the tooltip can
+        # appear empty when it is only set before the icon is visible.
+        # See: https://github.com/ActivityWatch/aw-qt/issues/112
+        self.setToolTip(self.toolTip())
+        tracing.instant("trayicon shown", cat="startup")
+
+        pending, self._pending_messages = self._pending_messages, []
+        for text, icon in pending:
+            self._show_message(text, icon)
+
+    def _show_message(self, text: str, icon: QSystemTrayIcon.MessageIcon) -> None:
+        if not self.isVisible():
+            self._pending_messages.append((text, icon))
+            return
+        self.showMessage("ActivityWatch", text, icon, 5000)
+
+    @property
+    def root_url(self) -> str:
+        if self._server_config is not None:
+            return self._server_config.root_url
+        return f"http://localhost:{self._port}"
 
     def on_activated(self, reason: QSystemTrayIcon.ActivationReason) -> None:
         if reason == QSystemTrayIcon.ActivationReason.DoubleClick:
@@ -134,7 +160,20 @@ class TrayIcon(QSystemTrayIcon):
         menu.addSeparator()
 
         modulesMenu = menu.addMenu("Modules")
-        self._build_modulemenu(modulesMenu)
+        assert modulesMenu is not None
+        if self.manager.fully_discovered:
+            self._build_modulemenu(modulesMenu)
+        else:
+            # Searching PATH and the bundle takes a while, keep it off the GUI thread
+            placeholder = modulesMenu.addAction("Finding modules...")
+            assert placeholder is not None
+            placeholder.setEnabled(False)
+            self.modules_discovered.connect(
+                lambda: self._build_modulemenu(modulesMenu)
+            )
+            self.manager.probe_worker.submit(
+                self.manager.ensure_discovered
+            ).add_done_callback(lambda future: self.modules_discovered.emit())
 
         menu.addSeparator()
         menu.addAction(
@@ -158,91 +197,105 @@ class TrayIcon(QSystemTrayIcon):
 
         self.setContextMenu(menu)
 
-        def show_module_failed_dialog(module: Module) -> None:
-            box = QMessageBox(self._parent)
-            box.setIcon(QMessageBox.Icon.Warning)
-            recent = self._recent_restart_count(module.name)
-            box.setText(
-                f"Module {module.name} quit unexpectedly"
-                + (
-                    f" after {recent} auto-restart attempts"
-                    f" in {self.RESTART_WINDOW_SECONDS // 60} minutes"
-                    if recent >= self.MAX_AUTO_RESTARTS
-                    else ""
-                )
+        # Module states are kept current by state change events, but uptime and usage
+        # only need to be current while the menu is open
+        modulesMenu.aboutToShow.connect(self._update_module_actions)
+
+    def _show_module_failed_dialog(self, module: Module) -> None:
+        box = QMessageBox(self._parent)
+        box.setIcon(QMessageBox.Icon.Warning)
+        reason = self.manager.quarantine_reason(module)
+        box.setText(
+            f"Module {module.name} quit unexpectedly"
+            + (f" and was quarantined: it {reason}" if reason else "")
+        )
+        details = module.read_log(self.testing)
+        output = module.read_output()
+        if output:
+            details = f"Last output:\n{output}\n\nLog:\n{details}"
+        box.setDetailedText(details)
+
+        restart_button = QPushButton("Restart", box)
+
+        def on_manual_restart() -> None:
+            self.manager.reset_crash_state(module)
+            self.manager.probe_worker.submit(module.start, self.testing)
+
+        restart_button.clicked.connect(on_manual_restart)
+        box.addButton(restart_button, QMessageBox.ButtonRole.AcceptRole)
+        box.setStandardButtons(QMessageBox.StandardButton.Cancel)
+
+        box.show()
+
+    def _on_module_exited(self, module: Module) -> None:
+        # The exit event may be stale, e.g. if the module was restarted from the menu
+        # between the exit and this slot running.
+        if not module.started or module.is_alive():
+            return
+
+        # The manager has already decided whether to restart it
+        if module.state is State.BACKOFF:
+            self._show_message(
+                f"Module {module.name} crashed and will be restarted",
+                QSystemTrayIcon.MessageIcon.Warning,
             )
-            box.setDetailedText(module.read_log(self.testing))
-
-            restart_button = QPushButton("Restart", box)
-
-            def on_manual_restart() -> None:
-                self._restart_timestamps.pop(module.name, None)
-                module.start(self.testing)
-
-            restart_button.clicked.connect(on_manual_restart)
-            box.addButton(restart_button, QMessageBox.ButtonRole.AcceptRole)
-            box.setStandardButtons(QMessageBox.StandardButton.Cancel)
-
-            box.show()
-
-        def rebuild_modules_menu() -> None:
-            for action in modulesMenu.actions():
-                if action.isEnabled():
-                    module: Module = action.data()
-                    alive = module.is_alive()
-                    action.setChecked(alive)
-
-            QtCore.QTimer.singleShot(2000, rebuild_modules_menu)
-
-        QtCore.QTimer.singleShot(2000, rebuild_modules_menu)
-
-        def check_module_status() -> None:
-            unexpected_exits = self.manager.get_unexpected_stops()
-            for module in unexpected_exits:
-                recent = self._recent_restart_count(module.name)
-                if recent < self.MAX_AUTO_RESTARTS:
-                    logger.info(
-                        f"Auto-restarting crashed module {module.name} "
-                        f"(attempt {recent + 1}/{self.MAX_AUTO_RESTARTS}"
-                        f" in {self.RESTART_WINDOW_SECONDS // 60}min window)"
-                    )
-                    module.stop()  # Clean up state
-                    module.start(self.testing)
-                    self._record_restart(module.name)
-                    self.showMessage(
-                        "ActivityWatch",
-                        f"Module {module.name} crashed and was auto-restarted",
-                        QSystemTrayIcon.MessageIcon.Warning,
-                        5000,
-                    )
-                else:
-                    logger.warning(
-                        f"Module {module.name} exceeded max auto-restarts "
-                        f"({self.MAX_AUTO_RESTARTS})"
-                    )
-                    show_module_failed_dialog(module)
-                    module.stop()
-
-            QtCore.QTimer.singleShot(5000, check_module_status)
-
-        QtCore.QTimer.singleShot(5000, check_module_status)
+        elif module.last_exit is not None and module.last_exit.kind == "clean":
+            self._show_message(
+                f"Module {module.name} exited", QSystemTrayIcon.MessageIcon.Information
+            )
+            module.stop()
+        else:
+            self._show_module_failed_dialog(module)
+            module.stop()
+
+    def _on_probe_finished(self, module: Module, alive: bool) -> None:
+        self._update_module_action(module)
+
+    def _update_module_actions(self) -> None:
+        for module in self._module_actions:
+            self._update_module_action(module)
+
+    def _update_module_action(self, module: Module) -> None:
+        action = self._module_actions.get(module)
+        if action is None:
+            return
+        state = module.state
+        title = module.name
+        usage = module.usage_summary() if state in ALIVE else ""
+        if state is State.DEGRADED:
+            title += "  (stalled)"
+        elif usage:
+            title += f"  ({usage})"
+        elif state is State.BACKOFF:
+            title += "  (restarting)"
+        elif state is not State.STOPPED and state not in ALIVE:
+            title += f"  ({state})"
+        reason = self.manager.quarantine_reason(module)
+        action.setText(title)
+        if state is State.DEGRADED:
+            action.setToolTip(f"Running, but {module.lifecycle.history[-1].reason}")
+        else:
+            action.setToolTip(f"Quarantined, since it {reason}" if reason else "")
+        action.setChecked(state in ALIVE or state is State.STARTING)
 
     def _build_modulemenu(self, moduleMenu: QMenu) -> None:
         moduleMenu.clear()
+        moduleMenu.setToolTipsVisible(True)
 
         def add_module_menuitem(module: Module) -> None:
-            title = module.name
-
             def on_toggle(m: Module = module) -> None:
-                m.toggle(self.testing)
-                # Reset auto-restart timestamps on manual toggle
-                self._restart_timestamps.pop(m.name, None)
+                # Reset the auto-restart budget and quarantine on manual toggle, before
+                # the toggle so that it can't cancel or undo the start
+                self.manager.reset_crash_state(m)
+                # Starting may probe for an external server, keep that off the GUI thread
+                self.manager.probe_worker.submit(m.toggle, self.testing)
 
-            ac = moduleMenu.addAction(title, on_toggle)
+            ac = moduleMenu.addAction(module.name, on_toggle)
 
             ac.setData(module)
             ac.setCheckable(True)
-            ac.setChecked(module.is_alive())
+            self._module_actions[module] = ac
+            self._update_module_action(module)
 
         for location, modules in [
             ("bundled", self.manager.modules_bundled),
@@ -266,11 +319,113 @@ def exit(manager: Manager) -> None:
     QApplication.quit()
 
 
-def run(manager: Manager, testing: bool = False, port: Optional[int] = None) -> Any:
+class SystemTrayWaiter(QtCore.QObject):
+    """
+    Waits for the system tray to become available, without blocking the event loop.
+
+    On some desktop environments (e.g. KDE Plasma), autostart programs launch before
+    the panel/system tray is loaded. Qt has no signal for the tray appearing, so it's
+    checked every ``interval`` seconds, and only until it does.
+    See: https://github.com/ActivityWatch/aw-qt/issues/97
+    """
+
+    available = QtCore.pyqtSignal()
+    timed_out = QtCore.pyqtSignal()
+
+    def __init__(self, timeout: float = 10, interval: float = 1) -> None:
+        super().__init__()
+        self.timeout = timeout
+        self._started_at = 0.0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(int(interval * 1000))
+        self._timer.timeout.connect(self._check)
+
+    def start(self) -> None:
+        self._started_at = tracing.now()
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            self._finish(available=True)
+            return
+        logger.info(f"System tray not yet available, waiting up to {self.timeout} s...")
+        self._timer.start()
+
+    def _check(self) -> None:
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            self._finish(available=True)
+        elif (tracing.now() - self._started_at) / 1e6 >= self.timeout:
+            self._finish(available=False)
+
+    def _finish(self, available: bool) -> None:
+        self._timer.stop()
+        now = tracing.now()
+        tracing.complete(
+            "wait for system tray", self._started_at, now, "startup", available=available
+        )
+        waited = (now - self._started_at) / 1e6
+        if available:
+            if waited > 0.01:
+                logger.info(f"System tray became available after {waited:.1f}s")
+            self.available.emit()
+        else:
+            self.timed_out.emit()
+
+
+class SignalHandler(QtCore.QObject):
+    """
+    Calls ``handler`` from the Qt event loop on SIGINT or SIGTERM.
+
+    Python only runs signal handlers once the interpreter gets control, which it
+    doesn't while Qt's event loop sleeps. Rather than waking up regularly to give it
+    control, the signal is written to a socket that the event loop watches (see
+    signal.set_wakeup_fd), so aw-qt sleeps until a signal actually arrives.
+    """
+
+    SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+    def __init__(self, handler: Callable[[], None]) -> None:
+        super().__init__()
+        # A socket rather than a pipe, since that's all set_wakeup_fd takes on Windows
+        self._rsock, self._wsock = socket.socketpair()
+        self._rsock.setblocking(False)
+        self._wsock.setblocking(False)
+        self._previous_fd = signal.set_wakeup_fd(self._wsock.fileno())
+        self._previous_handlers = {
+            signum: signal.signal(signum, lambda *args: handler())
+            for signum in self.SIGNALS
+        }
+        self._notifier = QtCore.QSocketNotifier(
+            sip.voidptr(self._rsock.fileno()), QtCore.QSocketNotifier.Type.Read, self
+        )
+        # The Python handlers run as soon as this slot gives the interpreter control
+        self._notifier.activated.connect(self._drain)
+
+    def _drain(self) -> None:
+        try:
+            while self._rsock.recv(64):
+                pass
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        """Restore the previous signal handlers"""
+        self._notifier.setEnabled(False)
+        for signum, previous in self._previous_handlers.items():
+            signal.signal(signum, previous)
+        signal.set_wakeup_fd(self._previous_fd)
+        self._rsock.close()
+        self._wsock.close()
+
+
+def run(
+    manager: Manager,
+    testing: bool = False,
+    port: Optional[int] = None,
+    server_config: Optional[ServerConfig] = None,
+) -> Any:
     logger.info("Creating trayicon...")
     # print(QIcon.themeSearchPaths())
 
-    app = QApplication(sys.argv)
+    with tracing.span("create QApplication", cat="startup"):
+        app = QApplication(sys.argv)
 
     # This is needed for the icons to get picked up with PyInstaller
     scriptdir = Path(__file__).parent
@@ -291,59 +446,51 @@ def run(manager: Manager, testing: bool = False, port: Optional[int] = None) ->
 
     # logger.info(f"search paths: {QtCore.QDir.searchPaths('icons')}")
 
-    # Without this, Ctrl+C will have no effect
-    signal.signal(signal.SIGINT, lambda *args: exit(manager))
-    # Ensure cleanup happens on SIGTERM
-    signal.signal(signal.SIGTERM, lambda *args: exit(manager))
-
-    timer = QtCore.QTimer()
-    timer.start(100)  # You may change this if you wish.
-    timer.timeout.connect(lambda: None)  # Let the interpreter run each 500 ms.
+    # Without this, Ctrl+C will have no effect, and no cleanup happens on SIGTERM
+    signal_handler = SignalHandler(lambda: exit(manager))
 
     # root widget
     widget = QWidget()
 
-    # Wait for system tray to become available (up to 10 s).
-    # On some desktop environments (e.g. KDE Plasma), autostart programs
-    # launch before the panel/system tray is loaded.  Qt docs note that
-    # "if the system tray is currently unavailable but becomes available
-    # later, QSystemTrayIcon will automatically add an entry."
-    # See: https://github.com/ActivityWatch/aw-qt/issues/97
-    if not QSystemTrayIcon.isSystemTrayAvailable():
-        logger.info("System tray not yet available, waiting up to 10 s...")
-        for i in range(10):
-            time.sleep(1)
-            # Process events so Qt can detect tray availability changes
-            app.processEvents()
-            if QSystemTrayIcon.isSystemTrayAvailable():
-                logger.info(f"System tray became available after {i + 1}s")
-                break
+    with tracing.span("load icon", cat="startup"):
+        if sys.platform == "darwin":
+            icon = QIcon("icons:black-monochrome-logo.png")
+            # Allow macOS to use filters for changing the icon's color
+            icon.setIsMask(True)
         else:
-            QMessageBox.critical(
-                widget,
-                "Systray",
-                "I couldn't detect any system tray on this system. Either get one or run the ActivityWatch modules from the console.",
-            )
-            sys.exit(1)
-
-    if sys.platform == "darwin":
-        icon = QIcon("icons:black-monochrome-logo.png")
-        # Allow macOS to use filters for changing the icon's color
-        icon.setIsMask(True)
-    else:
-        icon = QIcon("icons:logo.png")
+            icon = QIcon("icons:logo.png")
+
+    with tracing.span("create trayicon", cat="startup"):
+        trayIcon = TrayIcon(
+            manager,
+            icon,
+            widget,
+            testing=testing,
+            port=port,
+            server_config=server_config,
+        )
 
-    trayIcon = TrayIcon(manager, icon, widget, testing=testing, port=port)
-    trayIcon.show()
+    def on_no_system_tray() -> None:
+        QMessageBox.critical(
+            widget,
+            "Systray",
+            "I couldn't detect any system tray on this system. Either get one or run the ActivityWatch modules from the console.",
+        )
+        app.exit(1)
 
-    # Re-apply tooltip after show() to ensure it registers with the
-    # platform's system tray backend.  On Windows 11 the tooltip can
-    # appear empty when it is only set before the icon is visible.
-    # See: https://github.com/ActivityWatch/aw-qt/issues/112
-    trayIcon.setToolTip(trayIcon.toolTip())
+    # The icon is shown as soon as the system tray is available (up to 10 s), until
+    # then the modules keep running and the trayicon's messages are held back
+    waiter = SystemTrayWaiter(timeout=10)
+    waiter.available.connect(trayIcon.show_in_tray)
+    waiter.timed_out.connect(on_no_system_tray)
+    waiter.start()
 
     QApplication.setQuitOnLastWindowClosed(False)
 
     logger.info("Initialized aw-qt and trayicon successfully")
+    tracing.instant("initialized", cat="startup")
     # Run the application, blocks until quit
-    return app.exec()
+    try:
+        return app.exec()
+    finally:
+        signal_handler.close()
@@ -0,0 +1,82 @@
+"""
+Benchmark for module discovery on synthetic PATHs.
+
+Creates PATHs with an increasing number of entries (a mix of unrelated files and
+aw-* executables, spread over many directories) and times a full, uncached
+discovery of system modules, as well as the targeted lookup used for autostart.
+
+Run with: python tests/bench_discovery.py
+"""
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+from typing import List
+
+from aw_qt.manager import _discover_modules_system
+
+ENTRIES_PER_DIR = 500
+SIZES = [2000, 4000, 8000, 16000]
+REPEATS = 5
+
+
+def make_path(root: str, total_entries: int) -> List[str]:
+    dirs = []
+    for i in range(total_entries // ENTRIES_PER_DIR):
+        d = os.path.join(root, f"bin{i}")
+        os.mkdir(d)
+        for j in range(ENTRIES_PER_DIR):
+            # One in five entries is a module, the rest are unrelated programs
+            name = f"aw-module-{i}-{j}" if j % 5 == 0 else f"program-{i}-{j}"
+            path = os.path.join(d, name)
+            with open(path, "w") as f:
+                f.write("#!/bin/sh\n")
+            os.chmod(path, 0o755)
+        dirs.append(d)
+    return dirs
+
+
+def best_of(fn) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        fn()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main() -> int:
+    results = []
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as root:
+            dirs = make_path(root, size)
+            os.get_exec_path = lambda env=None: list(dirs)  # type: ignore
+
+            full = best_of(lambda: _discover_modules_system())
+            targeted = best_of(
+                lambda: _discover_modules_system(names=["aw-module-0-0"])
+            )
+            results.append((size, full, targeted))
+            print(
+                f"{size:6} entries: full {full * 1000:8.2f} ms "
+                f"({full / size * 1e6:5.2f} us/entry), "
+                f"targeted {targeted * 1000:6.3f} ms"
+            )
+
+    # Discovery should scale linearly: the time per entry of the largest PATH
+    # may not be much worse than that of the smallest one.
+    per_entry = [full / size for size, full, _ in results]
+    ratio = per_entry[-1] / per_entry[0]
+    print(f"time per entry, largest vs smallest PATH: {ratio:.2f}x")
+    if ratio > 2.0:
+        print("FAIL: discovery does not scale linearly")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    import logging
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
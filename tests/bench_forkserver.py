@@ -0,0 +1,129 @@
+"""
+Benchmark of starting Python modules directly versus forking them from a forkserver.
+
+Creates a number of fake Python modules that import the same libraries as the real
+watchers (aw_core, and aw_client if installed) and then idle, starts them all either as
+fresh interpreters or from a forkserver, and measures:
+
+- spawn latency: from starting a module until it has run its imports and reported ready
+- total RSS of the modules, and their total PSS (the RSS with shared pages split between
+  the processes sharing them, a better measure of actual memory use; Linux only)
+
+Run with: python tests/bench_forkserver.py [number of modules]
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from time import monotonic, perf_counter, sleep
+from typing import List, Optional, Tuple
+
+from aw_qt.forkserver import ForkServerPool
+from aw_qt.manager import Module
+
+PRELOAD = ["aw_core", "aw_client"]
+DEFAULT_MODULES = 4
+
+MODULE_SCRIPT = """#!{python}
+for name in {preload!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+print("ready", flush=True)
+import time
+time.sleep(60)
+"""
+
+
+def _read_kb(path: str, field: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def memory_kb(pid: int) -> Tuple[Optional[int], Optional[int]]:
+    """RSS and PSS of ``pid``, in KiB"""
+    rss = _read_kb(f"/proc/{pid}/status", "VmRSS")
+    pss = _read_kb(f"/proc/{pid}/smaps_rollup", "Pss")
+    return rss, pss
+
+
+def wait_ready(module: Module, timeout: float = 30) -> None:
+    deadline = monotonic() + timeout
+    while "ready" not in module.read_output():
+        if monotonic() > deadline:
+            raise TimeoutError(f"{module.name} didn't become ready")
+        sleep(0.001)
+
+
+def run(scripts: List[Path], pool: Optional[ForkServerPool]) -> None:
+    modules = []
+    for script in scripts:
+        module = Module(script.name, script, "system")
+        module.forkserver = pool
+        modules.append(module)
+
+    latencies = []
+    try:
+        for module in modules:
+            start = perf_counter()
+            module.start(testing=False)
+            wait_ready(module)
+            latencies.append(perf_counter() - start)
+        memory = [memory_kb(m._process.pid) for m in modules if m._process]
+    finally:
+        for module in modules:
+            module.stop()
+
+    label = "forkserver" if pool else "exec"
+    first, rest = latencies[0], latencies[1:] or latencies
+    print(
+        f"{label:10}  first spawn {first * 1000:7.1f} ms, "
+        f"others {sum(rest) / len(rest) * 1000:7.1f} ms on average"
+    )
+    rss = [r for r, _ in memory if r is not None]
+    pss = [p for _, p in memory if p is not None]
+    if rss:
+        print(f"{'':10}  total RSS {sum(rss) / 1024:6.1f} MiB", end="")
+        if pss:
+            print(f", total PSS {sum(pss) / 1024:6.1f} MiB", end="")
+        print()
+
+
+def main() -> int:
+    if sys.platform == "win32":
+        print("The forkserver isn't supported on Windows")
+        return 1
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MODULES
+    with tempfile.TemporaryDirectory() as root:
+        scripts = []
+        for i in range(count):
+            script = Path(root) / f"aw-bench-{i}"
+            script.write_text(MODULE_SCRIPT.format(python=sys.executable, preload=PRELOAD))
+            script.chmod(0o755)
+            scripts.append(script)
+
+        print(f"{count} modules importing {', '.join(PRELOAD)}:")
+        run(scripts, None)
+        pool = ForkServerPool(preload=PRELOAD)
+        try:
+            run(scripts, pool)
+        finally:
+            pool.stop()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("(PSS is only measured on Linux)")
+    return 0
+
+
+if __name__ == "__main__":
+    import logging
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Benchmark of server health probes: a new connection per probe (with urllib, as aw-qt
+used to) versus the shared keep-alive ServerProbeClient.
+
+Starts a stand-in for aw-server in a separate process, serving /api/0/info over
+HTTP/1.1, probes it a number of times either way, and measures:
+
+- probe latency, and CPU time (user and system) of the probing process
+- TCP connections opened
+- socket system calls made (socket, connect, setsockopt, send, recv, close, and
+  getaddrinfo, which takes several)
+
+Run with: python tests/bench_probes.py [number of probes]
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import urllib.request
+from contextlib import contextmanager
+from statistics import median
+from time import perf_counter, sleep
+from typing import Callable, Dict, Iterator
+
+from aw_qt.probes import ServerProbeClient
+
+DEFAULT_PROBES = 500
+
+SERVER_SCRIPT = """
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send each response in one write, as aw-server-rust does, rather than the
+    # headers and body separately (which Nagle's algorithm delays on a kept-alive
+    # connection)
+    wbufsize = -1
+
+    def do_GET(self):
+        body = b'{"hostname": "bench", "version": "v0.0.0", "testing": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+"""
+
+
+# Socket methods that each make one system call
+SOCKET_CALLS = ["__init__", "connect", "setsockopt", "sendall", "recv_into", "close"]
+
+
+@contextmanager
+def count_socket_calls() -> Iterator[Dict[str, int]]:
+    """Count the calls to the socket methods above, and to getaddrinfo"""
+    counts: Dict[str, int] = {}
+
+    def counting(name: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):  # type: ignore
+            counts[name] = counts.get(name, 0) + 1
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    originals = {name: getattr(socket.socket, name) for name in SOCKET_CALLS}
+    getaddrinfo = socket.getaddrinfo
+    for name, fn in originals.items():
+        setattr(socket.socket, name, counting(name, fn))
+    socket.getaddrinfo = counting("getaddrinfo", getaddrinfo)  # type: ignore
+    try:
+        yield counts
+    finally:
+        for name, fn in originals.items():
+            setattr(socket.socket, name, fn)
+        socket.getaddrinfo = getaddrinfo  # type: ignore
+
+
+def run(label: str, probe: Callable[[], bool], count: int) -> None:
+    latencies = []
+    with count_socket_calls() as calls:
+        cpu_before = sum(os.times()[:2])
+        for _ in range(count):
+            start = perf_counter()
+            assert probe()
+            latencies.append(perf_counter() - start)
+        cpu = sum(os.times()[:2]) - cpu_before
+
+    print(
+        f"{label:10}  median {median(latencies) * 1e6:6.0f} µs, "
+        f"CPU {cpu / count * 1e6:5.0f} µs, "
+        f"{calls.get('connect', 0):4} connections, "
+        f"{sum(calls.values()) / count:4.1f} socket syscalls per probe"
+    )
+
+
+def main() -> int:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PROBES
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER_SCRIPT], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert server.stdout is not None
+        port = int(server.stdout.readline())
+        sleep(0.1)
+        url = f"http://127.0.0.1:{port}/api/0/info"
+
+        def probe_urllib() -> bool:
+            with urllib.request.urlopen(url, timeout=1.0):
+                return True
+
+        client = ServerProbeClient(host="127.0.0.1")
+
+        print(f"{count} probes of a local stand-in server:")
+        run("urllib", probe_urllib, count)
+        run("keep-alive", lambda: client.probe(port, timeout=1.0), count)
+        client.close()
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
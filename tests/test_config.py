@@ -0,0 +1,115 @@
+"""Unit tests for the cached server config resolution."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+import aw_qt.config as config_module
+from aw_qt.config import ServerConfig, _CachedToml
+
+
+@pytest.fixture
+def clock():
+    """A fake monotonic clock for the config cache, advanced by hand"""
+    now = [1000.0]
+    with patch.object(config_module, "monotonic", lambda: now[0]):
+        yield now
+
+
+@pytest.fixture
+def config_dirs(tmp_path):
+    def get_config_dir(appname):
+        path = tmp_path / appname
+        path.mkdir(exist_ok=True)
+        return str(path)
+
+    config_module._server_config_path.cache_clear()
+    with (
+        patch.object(config_module.dirs, "get_config_dir", get_config_dir),
+        patch.dict(config_module._toml_cache, clear=True),
+    ):
+        yield tmp_path
+    config_module._server_config_path.cache_clear()
+
+
+def write(path, content):
+    path.write_text(content)
+    # Make sure the change is visible even on filesystems with coarse mtimes
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+class TestCachedToml:
+    def test_unchanged_file_is_parsed_once(self, tmp_path, clock):
+        path = tmp_path / "config.toml"
+        write(path, "port = 5700\n")
+        cached = _CachedToml(str(path))
+
+        for _ in range(3):
+            doc = cached.get()
+            assert doc is not None and doc["port"] == 5700
+            clock[0] += 10
+
+        assert cached.parses == 1
+
+    def test_no_stat_within_check_interval(self, tmp_path, clock):
+        path = tmp_path / "config.toml"
+        write(path, "port = 5700\n")
+        cached = _CachedToml(str(path), check_interval=2.0)
+        cached.get()
+
+        with patch.object(config_module.os, "stat") as stat:
+            clock[0] += 1
+            assert cached.get() is not None
+        stat.assert_not_called()
+
+    def test_changed_file_is_reparsed(self, tmp_path, clock):
+        path = tmp_path / "config.toml"
+        write(path, "port = 5700\n")
+        cached = _CachedToml(str(path))
+        cached.get()
+
+        write(path, "port = 5701\n")
+        clock[0] += 10
+        doc = cached.get()
+
+        assert doc is not None and doc["port"] == 5701
+        assert cached.parses == 2
+
+    def test_missing_or_invalid_file(self, tmp_path, clock):
+        path = tmp_path / "config.toml"
+        cached = _CachedToml(str(path))
+        assert cached.get() is None
+
+        write(path, "port = [\n")
+        clock[0] += 10
+        assert cached.get() is None
+
+
+class TestServerConfig:
+    def test_default_port(self, config_dirs, clock):
+        assert ServerConfig(testing=False).port == 5600
+        assert ServerConfig(testing=True).port == 5666
+
+    def test_rust_config_takes_precedence(self, config_dirs, clock):
+        (config_dirs / "aw-server-rust").mkdir()
+        (config_dirs / "aw-server").mkdir()
+        write(config_dirs / "aw-server-rust" / "config.toml", "port = 5700\n")
+        write(config_dirs / "aw-server" / "aw-server.toml", "[server]\nport = 5800\n")
+
+        assert ServerConfig(testing=False).port == 5700
+
+    def test_follows_port_changes(self, config_dirs, clock):
+        (config_dirs / "aw-server").mkdir()
+        path = config_dirs / "aw-server" / "aw-server.toml"
+        write(path, "[server]\nport = 5800\n")
+        server_config = ServerConfig(testing=False)
+
+        assert server_config.port == 5800
+        assert server_config.root_url == "http://localhost:5800"
+
+        write(path, "[server]\nport = 5801\n")
+        clock[0] += 10
+        assert server_config.root_url == "http://localhost:5801"
+        assert server_config.port == 5801
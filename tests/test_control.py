@@ -0,0 +1,176 @@
+"""Tests for the Unix-socket control API."""
+
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aw_qt.control import ControlServer
+from aw_qt.lifecycle import State
+from aw_qt.manager import Manager, Module
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets")
+
+
+@pytest.fixture
+def mgr():
+    with patch.object(Manager, "discover_modules"):
+        mgr = Manager(testing=True)
+    mgr._fully_discovered = True
+    mgr.modules = [
+        Module("aw-server", Path("/usr/bin/aw-server"), "bundled"),
+        Module("aw-watcher-afk", Path("/usr/bin/aw-watcher-afk"), "system"),
+    ]
+    return mgr
+
+
+@pytest.fixture
+def server(mgr, tmp_path):
+    server = ControlServer(mgr, str(tmp_path / "aw-qt.sock"))
+    server.start()
+    yield server
+    server.stop()
+
+
+class Client:
+    def __init__(self, path: str) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(5)
+        self.sock.connect(path)
+        self.f = self.sock.makefile("rb")
+
+    def send(self, **request) -> None:
+        self.sock.sendall((json.dumps(request) + "\n").encode())
+
+    def read(self) -> dict:
+        return json.loads(self.f.readline())
+
+    def request(self, **request) -> list:
+        """Send a request and read all replies to it, up to and including the last one"""
+        self.send(**request)
+        replies = []
+        while not replies or not replies[-1].get("done"):
+            replies.append(self.read())
+        return replies
+
+    def close(self) -> None:
+        self.f.close()
+        self.sock.close()
+
+
+@pytest.fixture
+def client(server):
+    client = Client(server.path)
+    yield client
+    client.close()
+
+
+def test_list_modules_streams_one_reply_per_module(client):
+    replies = client.request(id=1, command="list-modules")
+
+    assert [r["data"]["name"] for r in replies[:-1]] == ["aw-server", "aw-watcher-afk"]
+    assert replies[-1] == {"id": 1, "done": True, "ok": True}
+
+
+def test_status_of_single_module(client):
+    replies = client.request(id=2, command="status", module="aw-watcher-afk")
+
+    assert len(replies) == 2
+    status = replies[0]["data"]
+    assert status["name"] == "aw-watcher-afk"
+    assert status["alive"] is False
+    assert status["pid"] is None
+
+
+def test_errors(client):
+    assert client.request(command="start", module="aw-nope")[-1]["error"] == (
+        "module aw-nope not found"
+    )
+    assert client.request(command="stop", module="aw-server")[-1]["ok"] is False
+    assert "unknown command" in client.request(command="dance")[-1]["error"]
+
+    client.sock.sendall(b"not json\n")
+    reply = client.read()
+    assert reply["ok"] is False and "invalid JSON" in reply["error"]
+
+
+def test_start_and_restart(client, mgr):
+    module = mgr.modules[1]
+    with (
+        patch.object(module, "start") as start,
+        patch.object(module, "stop") as stop,
+    ):
+        assert client.request(command="start", module="aw-watcher-afk")[-1]["ok"]
+        start.assert_called_once_with(True)
+
+        module.started = True
+        assert client.request(command="restart", module="aw-watcher-afk")[-1]["ok"]
+        stop.assert_called_once()
+        assert start.call_count == 2
+
+
+def test_subscribe_pushes_events_to_every_subscriber(server, mgr):
+    clients = [Client(server.path) for _ in range(3)]
+    try:
+        for i, c in enumerate(clients):
+            assert c.request(id=i, command="subscribe")[-1]["ok"]
+
+        mgr.modules[1].lifecycle.set(State.CRASHED, "exit code 1 after 3.0s")
+
+        for i, c in enumerate(clients):
+            event = c.read()
+            assert event["id"] == i
+            assert event["event"] == "state"
+            assert event["module"] == "aw-watcher-afk"
+            assert (event["previous"], event["state"]) == ("stopped", "crashed")
+            assert event["reason"] == "exit code 1 after 3.0s"
+    finally:
+        for c in clients:
+            c.close()
+
+
+def test_concurrent_clients(server):
+    errors: list = []
+
+    def run() -> None:
+        try:
+            c = Client(server.path)
+            for _ in range(20):
+                assert c.request(command="status")[-1]["ok"]
+            c.close()
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+
+
+def test_socket_is_private_and_removed_on_stop(server):
+    assert stat.S_IMODE(os.stat(server.path).st_mode) == 0o600
+    server.stop()
+    assert not os.path.exists(server.path)
+
+
+def test_socket_is_private_from_the_start(mgr, tmp_path):
+    server = ControlServer(mgr, str(tmp_path / "aw-qt.sock"))
+    umask = os.umask(0o022)
+    try:
+        # Leaves only the mode the socket was created with
+        with patch("aw_qt.control.os.chmod"):
+            server.start()
+        assert stat.S_IMODE(os.stat(server.path).st_mode) & 0o077 == 0
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(umask)
+        server.stop()
@@ -0,0 +1,156 @@
+"""Unit tests for the persistent module discovery cache."""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from aw_qt.discovery import DiscoveryCache
+from aw_qt.manager import _discover_modules_system
+
+
+@pytest.fixture
+def module_dir(tmp_path):
+    d = tmp_path / "bin"
+    d.mkdir()
+    for name in ["aw-watcher-afk", "aw-watcher-window", "unrelated"]:
+        f = d / name
+        f.write_text("#!/bin/sh\n")
+        f.chmod(0o755)
+    return d
+
+
+def counting_scan(calls):
+    def scan(path):
+        calls.append(path)
+        return sorted((name, "executable") for name in os.listdir(path))
+
+    return scan
+
+
+class TestDiscoveryCache:
+    def test_unchanged_directory_is_not_rescanned(self, tmp_path, module_dir):
+        calls: list = []
+        cache = DiscoveryCache(str(tmp_path / "cache.json"))
+
+        first = cache.list_directory(str(module_dir), counting_scan(calls))
+        second = cache.list_directory(str(module_dir), counting_scan(calls))
+
+        assert first == second
+        assert calls == [str(module_dir)]
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_persists_between_launches(self, tmp_path, module_dir):
+        calls: list = []
+        cache = DiscoveryCache(str(tmp_path / "cache.json"))
+        cache.list_directory(str(module_dir), counting_scan(calls))
+        cache.save()
+
+        cache = DiscoveryCache(str(tmp_path / "cache.json"))
+        cache.list_directory(str(module_dir), counting_scan(calls))
+
+        assert len(calls) == 1
+
+    def test_changed_directory_is_rescanned(self, tmp_path, module_dir):
+        calls: list = []
+        cache = DiscoveryCache(str(tmp_path / "cache.json"))
+        cache.list_directory(str(module_dir), counting_scan(calls))
+
+        (module_dir / "aw-watcher-input").write_text("")
+        # Make sure the mtime changes even on filesystems with coarse timestamps
+        st = os.stat(module_dir)
+        os.utime(module_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        entries = cache.list_directory(str(module_dir), counting_scan(calls))
+
+        assert len(calls) == 2
+        assert ("aw-watcher-input", "executable") in entries
+
+    def test_force_ignores_saved_cache(self, tmp_path, module_dir):
+        calls: list = []
+        cache = DiscoveryCache(str(tmp_path / "cache.json"))
+        cache.list_directory(str(module_dir), counting_scan(calls))
+        cache.save()
+
+        cache = DiscoveryCache(str(tmp_path / "cache.json"), force=True)
+        cache.list_directory(str(module_dir), counting_scan(calls))
+
+        assert len(calls) == 2
+
+    def test_corrupt_cache_is_ignored(self, tmp_path, module_dir):
+        (tmp_path / "cache.json").write_text("{not json")
+        calls: list = []
+
+        cache = DiscoveryCache(str(tmp_path / "cache.json"))
+        cache.list_directory(str(module_dir), counting_scan(calls))
+
+        assert len(calls) == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+def test_system_discovery_uses_cache(tmp_path, module_dir, monkeypatch):
+    monkeypatch.setattr(os, "get_exec_path", lambda: [str(module_dir)])
+    cache = DiscoveryCache(str(tmp_path / "cache.json"))
+
+    first = _discover_modules_system(cache)
+    second = _discover_modules_system(cache)
+
+    assert sorted(m.name for m in first) == ["aw-watcher-afk", "aw-watcher-window"]
+    assert sorted(m.name for m in second) == sorted(m.name for m in first)
+    assert cache.hits == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+class TestTargetedDiscovery:
+    @pytest.fixture
+    def path_dirs(self, tmp_path, monkeypatch):
+        dirs = []
+        layout = [["aw-watcher-afk"], ["aw-watcher-afk", "aw-server"], ["aw-watcher-window"]]
+        for i, names in enumerate(layout):
+            d = tmp_path / f"bin{i}"
+            d.mkdir()
+            for name in names:
+                f = d / name
+                f.write_text("#!/bin/sh\n")
+                f.chmod(0o755)
+            dirs.append(d)
+        monkeypatch.setattr(os, "get_exec_path", lambda: [str(d) for d in dirs])
+        return dirs
+
+    def test_named_lookup_does_not_list_directories(self, path_dirs):
+        import aw_qt.manager as manager_module
+
+        with patch.object(manager_module, "_scan_directory", side_effect=AssertionError):
+            modules = _discover_modules_system(names=["aw-watcher-afk", "aw-server"])
+
+        by_name = {m.name: m for m in modules}
+        assert set(by_name) == {"aw-watcher-afk", "aw-server"}
+        # PATH priority is respected
+        assert by_name["aw-watcher-afk"].path == path_dirs[0] / "aw-watcher-afk"
+
+    def test_manager_discovers_rest_lazily(self, tmp_path, path_dirs):
+        import aw_qt.manager as manager_module
+        from aw_qt.manager import Manager
+
+        with (
+            patch.object(manager_module, "_discover_modules_bundled", return_value=[]),
+            patch.object(
+                DiscoveryCache,
+                "default",
+                side_effect=lambda force: DiscoveryCache(str(tmp_path / "cache.json")),
+            ),
+        ):
+            mgr = Manager(discover_only=["aw-server"])
+            assert [m.name for m in mgr.modules] == ["aw-server"]
+
+            # Unknown modules are looked up on demand
+            assert mgr._find_module("aw-watcher-window") is not None
+            assert len(mgr.modules) == 2
+
+            mgr.ensure_discovered()
+
+        assert sorted(m.name for m in mgr.modules) == [
+            "aw-server",
+            "aw-watcher-afk",
+            "aw-watcher-window",
+        ]
@@ -0,0 +1,131 @@
+"""Unit tests for forking Python modules from a forkserver."""
+
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from aw_qt.forkserver import ForkedProcess, ForkServerPool, interpreter_for
+from aw_qt.manager import Module
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="no fork on Windows")
+
+
+def write_script(path: Path, shebang: str, body: str) -> Path:
+    path.write_text(f"#!{shebang}\n{body}")
+    path.chmod(0o755)
+    return path
+
+
+class TestInterpreterFor:
+    @pytest.mark.parametrize(
+        "shebang, expected",
+        [
+            ("/usr/bin/python3", "/usr/bin/python3"),
+            ("/opt/venv/bin/python3.11", "/opt/venv/bin/python3.11"),
+            ("/usr/bin/python3 -s", None),  # options can't be applied to a fork
+            ("/bin/sh", None),
+        ],
+    )
+    def test_shebangs(self, tmp_path, shebang, expected):
+        script = write_script(tmp_path / "aw-test", shebang, "")
+        assert interpreter_for(str(script)) == expected
+
+    def test_env_is_resolved(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("PATH", os.path.dirname(sys.executable))
+        name = os.path.basename(sys.executable)
+        script = write_script(tmp_path / "aw-test", f"/usr/bin/env {name}", "")
+        assert interpreter_for(str(script)) == sys.executable
+
+    def test_native_executables(self):
+        assert interpreter_for("/bin/true") is None
+        assert interpreter_for("/nonexistent") is None
+
+
+@pytest.fixture
+def pool():
+    pool = ForkServerPool(preload=["json"])
+    yield pool
+    pool.stop()
+
+
+@pytest.fixture
+def python_module(tmp_path, pool):
+    script = write_script(
+        tmp_path / "aw-test-python",
+        sys.executable,
+        "import os, sys, time\n"
+        "print(__name__, sys.argv[1:], sys.path[0], flush=True)\n"
+        "print('oops', file=sys.stderr)\n"
+        "if '--testing' in sys.argv:\n"
+        "    sys.exit(3)\n"
+        "time.sleep(30)\n",
+    )
+    module = Module("aw-test-python", script, "system")
+    module.forkserver = pool
+    yield module
+    if module.is_alive():
+        module.stop()
+
+
+class TestForkedModules:
+    def test_module_is_forked_and_its_exit_reported(self, python_module, tmp_path):
+        done = threading.Event()
+        python_module.add_exit_listener(lambda m: done.set())
+
+        python_module.start(testing=True)
+
+        assert isinstance(python_module._process, ForkedProcess)
+        assert done.wait(timeout=10)
+        assert python_module.last_exit is not None
+        assert python_module.last_exit.returncode == 3
+        # Run like a script, with its output captured
+        assert python_module.read_output() == f"__main__ ['--testing'] {tmp_path}\noops"
+
+    def test_stop(self, python_module):
+        python_module.start(testing=False)
+        process = python_module._process
+        assert isinstance(process, ForkedProcess)
+        assert python_module.is_alive()
+
+        python_module.stop()
+
+        assert process.returncode == -signal.SIGTERM
+        assert not python_module.is_alive()
+
+    def test_native_modules_are_started_directly(self, pool, tmp_path):
+        script = write_script(tmp_path / "aw-test-sh", "/bin/sh", "exec sleep 30\n")
+        module = Module("aw-test-sh", script, "system")
+        module.forkserver = pool
+
+        module.start(testing=False)
+        try:
+            assert not isinstance(module._process, ForkedProcess)
+        finally:
+            module.stop()
+
+    def test_modules_are_stopped_if_the_forkserver_dies(self, python_module, pool):
+        done = threading.Event()
+        python_module.add_exit_listener(lambda m: done.set())
+        python_module.start(testing=False)
+        pid = python_module._process.pid
+
+        (server,) = pool._servers.values()
+        assert server._conn is not None
+        server._conn.server.kill()
+
+        assert done.wait(timeout=10)
+        assert python_module.last_exit.returncode == -signal.SIGTERM
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("forked module still running")
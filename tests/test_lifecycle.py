@@ -0,0 +1,184 @@
+"""Tests for the module lifecycle state machine."""
+
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import aw_qt.manager as manager_module
+from aw_qt.lifecycle import Lifecycle, State
+from aw_qt.manager import Module, Restarter, RestartPolicy
+
+unix_only = pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+
+
+class TestLifecycle:
+    def test_transitions_are_recorded_and_notified(self):
+        lifecycle = Lifecycle("aw-test")
+        seen: list = []
+        lifecycle.add_listener(seen.append)
+
+        lifecycle.set(State.STARTING)
+        lifecycle.set(State.RUNNING)
+        assert lifecycle.set(State.RUNNING) is None  # not a transition
+        lifecycle.set(State.CRASHED, "exit code 1")
+
+        assert [(t.previous, t.state) for t in seen] == [
+            (State.STOPPED, State.STARTING),
+            (State.STARTING, State.RUNNING),
+            (State.RUNNING, State.CRASHED),
+        ]
+        assert seen[-1].reason == "exit code 1"
+        assert list(lifecycle.history) == seen
+        assert lifecycle.since == seen[-1].time
+        assert seen[0].time <= seen[1].time <= seen[2].time
+
+    def test_compare_and_set(self):
+        lifecycle = Lifecycle("aw-test")
+        assert not lifecycle.compare_and_set({State.BACKOFF}, State.STARTING)
+        assert lifecycle.state is State.STOPPED
+        assert lifecycle.compare_and_set({State.STOPPED}, State.STARTING)
+        assert lifecycle.state is State.STARTING
+
+    def test_broken_listener_does_not_stop_transition(self):
+        lifecycle = Lifecycle("aw-test")
+        lifecycle.add_listener(lambda t: 1 / 0)
+        lifecycle.set(State.STARTING)
+        assert lifecycle.state is State.STARTING
+
+
+@pytest.fixture
+def mock_popen():
+    process = MagicMock(spec=subprocess.Popen)
+    process.pid = 12345
+    process.returncode = None
+
+    def fake_wait(timeout=None):
+        process.returncode = -15
+
+    process.wait.side_effect = fake_wait
+    with (
+        patch("subprocess.Popen", return_value=process) as popen,
+        patch.object(manager_module._child_watcher, "watch"),
+    ):
+        yield popen
+
+
+@pytest.fixture
+def module():
+    return Module("aw-test-module", Path("/usr/bin/true"), "system")
+
+
+class TestModuleLifecycle:
+    def test_start_and_stop(self, module, mock_popen):
+        seen: list = []
+        module.add_state_listener(lambda m, t: seen.append(t.state))
+
+        module.start(testing=True)
+        module.stop()
+
+        assert seen == [State.STARTING, State.RUNNING, State.STOPPING, State.STOPPED]
+
+    def test_concurrent_starts_are_merged(self, module, mock_popen):
+        barrier = threading.Barrier(8)
+
+        def start() -> None:
+            barrier.wait()
+            module.start(testing=True)
+
+        threads = [threading.Thread(target=start) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert mock_popen.call_count == 1
+        assert module.state is State.RUNNING
+
+    def test_restart_is_merged_with_start_by_hand(self, module, mock_popen):
+        module.started = True
+        module.restart_policy = RestartPolicy(initial_delay=0.2, jitter=0)
+        restarter = Restarter(testing=True)
+
+        restarter.on_exit(module)
+        assert module.state is State.BACKOFF
+        module.start(testing=True)  # by hand, while waiting to restart
+        timer = restarter._timers[module]
+        timer.join()
+
+        assert mock_popen.call_count == 1
+        assert module.state is State.RUNNING
+
+
+@unix_only
+def test_crash_is_a_transition():
+    module = Module("aw-test-false", Path("/bin/false"), "system")
+    crashed = threading.Event()
+    module.add_state_listener(
+        lambda m, t: crashed.set() if t.state is State.CRASHED else None
+    )
+
+    module.start(testing=False)
+
+    assert crashed.wait(timeout=5)
+    assert module.lifecycle.history[-1].reason.startswith("exit code 1")
+
+
+@unix_only
+def test_instant_exit_is_not_overwritten(tmp_path):
+    script = tmp_path / "aw-test-exit"
+    script.write_text("#!/bin/sh\nexit 3\n")
+    script.chmod(0o755)
+    module = Module("aw-test-exit", script, "system")
+
+    def watch_after_exit(process, callback):
+        # The exit is reported as soon as the process is watched
+        process.wait()
+        callback(process)
+
+    with patch.object(manager_module._child_watcher, "watch", watch_after_exit):
+        module.start(testing=False)
+
+    assert module.state is State.CRASHED
+    assert [t.state for t in module.lifecycle.history] == [
+        State.STARTING,
+        State.RUNNING,
+        State.CRASHED,
+    ]
+
+
+@unix_only
+def test_exit_reported_late_is_not_a_crash(tmp_path):
+    script = tmp_path / "aw-test-sleep"
+    script.write_text("#!/bin/sh\nexec sleep 30\n")
+    script.chmod(0o755)
+    module = Module("aw-test-sleep", script, "system")
+    watched: list = []
+    exits: list = []
+    module.add_exit_listener(exits.append)
+
+    with patch.object(
+        manager_module._child_watcher,
+        "watch",
+        lambda process, callback: watched.append((process, callback)),
+    ):
+        module.start(testing=False)
+    is_alive = module.is_alive
+
+    def exit_reported_once_stopped():
+        alive = is_alive()
+        if not alive and module.state is State.STOPPING:
+            # The exit callback runs on another thread, and may come at any point
+            process, callback = watched[0]
+            callback(process)
+        return alive
+
+    with patch.object(module, "is_alive", exit_reported_once_stopped):
+        module.stop()
+
+    assert exits == []
+    assert module.last_exit is None
+    assert module.state is State.STOPPED
@@ -0,0 +1,167 @@
+"""Unit tests for per-module resource limits."""
+
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import aw_qt.limits as limits_module
+from aw_qt.limits import CgroupError, CgroupTree, LaunchPolicy
+from aw_qt.manager import Manager, Module
+
+linux_only = pytest.mark.skipif(sys.platform != "linux", reason="Linux only")
+
+
+class TestLaunchPolicySettings:
+    def test_parses_all_limits(self):
+        policy = LaunchPolicy.from_settings(
+            {
+                "cpu": 0.25,
+                "memory": "200M",
+                "nice": 10,
+                "ionice": "best-effort:7",
+                "cpu_affinity": [0, 1],
+            }
+        )
+        assert policy.cpu == 0.25
+        assert policy.memory == 200 * 1024**2
+        assert policy.nice == 10
+        assert policy.ionice == "best-effort:7"
+        assert policy.cpu_affinity == {0, 1}
+
+    @pytest.mark.parametrize(
+        "settings",
+        [{"cpus": 1}, {"memory": "lots"}, {"ionice": "fast"}, {"nice": "high"}],
+    )
+    def test_invalid_settings(self, settings):
+        with pytest.raises(ValueError):
+            LaunchPolicy.from_settings(settings)
+
+    def test_invalid_limits_are_ignored_by_module(self):
+        module = Module("aw-test", "/bin/true", "system")
+        module.configure({"limits": {"memory": "lots"}})
+        assert module.limits is None
+
+
+@pytest.fixture
+def cgroupfs(tmp_path):
+    """A fake cgroup2 mount with aw-qt in /app.slice/aw-qt.scope"""
+    proc = tmp_path / "proc" / "self"
+    proc.mkdir(parents=True)
+    (proc / "cgroup").write_text("0::/app.slice/aw-qt.scope\n")
+    base = tmp_path / "cgroup" / "app.slice" / "aw-qt.scope"
+    base.mkdir(parents=True)
+    (base / "cgroup.controllers").write_text("cpuset cpu io memory pids\n")
+    (base / "cgroup.procs").write_text(f"{os.getpid()}\n")
+    return CgroupTree(str(tmp_path / "cgroup"), str(tmp_path / "proc")), base
+
+
+class TestCgroupTree:
+    def test_moves_itself_to_a_leaf_and_creates_module_cgroup(self, cgroupfs):
+        tree, base = cgroupfs
+
+        tree.add("aw-watcher-afk", 1234, cpu=0.5, memory=1024)
+
+        assert (base / "aw-qt" / "cgroup.procs").read_text() == str(os.getpid())
+        assert (base / "cgroup.subtree_control").read_text() == "+cpu +memory"
+        module_cgroup = base / "module-aw-watcher-afk"
+        assert (module_cgroup / "cpu.max").read_text() == "50000 100000"
+        assert (module_cgroup / "memory.max").read_text() == "1024"
+        assert (module_cgroup / "cgroup.procs").read_text() == "1234"
+
+    def test_not_used_if_shared_with_other_processes(self, cgroupfs):
+        tree, base = cgroupfs
+        # e.g. the shell aw-qt was started from, in the same terminal scope
+        (base / "cgroup.procs").write_text(f"4321\n{os.getpid()}\n")
+
+        with patch.object(tree, "_move") as move:
+            with pytest.raises(CgroupError, match="shared with other processes"):
+                tree.add("aw-watcher-afk", 1234, cpu=0.5, memory=None)
+
+        assert not move.called
+        assert not (base / "aw-qt").exists()
+        assert not (base / "cgroup.subtree_control").exists()
+
+    def test_set_up_before_autostart(self, cgroupfs):
+        tree, base = cgroupfs
+        with patch.object(Manager, "discover_modules"):
+            manager = Manager(testing=True)
+        module = Module("aw-watcher-afk", Path("/bin/true"), "system")
+        module.limits = LaunchPolicy(cpu=0.5)
+        manager.modules = [module]
+        calls: list = []
+        original_setup = tree.setup
+
+        def setup():
+            calls.append("setup")
+            original_setup()
+
+        with (
+            patch.object(limits_module, "_cgroups", tree),
+            patch.object(sys, "platform", "linux"),
+            patch.object(tree, "setup", side_effect=setup),
+            patch.object(Module, "start", side_effect=lambda t: calls.append("start")),
+            patch.object(Module, "wait_ready"),
+        ):
+            manager.autostart(["aw-watcher-afk"])
+
+        assert calls == ["setup", "start"]
+        assert (base / "cgroup.subtree_control").read_text() == "+cpu +memory"
+
+    def test_missing_controllers(self, cgroupfs):
+        tree, base = cgroupfs
+        (base / "cgroup.controllers").write_text("pids\n")
+
+        with pytest.raises(CgroupError, match="cpu, memory"):
+            tree.add("aw-watcher-afk", 1234, cpu=0.5, memory=None)
+        # The failure is remembered
+        with pytest.raises(CgroupError):
+            tree.add("aw-watcher-window", 1235, cpu=0.5, memory=None)
+
+
+@linux_only
+class TestApply:
+    @pytest.fixture
+    def sleeper(self, tmp_path):
+        script = tmp_path / "aw-test-sleeper"
+        script.write_text("#!/bin/sh\nexec sleep 30\n")
+        script.chmod(0o755)
+        module = Module("aw-test-sleeper", script, "system")
+        yield module
+        module.stop()
+
+    @pytest.fixture
+    def no_cgroups(self):
+        tree = CgroupTree(root="/nonexistent", proc="/nonexistent")
+        with patch.object(limits_module, "_cgroups", tree):
+            yield
+
+    def test_nice_and_affinity(self, sleeper):
+        cpu = min(os.sched_getaffinity(0))
+        sleeper.configure({"limits": {"nice": 15, "cpu_affinity": [cpu]}})
+
+        sleeper.start(testing=False)
+        pid = sleeper._process.pid
+
+        assert sleeper.limit_errors == []
+        assert os.getpriority(os.PRIO_PROCESS, pid) == 15
+        assert os.sched_getaffinity(pid) == {cpu}
+
+    def test_memory_falls_back_to_rlimit(self, sleeper, no_cgroups):
+        import resource
+
+        sleeper.configure({"limits": {"memory": "1G"}})
+        sleeper.start(testing=False)
+
+        assert sleeper.limit_errors == []
+        limit = resource.prlimit(sleeper._process.pid, resource.RLIMIT_AS)
+        assert limit == (1024**3, 1024**3)
+
+    def test_unapplied_cpu_limit_is_reported(self, sleeper, no_cgroups):
+        sleeper.configure({"limits": {"cpu": 0.5}})
+        sleeper.start(testing=False)
+
+        assert len(sleeper.limit_errors) == 1
+        assert "cpu limit not applied" in sleeper.limit_errors[0]
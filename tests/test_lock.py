@@ -0,0 +1,36 @@
+"""Unit tests for the single-instance lock."""
+
+import os
+import subprocess
+import sys
+
+from aw_qt.lock import InstanceLock
+
+
+def test_second_lock_fails_until_released(tmp_path):
+    path = str(tmp_path / "aw-qt.lock")
+    first = InstanceLock(path)
+    second = InstanceLock(path)
+
+    assert first.try_lock()
+    assert not second.try_lock()
+    assert second.holder_pid() == os.getpid()
+
+    first.unlock()
+    assert second.try_lock()
+    second.unlock()
+
+
+def test_lock_is_released_when_holder_dies(tmp_path):
+    path = str(tmp_path / "aw-qt.lock")
+    code = (
+        "import sys, os; from aw_qt.lock import InstanceLock; "
+        f"assert InstanceLock({path!r}).try_lock(); os._exit(0)"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    # The file is left behind, but the lock isn't
+    assert os.path.exists(path)
+    lock = InstanceLock(path)
+    assert lock.try_lock()
+    lock.unlock()
@@ -0,0 +1,114 @@
+"""Unit tests for reading the end of module logs."""
+
+import os
+from unittest.mock import patch
+
+import aw_qt.logs as logs_module
+from aw_qt.logs import find_log_files, tail
+
+
+def write_lines(path, start, stop):
+    path.write_text("".join(f"line {i}\n" for i in range(start, stop)))
+
+
+class TestTail:
+    def test_last_lines_of_a_file(self, tmp_path):
+        path = tmp_path / "aw-test_2024-01-01.log"
+        write_lines(path, 0, 1000)
+
+        assert tail([str(path)], max_lines=3) == "line 997\nline 998\nline 999"
+
+    def test_short_file_is_returned_whole(self, tmp_path):
+        path = tmp_path / "aw-test_2024-01-01.log"
+        write_lines(path, 0, 5)
+
+        assert tail([str(path)], max_lines=100).splitlines() == [
+            f"line {i}" for i in range(5)
+        ]
+
+    def test_reads_only_the_end_of_large_files(self, tmp_path):
+        path = tmp_path / "aw-test_2024-01-01.log"
+        write_lines(path, 0, 500_000)  # ~6 MB
+        reads: list = []
+        real_read_tail = logs_module._read_tail
+
+        with patch.object(
+            logs_module,
+            "_read_tail",
+            side_effect=lambda *a: reads.append(real_read_tail(*a)) or reads[-1],
+        ):
+            result = tail([str(path)], max_lines=10)
+
+        assert result.splitlines()[-1] == "line 499999"
+        assert len(result.splitlines()) == 10
+        assert len(reads[0][0]) <= logs_module.BLOCK_SIZE
+
+    def test_byte_limit_drops_partial_first_line(self, tmp_path):
+        path = tmp_path / "aw-test_2024-01-01.log"
+        write_lines(path, 0, 1000)
+
+        result = tail([str(path)], max_lines=1000, max_bytes=100)
+
+        assert len(result) <= 100
+        assert all(line.startswith("line ") for line in result.splitlines())
+        assert result.splitlines()[-1] == "line 999"
+
+    def test_spans_rotated_files(self, tmp_path):
+        older = tmp_path / "aw-test_2024-01-01.log.1"
+        newer = tmp_path / "aw-test_2024-01-01.log"
+        write_lines(older, 0, 10)
+        write_lines(newer, 10, 12)
+
+        result = tail([str(newer), str(older)], max_lines=5)
+
+        assert result.splitlines() == [f"line {i}" for i in range(7, 12)]
+
+
+class TestFindLogFiles:
+    def test_newest_first_with_rotated_files(self, tmp_path):
+        for name in [
+            "aw-test_2024-01-01T10-00-00.log",
+            "aw-test_2024-01-02T10-00-00.log",
+            "aw-test_2024-01-02T10-00-00.log.1",
+            "aw-test_2024-01-02T10-00-00.log.2",
+            "aw-test_testing-2024-01-03T10-00-00.log",
+            "aw-test-other_2024-01-03T10-00-00.log",
+        ]:
+            (tmp_path / name).write_text("")
+
+        files = find_log_files("aw-test", testing=False, log_dir=str(tmp_path))
+
+        assert [os.path.basename(f) for f in files] == [
+            "aw-test_2024-01-02T10-00-00.log",
+            "aw-test_2024-01-02T10-00-00.log.1",
+            "aw-test_2024-01-02T10-00-00.log.2",
+            "aw-test_2024-01-01T10-00-00.log",
+        ]
+
+    def test_testing_logs_in_a_shared_log_dir(self, tmp_path):
+        for name in [
+            "aw-test_2024-01-02T10-00-00.log",
+            "aw-test_testing-2024-01-03T10-00-00.log",
+        ]:
+            (tmp_path / name).write_text("")
+
+        with patch("aw_core.dirs.legacy_testing_suffix", return_value="-testing"):
+            files = find_log_files("aw-test", testing=True, log_dir=str(tmp_path))
+
+        assert [os.path.basename(f) for f in files] == [
+            "aw-test_testing-2024-01-03T10-00-00.log"
+        ]
+
+    def test_testing_logs_in_an_isolated_log_dir(self, tmp_path):
+        # An isolated testing root has a log dir of its own, with the usual names
+        (tmp_path / "aw-test_2024-01-02T10-00-00.log").write_text("")
+
+        with patch("aw_core.dirs.legacy_testing_suffix", return_value=""):
+            files = find_log_files("aw-test", testing=True, log_dir=str(tmp_path))
+
+        assert [os.path.basename(f) for f in files] == [
+            "aw-test_2024-01-02T10-00-00.log"
+        ]
+
+    def test_missing_log_dir(self, tmp_path):
+        assert find_log_files("aw-test", False, log_dir=str(tmp_path / "nope")) == []
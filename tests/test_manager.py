@@ -2,13 +2,18 @@
 
 import os
 import subprocess
+import sys
+import threading
+from contextlib import ExitStack
 from pathlib import Path
+from time import sleep
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 import aw_qt.manager as manager_module
-from aw_qt.manager import Module
+from aw_qt.lifecycle import State
+from aw_qt.manager import Module, Restarter, RestartPolicy, classify_exit
 
 
 @pytest.fixture
@@ -36,7 +41,7 @@ class TestModuleToggle:
         mock_proc.returncode = None  # None means still running
 
         # After terminate+wait, process should report as dead
-        def fake_wait():
+        def fake_wait(timeout=None):
             mock_proc.returncode = -15  # SIGTERM
 
         mock_proc.wait.side_effect = fake_wait
@@ -89,56 +94,98 @@ class TestModuleServerProbe:
         ):
             assert mod._get_server_port(testing=False) == 6601
 
-    def test_probe_external_server_closes_response(self):
+    def test_probe_external_server_uses_shared_client(self):
         mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
-        response = MagicMock()
 
         with (
             patch.object(mod, "_get_server_port", return_value=5600),
-            patch("urllib.request.urlopen", return_value=response) as urlopen,
+            patch.object(manager_module._probe_client, "probe", return_value=True) as probe,
         ):
             assert mod._probe_external_server(testing=False) is True
 
-        urlopen.assert_called_once_with("http://localhost:5600/api/0/info", timeout=0.2)
-        response.__enter__.assert_called_once_with()
-        response.__exit__.assert_called_once()
+        probe.assert_called_once_with(5600, 0.2)
 
     def test_probe_external_server_allows_custom_timeout(self):
         mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
-        response = MagicMock()
 
         with (
             patch.object(mod, "_get_server_port", return_value=5600),
-            patch("urllib.request.urlopen", return_value=response) as urlopen,
+            patch.object(manager_module._probe_client, "probe", return_value=True) as probe,
         ):
             assert mod._probe_external_server(testing=False, timeout=1.0) is True
 
-        urlopen.assert_called_once_with("http://localhost:5600/api/0/info", timeout=1.0)
+        probe.assert_called_once_with(5600, 1.0)
 
-    def test_probe_external_server_cached_reuses_recent_result(self):
+    def test_external_server_probe_failure_clears_state_and_notifies(self):
         mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
+        mod.started = True
+        mod._external_server = True
+        mod._external_server_testing = True
+        mod._external_server_probe_cache = True
+        # Of a server it launched before
+        mod.last_exit = classify_exit(-9, 0.1, early_exit=5)
+        exited = []
+        mod.add_exit_listener(exited.append)
 
-        with (
-            patch("aw_qt.manager.monotonic", side_effect=[10.0, 10.4]),
-            patch.object(mod, "_probe_external_server", return_value=True) as probe,
-        ):
-            assert mod._probe_external_server_cached(testing=True, max_age=1.0) is True
-            assert mod._probe_external_server_cached(testing=True, max_age=1.0) is True
+        mod._on_external_server_probe(False)
 
-        assert probe.call_count == 1
+        assert exited == [mod]
+        assert mod.last_exit.kind == "lost"
+        assert mod.last_exit.describe() == "external server no longer reachable"
+        assert mod.started is True
+        assert mod._external_server is False
+        assert not mod.is_alive()
 
-    def test_probe_external_server_cached_refreshes_after_ttl(self):
+    def test_external_server_probe_ignored_after_stop(self):
         mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
+        exited = []
+        mod.add_exit_listener(exited.append)
 
-        with (
-            patch("aw_qt.manager.monotonic", side_effect=[10.0, 10.4, 11.5]),
-            patch.object(mod, "_probe_external_server", side_effect=[True, False]) as probe,
-        ):
-            assert mod._probe_external_server_cached(testing=True, max_age=1.0) is True
-            assert mod._probe_external_server_cached(testing=True, max_age=1.0) is True
-            assert mod._probe_external_server_cached(testing=True, max_age=1.0) is False
+        mod._on_external_server_probe(False)
+
+        assert exited == []
+
+
+class TestProbeWorker:
+    def test_probe_runs_in_background_and_notifies_listeners(self):
+        from aw_qt.probes import ProbeWorker
+
+        worker = ProbeWorker()
+        mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
+        results = []
+        worker.add_listener(lambda m, alive: results.append((m, alive)))
+        caller = threading.get_ident()
+        probe_threads = []
 
-        assert probe.call_count == 2
+        def fake_probe(testing, timeout):
+            probe_threads.append(threading.get_ident())
+            return True
+
+        with patch.object(mod, "_probe_external_server", side_effect=fake_probe):
+            assert worker.probe(mod, testing=True).result(timeout=5) is True
+
+        assert results == [(mod, True)]
+        assert probe_threads and probe_threads[0] != caller
+
+    def test_concurrent_probes_for_same_module_are_merged(self):
+        from aw_qt.probes import ProbeWorker
+
+        worker = ProbeWorker()
+        mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
+        release = threading.Event()
+
+        def slow_probe(testing, timeout):
+            release.wait(timeout=5)
+            return True
+
+        with patch.object(mod, "_probe_external_server", side_effect=slow_probe) as probe:
+            first = worker.probe(mod, testing=True)
+            second = worker.probe(mod, testing=True)
+            release.set()
+            assert first.result(timeout=5) and second.result(timeout=5)
+
+        assert first is second
+        assert probe.call_count == 1
 
 
 class TestModuleStart:
@@ -174,24 +221,17 @@ class TestModuleIsAlive:
         module._process = mock_proc
         assert not module.is_alive()
 
-    def test_is_alive_reprobes_external_server(self):
+    def test_is_alive_external_server_never_probes(self):
         mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
         mod._external_server = True
         mod._external_server_testing = True
+        mod._external_server_probe_cache = True
         mod.started = True
 
-        with (
-            patch("aw_qt.manager.monotonic", side_effect=[10.0, 11.5]),
-            patch.object(mod, "_probe_external_server", side_effect=[True, False]) as probe,
-        ):
+        with patch.object(mod, "_probe_external_server") as probe:
             assert mod.is_alive()
-            assert mod.is_alive() is False
-            assert mod.started is True
-            assert mod._external_server is False
-            assert mod._external_server_testing is False
 
-        assert probe.call_args_list[0].args == (True,)
-        assert probe.call_args_list[1].args == (True,)
+        probe.assert_not_called()
 
     def test_stop_external_server_resets_state_without_terminating_process(self):
         mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
@@ -202,7 +242,6 @@ class TestModuleIsAlive:
         mod._process = mock_proc
         mod._last_process = None
         mod._external_server_probe_cache = True
-        mod._external_server_probe_cache_at = 10.0
 
         mod.stop()
 
@@ -212,7 +251,6 @@ class TestModuleIsAlive:
         assert mod._external_server is False
         assert mod._external_server_testing is False
         assert mod._external_server_probe_cache is None
-        assert mod._external_server_probe_cache_at == 0.0
         assert mod._last_process is None
         assert mod._process is mock_proc
 
@@ -251,6 +289,62 @@ class TestGetUnexpectedStops:
         assert len(unexpected) == 0
 
 
+@pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+class TestChildExitNotification:
+    """Tests for event-driven exit detection (no polling of Popen.poll())."""
+
+    @pytest.fixture
+    def sleeper(self, tmp_path):
+        script = tmp_path / "aw-test-sleeper"
+        script.write_text("#!/bin/sh\nexec sleep 30\n")
+        script.chmod(0o755)
+        return Module("aw-test-sleeper", script, "system")
+
+    def test_crash_notifies_listener(self):
+        mod = Module("aw-test-false", Path("/bin/false"), "system")
+        exited = threading.Event()
+        mod.add_exit_listener(lambda m: exited.set())
+
+        mod.start(testing=False)
+
+        assert exited.wait(timeout=5)
+        assert not mod.is_alive()
+        assert mod.started
+
+    def test_stop_does_not_notify_listener(self, sleeper):
+        exited = threading.Event()
+        sleeper.add_exit_listener(lambda m: exited.set())
+
+        sleeper.start(testing=False)
+        assert sleeper.is_alive()
+        sleeper.stop()
+
+        assert not exited.wait(timeout=0.5)
+        assert not sleeper.started
+
+    def test_manager_forwards_exits(self):
+        from aw_qt.manager import Manager
+
+        mod = Module("aw-test-false", Path("/bin/false"), "system")
+        with (
+            patch.object(manager_module, "_discover_modules_bundled", return_value=[mod]),
+            patch.object(manager_module, "_discover_modules_system", return_value=[]),
+        ):
+            mgr = Manager(testing=False)
+
+        exited: list = []
+        done = threading.Event()
+        mgr.add_exit_listener(lambda m: (exited.append(m), done.set()))
+
+        mod.start(testing=False)
+
+        assert done.wait(timeout=5)
+        assert exited == [mod]
+        # The manager decides on a restart before telling the listeners
+        assert mgr.restarter.is_scheduled(mod)
+        mgr.restarter.cancel_all()
+
+
 class TestMacOSSystemPathDiscovery:
     """Tests for macOS-specific path augmentation in _discover_modules_system().
 
@@ -266,7 +360,7 @@ class TestMacOSSystemPathDiscovery:
 
         searched_paths: list[str] = []
 
-        def fake_listdir(path: str) -> list[str]:
+        def fake_scan(path: str) -> list:
             searched_paths.append(path)
             return []  # no modules — we just want to see what paths were searched
 
@@ -277,7 +371,7 @@ class TestMacOSSystemPathDiscovery:
             patch.object(manager_module.platform, "system", return_value="Darwin"),
             patch("os.get_exec_path", return_value=list(minimal_path)),
             patch("os.path.isdir", return_value=True),
-            patch("os.listdir", fake_listdir),
+            patch.object(manager_module, "_scan_directory", fake_scan),
         ):
             _discover_modules_system()
 
@@ -298,7 +392,7 @@ class TestMacOSSystemPathDiscovery:
 
         searched_paths: list[str] = []
 
-        def fake_listdir(path: str) -> list[str]:
+        def fake_scan(path: str) -> list:
             searched_paths.append(path)
             return []
 
@@ -309,7 +403,7 @@ class TestMacOSSystemPathDiscovery:
             patch.object(manager_module.platform, "system", return_value="Darwin"),
             patch("os.get_exec_path", return_value=list(full_path)),
             patch("os.path.isdir", return_value=True),
-            patch("os.listdir", fake_listdir),
+            patch.object(manager_module, "_scan_directory", fake_scan),
         ):
             _discover_modules_system()
 
@@ -325,7 +419,7 @@ class TestMacOSSystemPathDiscovery:
 
         searched_paths: list[str] = []
 
-        def fake_listdir(path: str) -> list[str]:
+        def fake_scan(path: str) -> list:
             searched_paths.append(path)
             return []
 
@@ -335,10 +429,479 @@ class TestMacOSSystemPathDiscovery:
             patch.object(manager_module.platform, "system", return_value="Linux"),
             patch("os.get_exec_path", return_value=list(minimal_path)),
             patch("os.path.isdir", return_value=True),
-            patch("os.listdir", fake_listdir),
+            patch.object(manager_module, "_scan_directory", fake_scan),
         ):
             _discover_modules_system()
 
         assert "/opt/homebrew/bin" not in searched_paths, (
             "Homebrew path should NOT be added on Linux"
         )
+
+
+class TestAutostart:
+    """Tests for dependency-aware, concurrent Manager.autostart()."""
+
+    @pytest.fixture
+    def mgr(self):
+        from aw_qt.manager import Manager
+
+        with patch.object(Manager, "discover_modules"):
+            mgr = Manager(testing=True)
+        mgr.modules = [
+            Module(name, Path(f"/usr/bin/{name}"), "system")
+            for name in [
+                "aw-server",
+                "aw-server-rust",
+                "aw-watcher-afk",
+                "aw-watcher-window",
+            ]
+        ]
+        return mgr
+
+    def test_watchers_wait_for_server(self, mgr):
+        order: list = []
+        lock = threading.Lock()
+
+        def fake_start(name):
+            with lock:
+                order.append(name)
+
+        with patch.object(mgr, "start", side_effect=fake_start):
+            mgr.autostart(["aw-watcher-afk", "aw-server", "aw-watcher-window"])
+
+        assert order[0] == "aw-server"
+        assert set(order[1:]) == {"aw-watcher-afk", "aw-watcher-window"}
+        assert mgr.autostart_duration is not None
+
+    def test_independent_modules_start_concurrently(self, mgr):
+        # Both watchers have to be inside start() at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        with patch.object(mgr, "start", side_effect=lambda name: barrier.wait()):
+            mgr.autostart(["aw-watcher-afk", "aw-watcher-window"])
+
+        assert not barrier.broken
+
+    def test_explicit_dependencies(self, mgr):
+        order: list = []
+
+        with patch.object(mgr, "start", side_effect=order.append):
+            mgr.autostart(
+                ["aw-server", "aw-watcher-afk", "aw-watcher-window"],
+                {"aw-watcher-window": ["aw-server", "aw-watcher-afk"]},
+            )
+
+        assert order == ["aw-server", "aw-watcher-afk", "aw-watcher-window"]
+
+    def test_dependency_cycle_still_starts_everything(self, mgr):
+        started: list = []
+
+        with patch.object(mgr, "start", side_effect=started.append):
+            mgr.autostart(
+                ["aw-watcher-afk", "aw-watcher-window"],
+                {
+                    "aw-watcher-afk": ["aw-watcher-window"],
+                    "aw-watcher-window": ["aw-watcher-afk"],
+                },
+            )
+
+        assert sorted(started) == ["aw-watcher-afk", "aw-watcher-window"]
+
+    def test_prefers_rust_server(self, mgr):
+        started: list = []
+
+        with patch.object(mgr, "start", side_effect=started.append):
+            mgr.autostart(["aw-server", "aw-server-rust", "aw-watcher-afk"])
+
+        assert started == ["aw-server-rust", "aw-watcher-afk"]
+
+    def test_dependents_wait_for_readiness(self, mgr):
+        events: list = []
+        server = mgr.modules[0]
+
+        def fake_start(name):
+            events.append(("start", name))
+
+        def fake_wait_ready(testing):
+            events.append(("ready", server.name))
+
+        with (
+            patch.object(mgr, "start", side_effect=fake_start),
+            patch.object(server, "wait_ready", side_effect=fake_wait_ready),
+        ):
+            mgr.autostart(["aw-server", "aw-watcher-afk"])
+
+        assert events == [
+            ("start", "aw-server"),
+            ("ready", "aw-server"),
+            ("start", "aw-watcher-afk"),
+        ]
+
+    def test_leaf_readiness_waits_leave_the_probe_worker_free(self, mgr):
+        released = threading.Event()
+        waiting = threading.Barrier(3, timeout=5)
+        afk, window = mgr.modules[2], mgr.modules[3]
+
+        def slow_wait_ready(testing):
+            waiting.wait()
+            released.wait(timeout=5)
+
+        try:
+            with (
+                patch.object(mgr, "start"),
+                patch.object(afk, "wait_ready", side_effect=slow_wait_ready),
+                patch.object(window, "wait_ready", side_effect=slow_wait_ready),
+            ):
+                mgr.autostart(["aw-watcher-afk", "aw-watcher-window"])
+                waiting.wait()
+                assert mgr.probe_worker.submit(lambda: True).result(timeout=1)
+        finally:
+            released.set()
+
+
+class TestStop:
+    """Tests for bounded Module.stop() and concurrent Manager.stop_all()."""
+
+    @pytest.fixture
+    def stubborn(self, tmp_path):
+        script = tmp_path / "aw-test-stubborn"
+        # Creates the ready file once SIGTERM is ignored
+        ready = tmp_path / "ready"
+        script.write_text(
+            f"#!/bin/sh\ntrap '' TERM\ntouch {ready}\nwhile true; do sleep 0.1; done\n"
+        )
+        script.chmod(0o755)
+        return Module("aw-test-stubborn", script, "system"), ready
+
+    @pytest.fixture
+    def mgr(self):
+        from aw_qt.manager import Manager
+
+        with patch.object(Manager, "discover_modules"):
+            mgr = Manager(testing=True)
+        mgr.modules = [
+            Module(name, Path(f"/usr/bin/{name}"), "system")
+            for name in ["aw-server", "aw-watcher-afk", "aw-watcher-window"]
+        ]
+        return mgr
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="uses a shell script")
+    def test_module_ignoring_sigterm_is_killed(self, stubborn):
+        stubborn, ready = stubborn
+        stubborn.start(testing=False)
+        for _ in range(100):
+            if ready.exists():
+                break
+            sleep(0.05)
+        assert stubborn.is_alive()
+
+        stubborn.stop(timeout=0.5)
+
+        assert not stubborn.is_alive()
+        assert stubborn._last_process is not None
+        assert stubborn._last_process.returncode == -9
+        assert stubborn.shutdown_duration is not None
+        assert 0.5 <= stubborn.shutdown_duration < 5
+
+    def test_watchers_stop_before_server(self, mgr):
+        order: list = []
+        lock = threading.Lock()
+
+        def fake_stop(module):
+            def stop(timeout=None):
+                with lock:
+                    order.append(module.name)
+                module.shutdown_duration = 0.1
+
+            return stop
+
+        with ExitStack() as stack:
+            for m in mgr.modules:
+                stack.enter_context(patch.object(m, "is_alive", return_value=True))
+                stack.enter_context(patch.object(m, "stop", side_effect=fake_stop(m)))
+            durations = mgr.stop_all()
+
+        assert order[-1] == "aw-server"
+        assert set(order[:-1]) == {"aw-watcher-afk", "aw-watcher-window"}
+        assert durations == {m.name: 0.1 for m in mgr.modules}
+
+    def test_modules_are_stopped_concurrently(self, mgr):
+        # Both watchers have to be inside stop() at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        watchers = mgr.modules[1:]
+
+        with ExitStack() as stack:
+            for m in watchers:
+                stack.enter_context(patch.object(m, "is_alive", return_value=True))
+                stack.enter_context(
+                    patch.object(m, "stop", side_effect=lambda timeout: barrier.wait())
+                )
+            mgr.stop_all()
+
+        assert not barrier.broken
+
+    def test_deadline_bounds_per_module_timeout(self, mgr):
+        watcher = mgr.modules[1]
+        watcher.stop_timeout = 60
+
+        with (
+            patch.object(watcher, "is_alive", return_value=True),
+            patch.object(watcher, "stop") as stop,
+        ):
+            mgr.stop_all(timeout=2)
+
+        timeout = stop.call_args.kwargs["timeout"]
+        assert 0 < timeout <= 2
+
+
+class TestRestarter:
+    """Tests for the restart policy engine used for crashed modules."""
+
+    @pytest.fixture
+    def crashed(self, module):
+        module.started = True
+        module.restart_policy = RestartPolicy(
+            initial_delay=0.01, jitter=0, max_restarts=2, window=600
+        )
+        return module
+
+    def test_delay_grows_exponentially_up_to_max(self):
+        policy = RestartPolicy(initial_delay=1, multiplier=3, jitter=0, max_delay=20)
+        assert [policy.delay(i) for i in range(4)] == [1, 3, 9, 20]
+
+    def test_jitter(self):
+        policy = RestartPolicy(initial_delay=10, jitter=0.5)
+        delays = [policy.delay(0) for _ in range(100)]
+        assert all(5 <= d <= 15 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_restarts_after_delay_until_budget_is_used_up(self, crashed):
+        restarter = Restarter(testing=True)
+        restarted = threading.Event()
+
+        with (
+            patch.object(crashed, "stop"),
+            patch.object(crashed, "start", side_effect=lambda t: restarted.set()),
+        ):
+            assert restarter.on_exit(crashed) == pytest.approx(0.01)
+            assert restarted.wait(timeout=5)
+            restarted.clear()
+            assert restarter.on_exit(crashed) == pytest.approx(0.02)
+            assert restarted.wait(timeout=5)
+
+            assert restarter.on_exit(crashed) is None
+            assert not restarter.is_scheduled(crashed)
+            assert restarter.recent_restarts(crashed) == 2
+
+            restarter.reset(crashed)
+            assert restarter.recent_restarts(crashed) == 0
+
+    def test_no_restart_if_stopped_meanwhile(self, crashed):
+        restarter = Restarter(testing=True)
+        crashed.restart_policy.initial_delay = 0.2
+
+        with patch.object(crashed, "start") as start:
+            restarter.on_exit(crashed)
+            crashed.started = False
+            sleep(0.4)
+
+        start.assert_not_called()
+        assert not restarter.is_scheduled(crashed)
+
+    def test_cancel(self, crashed):
+        restarter = Restarter(testing=True)
+        crashed.restart_policy.initial_delay = 0.2
+
+        with patch.object(crashed, "start") as start:
+            restarter.on_exit(crashed)
+            restarter.cancel_all()
+            sleep(0.4)
+
+        start.assert_not_called()
+
+    def test_configure(self, module):
+        module.configure({"restart": {"initial_delay": 5, "max_restarts": 10}})
+        assert module.restart_policy.initial_delay == 5
+        assert module.restart_policy.max_restarts == 10
+
+        module.configure({"restart": {"delay": 5}})
+        assert module.restart_policy.initial_delay == 5  # invalid settings are ignored
+
+
+class TestExitClassification:
+    def test_classify_exit(self):
+        assert classify_exit(0, 100, early_exit=5).kind == "clean"
+        assert classify_exit(0, 0.1, early_exit=5).kind == "clean"
+        assert classify_exit(1, 0.2, early_exit=5).kind == "early"
+        assert classify_exit(1, 100, early_exit=5).kind == "error"
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="no signals")
+    def test_classify_signals(self):
+        killed = classify_exit(-9, 100, early_exit=5)
+        assert killed.kind == "killed"
+        assert killed.describe() == (
+            "killed by SIGKILL (possibly out of memory) after 100.0s"
+        )
+        assert classify_exit(-11, 100, early_exit=5).kind == "signal"
+
+
+class TestQuarantine:
+    """Tests for how the Manager handles unexpected exits."""
+
+    @pytest.fixture
+    def mgr(self, tmp_path):
+        from aw_qt.manager import Manager
+        from aw_qt.quarantine import QuarantineStore
+
+        with patch.object(Manager, "discover_modules"):
+            mgr = Manager(
+                testing=True,
+                quarantine=QuarantineStore(str(tmp_path / "quarantine.json")),
+            )
+        mgr.modules = [Module("aw-watcher-afk", Path("/usr/bin/true"), "system")]
+        yield mgr
+        mgr.restarter.cancel_all()
+
+    def crash(self, mgr, returncode, runtime):
+        module = mgr.modules[0]
+        module.started = True
+        module.last_exit = classify_exit(returncode, runtime, early_exit=5)
+        mgr._on_module_exit(module)
+        return module
+
+    def test_clean_exit_is_not_restarted(self, mgr):
+        module = self.crash(mgr, 0, 100)
+        assert not mgr.restarter.is_scheduled(module)
+        assert mgr.quarantine_reason(module) is None
+
+    def test_crash_is_restarted(self, mgr):
+        module = self.crash(mgr, 1, 100)
+        assert mgr.restarter.is_scheduled(module)
+
+    def test_repeated_early_exits_are_quarantined(self, mgr):
+        transitions: list = []
+        mgr.add_state_listener(lambda m, t: transitions.append(t.state))
+
+        for _ in range(2):
+            module = self.crash(mgr, 1, 0.2)
+            mgr.restarter.cancel_all()
+        assert mgr.quarantine_reason(module) is None
+
+        self.crash(mgr, 1, 0.2)
+        reason = mgr.quarantine_reason(module)
+        assert reason is not None and "right after launch 3 times" in reason
+        assert not mgr.restarter.is_scheduled(module)
+        assert transitions == [State.BACKOFF, State.QUARANTINED]
+        assert module.state is State.QUARANTINED
+
+    def test_exhausted_restart_budget_is_quarantined(self, mgr):
+        module = mgr.modules[0]
+        module.restart_policy = RestartPolicy(max_restarts=1)
+
+        self.crash(mgr, 1, 100)
+        mgr.restarter.cancel_all()
+        self.crash(mgr, 1, 100)
+
+        reason = mgr.quarantine_reason(module)
+        assert reason is not None and "crashed 2 times" in reason
+
+    def test_failed_restarts_are_quarantined(self, mgr, tmp_path):
+        module = mgr.modules[0]
+        module.path = tmp_path / "aw-watcher-afk"  # removed since it was started
+        module.restart_policy = RestartPolicy(initial_delay=0.01, jitter=0)
+        quarantined = threading.Event()
+        mgr.add_state_listener(
+            lambda m, t: quarantined.set() if t.state is State.QUARANTINED else None
+        )
+
+        self.crash(mgr, 1, 100)
+
+        assert quarantined.wait(timeout=5)
+        reason = mgr.quarantine_reason(module)
+        assert reason is not None and "failed to start" in reason
+
+    def test_exit_while_a_restart_is_scheduled_is_not_quarantined(self, mgr):
+        module = self.crash(mgr, 1, 100)
+        assert mgr.restarter.is_scheduled(module)
+
+        # e.g. a lost external server reported on top of its exit
+        self.crash(mgr, 1, 100)
+
+        assert mgr.quarantine_reason(module) is None
+        assert mgr.restarter.is_scheduled(module)
+
+    def test_lost_external_server_is_not_an_early_exit(self, mgr):
+        server = Module("aw-server", Path("/usr/bin/aw-server"), "system")
+        mgr.modules = [server]
+        server.started = True
+        server._external_server = True
+        server.last_exit = classify_exit(1, 0.2, early_exit=5)
+        mgr.quarantine.record_early_exit("aw-server")
+
+        server._on_external_server_probe(False)
+
+        assert mgr.quarantine.early_exits("aw-server") == 1
+        assert mgr.restarter.is_scheduled(server)
+
+    def test_quarantined_modules_are_not_autostarted(self, mgr):
+        mgr.quarantine.quarantine("aw-watcher-afk", "crashed")
+        started: list = []
+
+        with patch.object(mgr, "start", side_effect=started.append):
+            mgr.autostart(["aw-watcher-afk"])
+
+        assert started == []
+
+    def test_manual_start_releases_quarantine(self, mgr):
+        module = mgr.modules[0]
+        mgr.quarantine.quarantine("aw-watcher-afk", "crashed")
+
+        with patch.object(module, "start"):
+            mgr.start("aw-watcher-afk", by_hand=True)
+
+        assert mgr.quarantine_reason(module) is None
+
+    def test_autostart_keeps_early_exits(self, mgr):
+        mgr.quarantine.record_early_exit("aw-watcher-afk")
+        mgr.quarantine.record_early_exit("aw-watcher-afk")
+
+        with patch.object(Module, "start"), patch.object(Module, "wait_ready"):
+            mgr.autostart(["aw-watcher-afk"])
+
+        assert mgr.quarantine.early_exits("aw-watcher-afk") == 2
+
+    def test_launch_that_lasts_resets_early_exits(self, mgr):
+        module = mgr.modules[0]
+        module.restart_policy = RestartPolicy(early_exit=0.05)
+        mgr.quarantine.record_early_exit("aw-watcher-afk")
+        mgr.quarantine.record_early_exit("aw-watcher-afk")
+
+        module.lifecycle.set(State.STARTING)
+        module.lifecycle.set(State.RUNNING)
+        for _ in range(100):
+            if not mgr.quarantine.early_exits("aw-watcher-afk"):
+                break
+            sleep(0.01)
+
+        assert mgr.quarantine.early_exits("aw-watcher-afk") == 0
+
+    def test_early_exits_are_not_reset_by_a_short_launch(self, mgr):
+        module = mgr.modules[0]
+        module.restart_policy = RestartPolicy(early_exit=0.05)
+        mgr.quarantine.record_early_exit("aw-watcher-afk")
+
+        module.lifecycle.set(State.STARTING)
+        module.lifecycle.set(State.RUNNING)
+        module.lifecycle.set(State.CRASHED)
+        sleep(0.2)
+
+        assert mgr.quarantine.early_exits("aw-watcher-afk") == 1
+
+    def test_stop_resets_early_exits(self, mgr):
+        module = mgr.modules[0]
+        mgr.quarantine.record_early_exit("aw-watcher-afk")
+
+        for state in [State.STARTING, State.RUNNING, State.STOPPING, State.STOPPED]:
+            module.lifecycle.set(state)
+
+        assert mgr.quarantine.early_exits("aw-watcher-afk") == 0
@@ -0,0 +1,87 @@
+"""Unit tests for the supervisor metrics and their OpenMetrics endpoint."""
+
+import urllib.request
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aw_qt.lifecycle import State
+from aw_qt.manager import Manager, Module
+from aw_qt.metrics import CONTENT_TYPE, MetricsServer, Registry
+
+
+@pytest.fixture
+def mgr():
+    with patch.object(Manager, "discover_modules"):
+        mgr = Manager(testing=True)
+    mgr.modules = [
+        Module("aw-server", Path("/usr/bin/aw-server"), "bundled"),
+        Module('aw-watcher-"odd"', Path("/usr/bin/aw-watcher"), "system"),
+    ]
+    return mgr
+
+
+class TestRegistry:
+    def test_counters(self):
+        registry = Registry()
+        registry.inc("aw_qt_module_starts", "aw-server")
+        registry.inc("aw_qt_module_starts", "aw-server")
+        registry.inc("aw_qt_module_crashes", "aw-server")
+
+        lines = registry.render().splitlines()
+
+        assert "# TYPE aw_qt_module_starts counter" in lines
+        assert 'aw_qt_module_starts_total{module="aw-server"} 2' in lines
+        assert 'aw_qt_module_crashes_total{module="aw-server"} 1' in lines
+        assert lines[-1] == "# EOF"
+
+    def test_histograms_are_cumulative(self):
+        registry = Registry()
+        for value in [0.05, 0.3, 0.3, 100]:
+            registry.observe("aw_qt_module_time_to_ready_seconds", "aw-server", value)
+
+        lines = registry.render().splitlines()
+
+        name = "aw_qt_module_time_to_ready_seconds"
+        assert f'{name}_bucket{{module="aw-server",le="0.1"}} 1' in lines
+        assert f'{name}_bucket{{module="aw-server",le="0.25"}} 1' in lines
+        assert f'{name}_bucket{{module="aw-server",le="0.5"}} 3' in lines
+        assert f'{name}_bucket{{module="aw-server",le="+Inf"}} 4' in lines
+        assert f'{name}_count{{module="aw-server"}} 4' in lines
+        assert f'{name}_sum{{module="aw-server"}} 100.65' in lines
+
+    def test_gauges_from_manager(self, mgr):
+        lines = Registry().render(mgr).splitlines()
+
+        assert 'aw_qt_module_up{module="aw-server",type="bundled"} 0' in lines
+        # Label values are escaped
+        assert 'aw_qt_module_up{module="aw-watcher-\\"odd\\"",type="system"} 0' in lines
+
+    def test_module_states(self, mgr):
+        mgr.modules[0].lifecycle.set(State.STARTING)
+        mgr.modules[0].lifecycle.set(State.RUNNING)
+
+        lines = Registry().render(mgr).splitlines()
+
+        assert "# TYPE aw_qt_module_state stateset" in lines
+        labels = 'module="aw-server",type="bundled",aw_qt_module_state'
+        assert f'aw_qt_module_state{{{labels}="running"}} 1' in lines
+        assert f'aw_qt_module_state{{{labels}="stopped"}} 0' in lines
+        assert 'aw_qt_module_up{module="aw-server",type="bundled"} 1' in lines
+
+
+class TestMetricsServer:
+    def test_serves_metrics(self, mgr):
+        server = MetricsServer(mgr, port=0)
+        server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                assert response.headers["Content-Type"] == CONTENT_TYPE
+                body = response.read().decode()
+        finally:
+            server.stop()
+
+        assert "# TYPE aw_qt_module_up gauge" in body
+        assert body.endswith("# EOF\n")
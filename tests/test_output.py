@@ -0,0 +1,95 @@
+"""Unit tests for the capture of module output."""
+
+import sys
+import threading
+
+import pytest
+
+from aw_qt.manager import Module
+from aw_qt.output import OutputBuffer, OutputConfig
+
+unix_only = pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+
+
+class TestOutputBuffer:
+    def test_keeps_only_the_latest_output(self):
+        buffer = OutputBuffer(max_bytes=100)
+        for i in range(100):
+            buffer.write(f"line {i}\n".encode())
+
+        assert buffer.total == sum(len(f"line {i}\n") for i in range(100))
+        lines = buffer.tail(max_lines=1000).splitlines()
+        # The partial first line is dropped
+        assert lines[0].startswith("line 8") and lines[-1] == "line 99"
+        assert buffer.tail(max_lines=2) == "line 98\nline 99"
+
+    def test_invalid_utf8_is_replaced(self):
+        buffer = OutputBuffer()
+        buffer.write(b"bad \xff byte\n")
+        assert buffer.tail() == "bad � byte"
+
+    def test_file_is_rotated(self, tmp_path):
+        config = OutputConfig(file=True, max_file_size=100, backups=2)
+        buffer = config.create_buffer("aw-test", testing=True, log_dir=str(tmp_path))
+        for i in range(60):
+            buffer.write(f"line {i}\n".encode())
+        buffer.close()
+
+        path = tmp_path / "aw-test-output-testing.log"
+        assert path.read_text().endswith("line 59\n")
+        assert len(path.read_bytes()) <= 100
+        assert (tmp_path / "aw-test-output-testing.log.1").exists()
+        assert (tmp_path / "aw-test-output-testing.log.2").exists()
+        assert not (tmp_path / "aw-test-output-testing.log.3").exists()
+
+
+class TestOutputConfig:
+    def test_parses_settings(self):
+        config = OutputConfig.from_settings(
+            {"buffer": "16K", "file": True, "max_file_size": "2M", "backups": 5}
+        )
+        assert config.buffer == 16 * 1024
+        assert config.file
+        assert config.max_file_size == 2 * 1024**2
+        assert config.backups == 5
+
+    def test_invalid_settings_are_ignored_by_module(self):
+        module = Module("aw-test", "/bin/true", "system")
+        module.configure({"output": {"size": "1M"}})
+        assert module.output_config.buffer == OutputConfig().buffer
+
+
+@unix_only
+class TestCapture:
+    def script(self, tmp_path, body):
+        script = tmp_path / "aw-test-output"
+        script.write_text("#!/bin/sh\n" + body)
+        script.chmod(0o755)
+        return Module("aw-test-output", script, "system")
+
+    def test_crash_output_is_available_to_exit_listeners(self, tmp_path):
+        module = self.script(tmp_path, "echo starting\necho 'it broke' >&2\nexit 3\n")
+        outputs: list = []
+        done = threading.Event()
+        module.add_exit_listener(lambda m: (outputs.append(m.read_output()), done.set()))
+
+        module.start(testing=False)
+
+        assert done.wait(timeout=5)
+        assert outputs == ["starting\nit broke"]
+
+    def test_lots_of_output_does_not_block_the_module(self, tmp_path):
+        # Far more than fits in a pipe, which would block the module if not drained
+        module = self.script(
+            tmp_path, "head -c 4000000 /dev/zero | tr '\\0' x\necho\necho done\n"
+        )
+        done = threading.Event()
+        module.add_exit_listener(lambda m: done.set())
+
+        module.start(testing=False)
+
+        assert done.wait(timeout=10)
+        assert module.output is not None
+        assert module.output.total == 4_000_000 + len("\ndone\n")
+        assert len(module.output._data) == module.output.max_bytes
+        assert module.read_output(max_lines=1) == "done"
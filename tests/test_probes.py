@@ -0,0 +1,271 @@
+"""Unit tests for readiness and server probes."""
+
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aw_qt.manager import Module
+from aw_qt.probes import (
+    FileProbe,
+    HttpProbe,
+    LogLineProbe,
+    ReadinessProbe,
+    ServerProbeClient,
+    TcpProbe,
+    make_readiness_probe,
+    wait_until_ready,
+)
+
+
+class CountingProbe(ReadinessProbe):
+    def __init__(self, ready_after: int) -> None:
+        self.ready_after = ready_after
+        self.checks = 0
+
+    def check(self) -> bool:
+        self.checks += 1
+        return self.checks >= self.ready_after
+
+
+class TestWaitUntilReady:
+    def test_backs_off_exponentially(self):
+        probe = CountingProbe(ready_after=4)
+        sleeps: list = []
+
+        with patch("aw_qt.probes.sleep", side_effect=sleeps.append):
+            assert wait_until_ready(probe, timeout=60, initial_delay=0.1, max_delay=0.3)
+
+        assert sleeps == [0.1, 0.2, 0.3]
+
+    def test_gives_up_at_deadline(self):
+        probe = CountingProbe(ready_after=1000)
+
+        with (
+            patch("aw_qt.probes.monotonic", side_effect=[0.0, 0.5, 1.5]),
+            patch("aw_qt.probes.sleep"),
+        ):
+            assert not wait_until_ready(probe, timeout=1.0)
+
+        assert probe.checks == 2
+
+    def test_abort(self):
+        probe = CountingProbe(ready_after=1000)
+
+        assert not wait_until_ready(probe, timeout=60, abort=lambda: True)
+        assert probe.checks == 1
+
+
+class TestProbes:
+    def test_tcp_probe(self):
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+        probe = TcpProbe(port, host="127.0.0.1")
+
+        assert not probe.check()
+        server.listen()
+        try:
+            assert probe.check()
+        finally:
+            server.close()
+
+    def test_file_probe(self, tmp_path):
+        probe = FileProbe(str(tmp_path / "ready"))
+
+        assert not probe.check()
+        (tmp_path / "ready").touch()
+        assert probe.check()
+
+    def test_log_line_probe_ignores_existing_lines(self, tmp_path):
+        log = tmp_path / "aw-watcher-test_2024.log"
+        log.write_text("Started\n")
+        probe = LogLineProbe(str(tmp_path / "*.log"), r"Start(ed|ing)")
+        probe.reset()
+
+        assert not probe.check()
+        with open(log, "a") as f:
+            f.write("Connecting...\nStart")
+        # Incomplete lines aren't matched until they're finished
+        assert not probe.check()
+        with open(log, "a") as f:
+            f.write("ed\n")
+        assert probe.check()
+
+    def test_make_readiness_probe(self):
+        tcp = make_readiness_probe({"type": "tcp", "port": 1234}, "aw-x")
+        http = make_readiness_probe({"type": "http", "url": "http://x"}, "aw-x")
+        file = make_readiness_probe({"type": "file", "path": "/x"}, "aw-x")
+
+        assert isinstance(tcp, TcpProbe)
+        assert isinstance(http, HttpProbe)
+        assert isinstance(file, FileProbe)
+        with pytest.raises(ValueError):
+            make_readiness_probe({"type": "carrier-pigeon"}, "aw-x")
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves /api/0/info like aw-server, counting connections and requests"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0) -> None:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                server.connections += 1
+                server.sockets.append(self.connection)
+
+            def do_GET(self) -> None:
+                server.requests += 1
+                server.release.wait(5)
+                body = b'{"hostname": "test"}'
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.connections = 0
+        self.sockets: list = []
+        self.requests = 0
+        self.release = threading.Event()
+        self.release.set()
+        super().__init__(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def stop(self) -> None:
+        """Stop, closing open connections too, like a server process exiting would"""
+        self.shutdown()
+        self.server_close()
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class TestServerProbeClient:
+    @pytest.fixture
+    def server(self):
+        server = StandInServer()
+        yield server
+        server.stop()
+
+    @pytest.fixture
+    def client(self):
+        client = ServerProbeClient(host="127.0.0.1")
+        yield client
+        client.close()
+
+    def test_keeps_the_connection_alive(self, server, client):
+        for _ in range(5):
+            assert client.probe(server.port, timeout=1.0)
+        assert server.requests == 5
+        assert server.connections == 1
+
+    def test_concurrent_probes_are_merged(self, server, client):
+        server.release.clear()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(client.probe(server.port, 5)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        while server.requests == 0:
+            threading.Event().wait(0.01)
+        server.release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert results == [True] * 4
+        assert server.requests == 1
+
+    def test_retries_when_the_idle_connection_was_closed(self, server, client):
+        assert client.probe(server.port, timeout=1.0)
+        server.sockets[0].shutdown(socket.SHUT_RDWR)
+
+        assert client.probe(server.port, timeout=1.0)
+        assert server.connections == 2
+
+    def test_reconnects_after_server_restart(self, client):
+        server = StandInServer()
+        port = server.port
+        assert client.probe(port, timeout=1.0)
+        server.stop()
+
+        assert not client.probe(port, timeout=1.0)
+
+        server = StandInServer(port)
+        try:
+            assert client.probe(port, timeout=1.0)
+            assert client.probe(port, timeout=1.0)
+            assert server.connections == 1
+        finally:
+            server.stop()
+
+    def test_no_server(self, client):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        assert not client.probe(port, timeout=1.0)
+
+
+class TestModuleReadiness:
+    def test_server_defaults_to_http_probe(self):
+        mod = Module("aw-server", Path("/usr/bin/aw-server"), "system")
+
+        with patch.object(mod, "_get_server_port", return_value=5666):
+            probe = mod._get_readiness_probe(testing=True)
+
+        assert isinstance(probe, HttpProbe)
+        assert probe.url == "http://localhost:5666/api/0/info"
+
+    def test_configure_readiness(self):
+        mod = Module("aw-watcher-test", Path("/usr/bin/aw-watcher-test"), "system")
+        mod.configure({"readiness": {"type": "tcp", "port": 1234}, "ready_timeout": 5})
+
+        assert isinstance(mod.readiness, TcpProbe)
+        assert mod.ready_timeout == 5.0
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+    def test_wait_ready_records_time_to_ready(self, tmp_path):
+        script = tmp_path / "aw-test-ready"
+        script.write_text(f"#!/bin/sh\nsleep 0.2\ntouch {tmp_path}/ready\nexec sleep 30\n")
+        script.chmod(0o755)
+        mod = Module("aw-test-ready", script, "system")
+        mod.configure({"readiness": {"type": "file", "path": str(tmp_path / "ready")}})
+
+        mod.start(testing=False)
+        try:
+            assert mod.wait_ready(testing=False)
+        finally:
+            mod.stop()
+
+        assert mod.time_to_ready is not None and mod.time_to_ready >= 0.2
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="uses Unix executables")
+    def test_wait_ready_returns_early_on_exit(self):
+        mod = Module("aw-test-false", Path("/bin/false"), "system")
+        mod.configure({"readiness": {"type": "tcp", "port": 1}, "ready_timeout": 30})
+
+        mod.start(testing=False)
+
+        assert not mod.wait_ready(testing=False)
+        assert mod.time_to_ready is None
@@ -0,0 +1,110 @@
+"""Unit tests for sampling the resource usage of modules."""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import aw_qt.procstats as procstats_module
+from aw_qt.manager import Module
+from aw_qt.procstats import (
+    ProcessStats,
+    ProcSample,
+    RingBuffer,
+    Sampler,
+    format_uptime,
+    read_proc_sample,
+)
+
+
+class TestRingBuffer:
+    def test_keeps_the_latest_values(self):
+        buf = RingBuffer(3)
+        assert buf.latest() is None
+        for value in range(5):
+            buf.append(value)
+
+        assert len(buf) == 3
+        assert buf.values() == [2.0, 3.0, 4.0]
+        assert buf.latest() == 4.0
+
+    def test_partially_filled(self):
+        buf = RingBuffer(3)
+        buf.append(1)
+        assert buf.values() == [1.0]
+
+
+class TestReadProcSample:
+    def test_parses_command_names_with_spaces_and_parens(self, tmp_path):
+        pid_dir = tmp_path / "42"
+        pid_dir.mkdir()
+        # Fields after the command name: state, ppid, ..., utime (14), stime (15)
+        rest = ["S"] + ["0"] * 10 + ["150", "50"] + ["0"] * 30
+        (pid_dir / "stat").write_text(f"42 (aw-watcher (x) y) {' '.join(rest)}\n")
+        (pid_dir / "statm").write_text("1000 250 100 1 0 200 0\n")
+        (pid_dir / "io").write_text("rchar: 1\nread_bytes: 4096\nwrite_bytes: 8192\n")
+
+        sample = read_proc_sample(42, proc=str(tmp_path))
+
+        assert sample == ProcSample(200, 250 * procstats_module._PAGE_SIZE, 4096, 8192)
+
+    def test_missing_process(self, tmp_path):
+        assert read_proc_sample(42, proc=str(tmp_path)) is None
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="reads /proc")
+    def test_own_process(self):
+        sample = read_proc_sample(os.getpid())
+        assert sample is not None
+        assert sample.rss > 0
+
+
+class TestProcessStats:
+    def test_cpu_and_io_rates(self):
+        ticks = procstats_module._CLOCK_TICKS
+        stats = ProcessStats(pid=1)
+
+        stats.add(ProcSample(0, 1000, 0, 0), now=10.0)
+        assert stats.cpu.latest() is None
+        stats.add(ProcSample(ticks, 3000, 2048, 2048), now=12.0)
+        stats.add(ProcSample(ticks, 2000, 2048, 2048), now=14.0)
+
+        assert stats.cpu.values() == [50.0, 0.0]
+        assert stats.peak_cpu == 50.0
+        assert stats.io.values() == [2048.0, 0.0]
+        assert stats.rss.latest() == 2000
+        assert stats.peak_rss == 3000
+        assert "peak 50%" in stats.summary()
+
+    def test_format_uptime(self):
+        assert format_uptime(42) == "42s"
+        assert format_uptime(3 * 3600 + 120) == "3h 2m"
+        assert format_uptime(2 * 86400 + 3600) == "2d 1h"
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="reads /proc")
+class TestSampler:
+    @pytest.fixture
+    def sleeper(self, tmp_path):
+        script = tmp_path / "aw-test-sleeper"
+        script.write_text("#!/bin/sh\nexec sleep 30\n")
+        script.chmod(0o755)
+        module = Module("aw-test-sleeper", script, "system")
+        yield module
+        module.stop()
+
+    def test_samples_running_modules(self, sleeper):
+        stopped = Module("aw-test-stopped", Path("/bin/true"), "system")
+        sampler = Sampler(lambda: [sleeper, stopped])
+        sleeper.start(testing=False)
+
+        sampler.sample()
+        sampler.sample()
+
+        assert sleeper.stats is not None
+        assert sleeper.stats.pid == sleeper._process.pid
+        assert len(sleeper.stats.rss) == 2
+        assert stopped.stats is None
+        assert "up " in sleeper.usage_summary()
+        assert "peak" in sleeper.usage_summary()
+        assert stopped.usage_summary() == ""
@@ -0,0 +1,43 @@
+"""Unit tests for the persisted crash-loop quarantine."""
+
+from aw_qt.quarantine import QuarantineStore
+
+
+def test_quarantine_survives_reload(tmp_path):
+    path = str(tmp_path / "quarantine.json")
+    store = QuarantineStore(path)
+    store.quarantine("aw-watcher-afk", "crashed 4 times within 10 minutes")
+
+    reloaded = QuarantineStore(path)
+    assert reloaded.reason("aw-watcher-afk") == "crashed 4 times within 10 minutes"
+    assert reloaded.reason("aw-watcher-window") is None
+
+
+def test_early_exits_are_counted_across_reloads(tmp_path):
+    path = str(tmp_path / "quarantine.json")
+    assert QuarantineStore(path).record_early_exit("aw-watcher-afk") == 1
+    assert QuarantineStore(path).record_early_exit("aw-watcher-afk") == 2
+
+    store = QuarantineStore(path)
+    store.reset_early_exits("aw-watcher-afk")
+    assert QuarantineStore(path).early_exits("aw-watcher-afk") == 0
+
+
+def test_release(tmp_path):
+    path = str(tmp_path / "quarantine.json")
+    store = QuarantineStore(path)
+    store.record_early_exit("aw-watcher-afk")
+    store.quarantine("aw-watcher-afk", "exited right after launch")
+
+    store.release("aw-watcher-afk")
+
+    reloaded = QuarantineStore(path)
+    assert reloaded.reason("aw-watcher-afk") is None
+    assert reloaded.early_exits("aw-watcher-afk") == 0
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    path = tmp_path / "quarantine.json"
+    path.write_text("{not json")
+
+    assert QuarantineStore(str(path)).reason("aw-watcher-afk") is None
@@ -0,0 +1,60 @@
+"""Unit tests for the shared selector thread."""
+
+import os
+import sys
+import threading
+
+import pytest
+
+from aw_qt.selectorthread import SelectorThread
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="can't select on pipes on Windows"
+)
+
+
+class TestSelectorThread:
+    def test_calls_handlers_on_one_thread(self):
+        selector_thread = SelectorThread("aw-qt-test-selector")
+        threads = []
+        done = threading.Event()
+
+        def handler(fd):
+            threads.append(threading.current_thread())
+            selector_thread.unregister(fd)
+            os.close(fd)
+            if len(threads) == 2:
+                done.set()
+
+        pipes = [os.pipe() for _ in range(2)]
+        for r, w in pipes:
+            selector_thread.register(r, handler)
+        for r, w in pipes:
+            os.write(w, b"x")
+            os.close(w)
+        assert done.wait(timeout=5)
+
+        assert threads[0] is threads[1]
+        assert threads[0].name == "aw-qt-test-selector"
+
+    def test_survives_failing_handlers(self):
+        selector_thread = SelectorThread("aw-qt-test-selector")
+        handled = threading.Event()
+
+        def failing(fd):
+            selector_thread.unregister(fd)
+            os.close(fd)
+            raise RuntimeError("oops")
+
+        def handler(fd):
+            selector_thread.unregister(fd)
+            os.close(fd)
+            handled.set()
+
+        for h in (failing, handler):
+            r, w = os.pipe()
+            selector_thread.register(r, h)
+            os.write(w, b"x")
+            os.close(w)
+
+        assert handled.wait(timeout=5)
@@ -0,0 +1,178 @@
+"""Unit tests for detecting modules that have stopped reporting."""
+
+import json
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from aw_qt import metrics
+from aw_qt.lifecycle import State
+from aw_qt.manager import Manager, Module
+from aw_qt.stall import StallDetector, StallPolicy, last_updated
+
+HOSTNAME = "laptop"
+
+
+def bucket(client, last_updated, hostname=HOSTNAME):
+    return {"client": client, "hostname": hostname, "last_updated": last_updated}
+
+
+def iso(timestamp):
+    millis = int(timestamp % 1 * 1000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp)) + f".{millis:03}Z"
+
+
+class TestStallPolicy:
+    def test_defaults_to_heartbeating_watchers(self):
+        assert StallPolicy.default("aw-watcher-afk").threshold == 600
+        assert StallPolicy.default("aw-watcher-input") is None
+
+    def test_parses_settings(self):
+        policy = StallPolicy.from_settings({"restart": True}, "aw-watcher-window")
+        assert policy.threshold == 600 and policy.restart
+        assert StallPolicy.from_settings(False, "aw-watcher-afk") is None
+        with pytest.raises(ValueError):
+            StallPolicy.from_settings(True, "aw-watcher-input")
+        with pytest.raises(ValueError):
+            StallPolicy.from_settings({"timeout": 60}, "aw-watcher-afk")
+
+    def test_invalid_settings_are_ignored_by_module(self):
+        module = Module("aw-watcher-afk", Path("/bin/true"), "system")
+        module.configure({"stall": {"threshold": -1}})
+        assert module.stall_policy.threshold == 600
+
+
+class TestLastUpdated:
+    def test_latest_of_the_clients_buckets_on_this_host(self):
+        buckets = {
+            "a": bucket("aw-watcher-afk", "2024-05-01T10:00:00.123456+00:00"),
+            "b": bucket("aw-watcher-afk", "2024-05-01T11:00:00Z"),
+            "c": bucket("aw-watcher-afk", "2024-05-01T12:00:00Z", hostname="desktop"),
+            "d": bucket("aw-watcher-window", "2024-05-01T13:00:00Z"),
+        }
+        assert last_updated(buckets, "aw-watcher-afk", HOSTNAME) == 1714561200
+
+    def test_other_hosts_if_there_are_no_local_buckets(self):
+        buckets = {"c": bucket("aw-watcher-afk", "2024-05-01T12:00:00.5Z", "desktop")}
+        assert last_updated(buckets, "aw-watcher-afk", HOSTNAME) == 1714564800.5
+
+    def test_no_buckets(self):
+        buckets = {"a": bucket("aw-watcher-afk", None)}
+        assert last_updated(buckets, "aw-watcher-afk", HOSTNAME) is None
+        assert last_updated({}, "aw-watcher-afk", HOSTNAME) is None
+
+
+class TestStallDetector:
+    @pytest.fixture
+    def manager(self):
+        with patch.object(Manager, "discover_modules"):
+            manager = Manager(testing=True)
+        server = Module("aw-server", Path("/usr/bin/aw-server"), "bundled")
+        server.lifecycle.set(State.STARTING)
+        server.lifecycle.set(State.EXTERNAL)
+        watcher = Module("aw-watcher-afk", Path("/usr/bin/aw-watcher-afk"), "bundled")
+        watcher.stall_policy = StallPolicy(threshold=60)
+        watcher.lifecycle.set(State.STARTING)
+        watcher.lifecycle.set(State.RUNNING)
+        watcher.lifecycle.set(State.READY)
+        manager.modules = [server, watcher]
+
+        def get_server_port(module, testing):
+            return 5666 if module is server else None
+
+        with (
+            patch.object(Module, "_get_server_port", get_server_port),
+            patch.object(Module, "uptime", return_value=3600),
+        ):
+            yield manager
+
+    def detector(self, manager, updated_at):
+        client = MagicMock()
+        client.get.return_value = json.dumps(
+            {"aw-watcher-afk_laptop": bucket("aw-watcher-afk", iso(updated_at))}
+        ).encode()
+        detector = StallDetector(manager, client)
+        detector.hostname = HOSTNAME
+        return detector
+
+    def test_fresh_module_is_left_alone(self, manager):
+        detector = self.detector(manager, time.time() - 30)
+        detector.check()
+
+        detector.client.get.assert_called_once_with(5666, "/api/0/buckets/", 5.0)
+        assert manager.modules[1].state is State.READY
+
+    def test_stale_module_is_degraded_until_it_reports_again(self, manager):
+        watcher = manager.modules[1]
+        detector = self.detector(manager, time.time() - 600)
+        before = metrics.registry._counters["aw_qt_module_stalls"].get(watcher.name, 0)
+
+        detector.check()
+
+        assert watcher.state is State.DEGRADED
+        reason = watcher.lifecycle.history[-1].reason
+        assert reason == "no updates to its buckets for 10m 0s"
+        assert metrics.registry._counters["aw_qt_module_stalls"][watcher.name] == before + 1
+
+        detector.client.get.return_value = json.dumps(
+            {"aw-watcher-afk_laptop": bucket("aw-watcher-afk", iso(time.time()))}
+        ).encode()
+        detector.check()
+        assert watcher.state is State.READY
+
+    def test_stale_module_is_restarted_if_configured(self, manager):
+        watcher = manager.modules[1]
+        watcher.stall_policy = StallPolicy(threshold=60, restart=True)
+        detector = self.detector(manager, time.time() - 600)
+
+        with (
+            patch.object(watcher, "stop") as stop,
+            patch.object(watcher, "start") as start,
+        ):
+            detector.check()
+
+        stop.assert_called_once_with()
+        start.assert_called_once_with(True)
+
+    def test_recently_started_module_is_left_alone(self, manager):
+        detector = self.detector(manager, time.time() - 600)
+        with patch.object(Module, "uptime", return_value=30):
+            detector.check()
+        assert manager.modules[1].state is State.READY
+
+    def test_not_checked_right_after_a_suspend(self, manager):
+        detector = self.detector(manager, time.time() - 600)
+        detector._checked_at = time.time() - 3600
+        detector._checked_at_monotonic = time.monotonic() - 60
+
+        detector.check()
+
+        assert not detector.client.get.called
+        assert manager.modules[1].state is State.READY
+
+    def test_no_request_without_a_server(self, manager):
+        manager.modules[0].lifecycle.set(State.STOPPED)
+        detector = self.detector(manager, time.time() - 600)
+        detector.check()
+        assert not detector.client.get.called
+
+    def test_checks_in_the_background(self, manager):
+        detector = self.detector(manager, time.time())
+        detector.interval = 0.01
+        threads = []
+        checked = threading.Event()
+
+        def check():
+            threads.append(threading.current_thread())
+            checked.set()
+
+        with patch.object(detector, "check", side_effect=check):
+            detector.start()
+            try:
+                assert checked.wait(timeout=5)
+            finally:
+                detector.stop()
+        assert threads[0] is not threading.main_thread()
@@ -0,0 +1,120 @@
+"""Import-time and memory budgets for the headless startup path.
+
+The headless modes (--no-gui, --interactive) must never import PyQt6, and importing
+aw_qt.main should stay cheap. The budgets are deliberately generous to avoid flakiness
+on slow CI machines, they're meant to catch regressions like an eager Qt import.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time of aw_qt.main, as reported by -X importtime
+IMPORT_TIME_BUDGET_MS = 200
+# Resident memory of `aw-qt --no-gui` once started (was ~37 MB with Qt loaded)
+HEADLESS_RSS_BUDGET_KB = 30 * 1024
+
+
+def _isolated_env(tmp_path) -> dict:
+    """Environment with all ActivityWatch dirs pointing into tmp_path"""
+    return dict(
+        os.environ,
+        HOME=str(tmp_path),
+        XDG_DATA_HOME=str(tmp_path / "data"),
+        XDG_CONFIG_HOME=str(tmp_path / "config"),
+        XDG_CACHE_HOME=str(tmp_path / "cache"),
+        PYTHONPATH=os.pathsep.join(sys.path),
+    )
+
+
+def _import_time_ms() -> float:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import aw_qt.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [f.strip() for f in line.split("|")]
+        if len(fields) == 3 and fields[2] == "aw_qt.main":
+            return int(fields[1]) / 1000
+    raise AssertionError("aw_qt.main not found in -X importtime output")
+
+
+def test_import_does_not_load_qt():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, aw_qt.main; print(sorted(m for m in sys.modules if 'Qt' in m))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_does_not_load_optional_subsystems():
+    # Only needed once turned on in the config, or for modules with limits
+    optional = ["aw_qt.forkserver", "aw_qt.limits", "http.server"]
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, aw_qt.main; print([m for m in {optional} if m in sys.modules])",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_time_budget():
+    # Best of a few runs, to keep noise from a busy machine out
+    import_time = min(_import_time_ms() for _ in range(3))
+    assert import_time < IMPORT_TIME_BUDGET_MS, (
+        f"Importing aw_qt.main took {import_time:.0f} ms "
+        f"(budget: {IMPORT_TIME_BUDGET_MS} ms)"
+    )
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="reads /proc")
+def test_headless_does_not_load_qt_and_stays_within_rss_budget(tmp_path):
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "aw_qt",
+            "--no-gui",
+            "--testing",
+            "--autostart-modules=none",
+        ],
+        env=_isolated_env(tmp_path),
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert proc.stderr is not None
+        for line in proc.stderr:
+            if "after launch" in line:
+                break
+        else:
+            pytest.fail(f"aw-qt exited early with code {proc.wait()}")
+
+        with open(f"/proc/{proc.pid}/maps") as f:
+            assert "Qt6" not in f.read()
+        with open(f"/proc/{proc.pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f)
+        rss_kb = int(status["VmRSS"].split()[0])
+        assert rss_kb < HEADLESS_RSS_BUDGET_KB, (
+            f"Headless aw-qt uses {rss_kb // 1024} MB "
+            f"(budget: {HEADLESS_RSS_BUDGET_KB // 1024} MB)"
+        )
+    finally:
+        proc.terminate()
+        proc.wait()
@@ -0,0 +1,47 @@
+"""Unit tests for Chrome trace-event recording."""
+
+import json
+import threading
+
+from aw_qt.tracing import Tracer
+
+
+def test_disabled_tracer_records_nothing(tmp_path):
+    tracer = Tracer()
+
+    with tracer.span("startup"):
+        tracer.instant("event")
+    tracer.save()
+
+    assert tracer._events == []
+
+
+def test_writes_trace_event_json(tmp_path):
+    path = tmp_path / "trace.json"
+    tracer = Tracer()
+    tracer.path = str(path)
+
+    with tracer.span("discover modules", cat="startup"):
+        pass
+    worker = threading.Thread(
+        target=lambda: tracer.instant("crash aw-watcher-afk", cat="module", returncode=1),
+        name="aw-qt-child-watcher",
+    )
+    worker.start()
+    worker.join()
+    tracer.save()
+
+    events = json.loads(path.read_text())["traceEvents"]
+    by_phase: dict = {}
+    for event in events:
+        by_phase.setdefault(event["ph"], []).append(event)
+
+    (span,) = by_phase["X"]
+    assert span["name"] == "discover modules"
+    assert span["cat"] == "startup"
+    assert span["dur"] >= 0
+    (instant,) = by_phase["i"]
+    assert instant["args"] == {"returncode": 1}
+    thread_names = {e["args"]["name"] for e in by_phase["M"]}
+    assert "aw-qt-child-watcher" in thread_names
+    assert instant["tid"] != span["tid"]
@@ -0,0 +1,258 @@
+"""Tests for keeping the tray icon's Modules menu current."""
+
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+from time import perf_counter
+from unittest.mock import patch
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+from PyQt6 import QtCore  # noqa: E402
+from PyQt6.QtGui import QIcon  # noqa: E402
+
+from aw_qt.lifecycle import State  # noqa: E402
+from aw_qt.manager import Manager, Module  # noqa: E402
+from aw_qt.probes import ProbeWorker  # noqa: E402
+from aw_qt.quarantine import QuarantineStore  # noqa: E402
+from aw_qt.trayicon import (  # noqa: E402
+    SignalHandler,
+    SystemTrayWaiter,
+    TrayIcon,
+)
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def tray(app, tmp_path):
+    with patch.object(Manager, "discover_modules"):
+        manager = Manager(
+            testing=True,
+            quarantine=QuarantineStore(str(tmp_path / "quarantine.json")),
+        )
+    manager._fully_discovered = True
+    # Not the shared worker, which would call into the tray after it's deleted
+    manager.probe_worker = ProbeWorker()
+    manager.modules = [Module("aw-watcher-afk", Path("/usr/bin/true"), "system")]
+    tray = TrayIcon(manager, QIcon(), testing=True)
+    yield tray
+    tray.deleteLater()
+
+
+def action_for(tray: TrayIcon, name: str):
+    (module,) = [m for m in tray.manager.modules if m.name == name]
+    return module, tray._module_actions[module]
+
+
+def test_modules_are_discovered_off_the_gui_thread(app):
+    with patch.object(Manager, "discover_modules"):
+        manager = Manager(testing=True)
+    manager.probe_worker = ProbeWorker()
+    module = Module("aw-watcher-afk", Path("/usr/bin/true"), "system")
+    threads = []
+
+    def discover_modules(names=None):
+        threads.append(threading.current_thread())
+        manager.modules = [module]
+        manager._fully_discovered = True
+
+    with patch.object(manager, "discover_modules", side_effect=discover_modules):
+        tray = TrayIcon(manager, QIcon(), testing=True)
+        deadline = QtCore.QDeadlineTimer(5000)
+        while module not in tray._module_actions and not deadline.hasExpired():
+            app.processEvents(QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 50)
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert module in tray._module_actions
+    tray.deleteLater()
+
+
+def test_state_changes_update_the_menu(tray, app):
+    module, action = action_for(tray, "aw-watcher-afk")
+    assert not action.isChecked()
+
+    # Transitions may happen on any thread, and are delivered on the GUI thread
+    module.lifecycle.set(State.STARTING)
+    module.lifecycle.set(State.RUNNING)
+    app.processEvents()
+    assert action.isChecked()
+
+    module.lifecycle.set(State.CRASHED)
+    module.lifecycle.set(State.BACKOFF)
+    app.processEvents()
+    assert not action.isChecked()
+    assert action.text() == "aw-watcher-afk  (restarting)"
+
+
+def test_stalled_module(tray):
+    module, action = action_for(tray, "aw-watcher-afk")
+    module.lifecycle.set(State.STARTING)
+    module.lifecycle.set(State.RUNNING)
+    module.lifecycle.set(State.DEGRADED, "no updates to its buckets for 10m 0s")
+
+    tray._update_module_actions()
+
+    assert action.isChecked()
+    assert action.text() == "aw-watcher-afk  (stalled)"
+    assert action.toolTip() == "Running, but no updates to its buckets for 10m 0s"
+
+
+def test_crashed_module_stays_quarantined(tray):
+    module, action = action_for(tray, "aw-watcher-afk")
+    module.started = True
+    module.lifecycle.set(State.STARTING)
+    module.lifecycle.set(State.RUNNING)
+    module.lifecycle.set(State.CRASHED, "exit code 1 after 0.1s")
+    tray.manager.quarantine.quarantine(module.name, "crashed 4 times")
+    module.lifecycle.set(State.QUARANTINED, "crashed 4 times")
+
+    with patch.object(TrayIcon, "_show_module_failed_dialog") as dialog:
+        tray._on_module_exited(module)
+
+    dialog.assert_called_once_with(module)
+    assert not module.started
+    assert module.state is State.QUARANTINED
+    assert module.lifecycle.history[-1].reason == "crashed 4 times"
+    assert action.text() == "aw-watcher-afk  (quarantined)"
+
+
+def test_toggling_a_quarantined_module_releases_it_first(tray):
+    module, action = action_for(tray, "aw-watcher-afk")
+    tray.manager.quarantine.quarantine(module.name, "crashed 4 times")
+    module.lifecycle.set(State.QUARANTINED, "crashed 4 times")
+    seen_at_start = []
+
+    def start(testing):
+        seen_at_start.append((module.state, tray.manager.quarantine_reason(module)))
+
+    def run_now(fn, *args):
+        fn(*args)
+
+    with (
+        patch.object(tray.manager.probe_worker, "submit", side_effect=run_now),
+        patch.object(module, "start", side_effect=start),
+    ):
+        action.trigger()
+
+    assert seen_at_start == [(State.STOPPED, None)]
+
+
+def test_menu_is_updated_when_shown(tray):
+    module, action = action_for(tray, "aw-watcher-afk")
+    tray.manager.quarantine.quarantine(module.name, "crashed 4 times")
+    module.lifecycle.set(State.QUARANTINED)
+
+    tray._update_module_actions()
+
+    assert action.text() == "aw-watcher-afk  (quarantined)"
+    assert action.toolTip() == "Quarantined, since it crashed 4 times"
+
+
+def test_no_work_while_the_menu_is_closed(tray, app):
+    with patch.object(Module, "is_alive", return_value=False) as is_alive:
+        # Longer than the menu used to be refreshed every
+        deadline = QtCore.QDeadlineTimer(2500)
+        while not deadline.hasExpired():
+            app.processEvents(QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 50)
+    assert is_alive.call_count == 0
+
+
+class TestSystemTrayWaiter:
+    def wait(self, app, available, timeout=10):
+        waiter = SystemTrayWaiter(timeout=timeout, interval=0.05)
+        events = []
+        waiter.available.connect(lambda: events.append("available"))
+        waiter.timed_out.connect(lambda: events.append("timed out"))
+        with patch.object(
+            QtWidgets.QSystemTrayIcon, "isSystemTrayAvailable", side_effect=available
+        ):
+            start = perf_counter()
+            waiter.start()
+            # The event loop keeps running meanwhile
+            assert perf_counter() - start < 0.05
+            run_loop(app, 500)
+        return events
+
+    def test_waits_for_the_tray_on_the_event_loop(self, app):
+        assert self.wait(app, [False, False, True]) == ["available"]
+
+    def test_gives_up(self, app):
+        assert self.wait(app, lambda: False, timeout=0.2) == ["timed out"]
+
+    def test_messages_are_held_back_until_the_tray_is_available(self, tray):
+        module, _ = action_for(tray, "aw-watcher-afk")
+        module.started = True
+        module.lifecycle.set(State.CRASHED)
+        module.lifecycle.set(State.BACKOFF)
+
+        with patch.object(TrayIcon, "showMessage") as show_message:
+            tray._on_module_exited(module)
+            assert not show_message.called
+
+            tray.show_in_tray()
+            show_message.assert_called_once_with(
+                "ActivityWatch",
+                "Module aw-watcher-afk crashed and will be restarted",
+                QtWidgets.QSystemTrayIcon.MessageIcon.Warning,
+                5000,
+            )
+
+
+class WakeupCounter(QtCore.QObject):
+    """Counts the timer and socket events, each of which wakes up the event loop"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QtCore.QEvent.Type.Timer, QtCore.QEvent.Type.SockAct):
+            self.count += 1
+        return False
+
+
+def run_loop(app, msecs):
+    """Runs the event loop for ``msecs``, returning the number of wakeups"""
+    counter = WakeupCounter()
+    app.installEventFilter(counter)
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(msecs, loop.quit)
+    try:
+        loop.exec()
+    finally:
+        app.removeEventFilter(counter)
+    return counter.count
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="sends itself a signal")
+class TestSignalHandler:
+    def test_no_wakeups_while_idle(self, app):
+        handler = SignalHandler(lambda: None)
+        try:
+            # Only the timer ending the loop, where a polling timer would fire ten times
+            assert run_loop(app, 1000) <= 1
+        finally:
+            handler.close()
+
+    def test_signal_is_handled_from_the_event_loop(self, app):
+        previous = signal.getsignal(signal.SIGTERM)
+        received = []
+        handler = SignalHandler(lambda: received.append(True))
+        try:
+            # From another thread, so that it arrives while the event loop sleeps
+            threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGTERM)).start()
+            run_loop(app, 500)
+        finally:
+            handler.close()
+        assert received == [True]
+        assert signal.getsignal(signal.SIGTERM) is previous